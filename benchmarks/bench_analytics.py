@@ -0,0 +1,79 @@
+"""Benchmark genealogy analytics over arrays against walking the graph.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_analytics [--nodes N]"""
+
+from argparse import ArgumentParser
+from collections import deque
+import time
+from geneagrapher.analytics import GenealogyArrays
+from .bench_dot_file import build_graph
+
+
+def reference(graph, seeds, k):
+    """Compute the analytics of GenealogyArrays by walking the ancestor and
+    descendant sets of the nodes of a Graph."""
+    descendants = {}
+    for id in graph:
+        seen = set()
+        stack = [id]
+        while stack:
+            for student in graph[stack.pop()].descendants:
+                if student not in seen:
+                    seen.add(student)
+                    stack.append(student)
+        descendants[id] = len(seen)
+
+    depths = dict((id, 0) for id in seeds)
+    queue = deque(seeds)
+    while queue:
+        id = queue.popleft()
+        for student in graph[id].descendants:
+            if student not in depths:
+                depths[student] = depths[id] + 1
+                queue.append(student)
+
+    # The synthetic advisors of a node all have smaller ids.
+    chains = {}
+    for id in sorted(graph):
+        chains[id] = 1 + max([chains[a] for a in graph[id].ancestors] or [0])
+
+    top = sorted(graph, key=lambda id: (-len(graph[id].descendants), id))[:k]
+    return descendants, depths, max(chains.values()), top
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=20000)
+    args = parser.parse_args()
+
+    graph = build_graph(args.nodes)
+    seeds = [1, 2, 3]
+
+    start = time.perf_counter()
+    descendants, depths, chain, top = reference(graph, seeds, 10)
+    reference_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    arrays = GenealogyArrays.from_graph(graph)
+    convert_time = time.perf_counter() - start
+    start = time.perf_counter()
+    counts = arrays.descendant_counts()
+    generations = arrays.generations(seeds)
+    longest = arrays.longest_chain()
+    top_advisors = arrays.top_advisors(10)
+    arrays_time = time.perf_counter() - start
+
+    assert counts.tolist() == [descendants[id] for id in graph]
+    assert generations.tolist() == [depths.get(id, -1) for id in graph]
+    assert len(longest) == chain
+    assert [id for id, students in top_advisors] == top
+
+    print("nodes: {}".format(args.nodes))
+    print("graph walks: {:.2f} s".format(reference_time))
+    print("arrays: {:.2f} s (+ {:.2f} s to convert)".format(arrays_time, convert_time))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Benchmark exporting an SQLite cache of synthetic records to a snapshot
+file and importing the snapshot into an empty cache.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_cache_snapshot [--records N]"""
+
+from argparse import ArgumentParser
+import os
+import random
+import tempfile
+import time
+from geneagrapher.cache_backends import SQLiteBackend
+from geneagrapher.cache_snapshot import export_snapshot, import_snapshot
+from geneagrapher.grabber import SCHEMA_VERSION
+
+
+def records(count):
+    """Generate (key, record) pairs for count synthetic records shaped like
+    those of the Mathematics Genealogy Project."""
+    rand = random.Random(0)
+    for id in range(1, count + 1):
+        yield str(id), {
+            "name": "Mathematician {}".format(id),
+            "institution": "University {}".format(rand.randrange(5000)),
+            "year": rand.randrange(1500, 2025),
+            "advisors": set(rand.sample(range(1, count + 1), rand.randrange(3))),
+            "descendants": set(rand.sample(range(1, count + 1), rand.randrange(6))),
+            "schema": SCHEMA_VERSION,
+            "timestamp": 1.6e9 + id,
+        }
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "source")
+        snapshot = os.path.join(directory, "cache.snapshot")
+        with SQLiteBackend(source) as backend:
+            backend.put_many(records(args.records))
+            start = time.perf_counter()
+            export_snapshot(backend, snapshot)
+            exported = time.perf_counter() - start
+            cache_size = backend.file_size()
+
+        with SQLiteBackend(os.path.join(directory, "target")) as backend:
+            start = time.perf_counter()
+            import_snapshot(backend, snapshot)
+            imported = time.perf_counter() - start
+
+        print("records: {}".format(args.records))
+        print(
+            "snapshot: {:.1f} MB ({:.1f} MB cache)".format(
+                os.path.getsize(snapshot) / 2**20, cache_size / 2**20
+            )
+        )
+        print("export: {:.2f} s".format(exported))
+        print("import: {:.2f} s".format(imported))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Benchmark per-record grabbing latency against a local stand-in for the
+Mathematics Genealogy Project, comparing a fresh urllib connection per
+record with the pooled, compressed connections of Grabber.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_connection_pool [--rounds N] [--connect-delay S]
+
+The connect delay is added by the server to every new connection, standing
+in for the TCP and TLS handshakes of a real remote host."""
+from argparse import ArgumentParser
+import ssl
+import time
+import urllib.request
+from bs4 import BeautifulSoup
+from geneagrapher.grabber import Grabber, get_record_from_tree
+from tests.geneagrapher.local_http_server import LocalHTTPServer, data_ids
+
+
+def grab_unpooled(record_url, id):
+    """Grab a record the way Grabber did before connection pooling."""
+    page = urllib.request.urlopen(
+        record_url.format(id), context=ssl._create_unverified_context()
+    )
+    soup = BeautifulSoup(page, "lxml")
+    page.close()
+    return get_record_from_tree(soup, id)
+
+
+def run(grab, ids, rounds):
+    """Grab every id rounds times and return the mean seconds per record."""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for id in ids:
+            grab(id)
+    return (time.perf_counter() - start) / (rounds * len(ids))
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--connect-delay", type=float, default=0.0)
+    args = parser.parse_args()
+
+    ids = data_ids()
+    with LocalHTTPServer(args.connect_delay) as server:
+        url = server.record_url
+        before = run(lambda id: grab_unpooled(url, id), ids, args.rounds)
+        before_connections = server.connections
+
+        with Grabber(record_url=url) as grabber:
+            after = run(grabber.get_record, ids, args.rounds)
+        after_connections = server.connections - before_connections
+
+    count = args.rounds * len(ids)
+    print("records grabbed per run: {}".format(count))
+    print(
+        "urlopen per record: {:8.3f} ms/record, {} connections".format(
+            before * 1e3, before_connections
+        )
+    )
+    print(
+        "pooled Grabber:     {:8.3f} ms/record, {} connections".format(
+            after * 1e3, after_connections
+        )
+    )
+    print("speedup: {:.2f}x".format(before / after))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Benchmark loading a CSR graph file of synthetic records and querying its
+ancestors, against building a Graph of the same records.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_csr_graph [--records N] [--queries N]"""
+
+from argparse import ArgumentParser
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from geneagrapher.graph import CSRGraph, Graph, write_csr_graph
+
+
+def records(count):
+    """Generate (key, record) pairs for count synthetic records shaped like
+    those of the Mathematics Genealogy Project, with every advisor given
+    a smaller id than their students so the genealogy has no cycles."""
+    rand = random.Random(0)
+    advisors = {}
+    for id in range(1, count + 1):
+        advisors[id] = set(rand.sample(range(1, id), min(id - 1, rand.randrange(3))))
+    students = dict((id, set()) for id in advisors)
+    for id, linked in advisors.items():
+        for advisor in linked:
+            students[advisor].add(id)
+    for id in range(1, count + 1):
+        yield str(id), {
+            "name": "Mathematician {}".format(id),
+            "institution": "University {}".format(rand.randrange(5000)),
+            "year": rand.randrange(1500, 2025),
+            "advisors": advisors[id],
+            "descendants": students[id],
+        }
+
+
+def graph_ancestors(graph, id):
+    """Return the ancestors of a node of a Graph."""
+    seen = set()
+    stack = [id]
+    while stack:
+        for advisor in graph[stack.pop()].ancestors:
+            if advisor not in seen:
+                seen.add(advisor)
+                stack.append(advisor)
+    return seen
+
+
+def measure(function):
+    """Return the result of calling function with the time it took and the
+    memory it left allocated, in seconds and bytes."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, elapsed, allocated
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=1000)
+    args = parser.parse_args()
+
+    data = list(records(args.records))
+    queries = random.Random(1).sample(range(1, args.records + 1), args.queries)
+
+    def build_graph():
+        graph = Graph()
+        for key, record in data:
+            graph.add_node(
+                record["name"],
+                record["institution"],
+                record["year"],
+                int(key),
+                record["advisors"],
+                record["descendants"],
+            )
+        return graph
+
+    graph, graph_load, graph_memory = measure(build_graph)
+    start = time.perf_counter()
+    for id in queries:
+        graph_ancestors(graph, id)
+    graph_query = time.perf_counter() - start
+    del graph
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "genealogy.csr")
+        start = time.perf_counter()
+        write_csr_graph(data, filename)
+        written = time.perf_counter() - start
+        csr, csr_load, csr_memory = measure(lambda: CSRGraph(filename))
+        with csr:
+            start = time.perf_counter()
+            for id in queries:
+                csr.ancestors(id)
+            csr_query = time.perf_counter() - start
+        file_size = os.path.getsize(filename)
+
+    print("records: {}".format(args.records))
+    print("CSR file: {:.1f} MB, written in {:.2f} s".format(file_size / 2**20, written))
+    print(
+        "Graph: load {:.3f} s, {:.1f} MB, {} ancestor queries {:.3f} s".format(
+            graph_load, graph_memory / 2**20, args.queries, graph_query
+        )
+    )
+    print(
+        "CSRGraph: load {:.3f} s, {:.1f} MB, {} ancestor queries {:.3f} s".format(
+            csr_load, csr_memory / 2**20, args.queries, csr_query
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
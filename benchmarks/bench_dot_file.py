@@ -0,0 +1,57 @@
+"""Benchmark generating the dot file of a synthetic genealogy graph.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_dot_file [--nodes N]"""
+
+from argparse import ArgumentParser
+import os
+import random
+import time
+from geneagrapher.graph import Graph
+
+
+def build_graph(count):
+    """Return a Graph of count synthetic records, each with a few advisors
+    among the records before it, and surnames drawn from a small pool so
+    that many neighbours share one."""
+    rand = random.Random(0)
+    surnames = ["Surname{}".format(i) for i in range(2000)]
+    advisors = {}
+    students = dict((id, set()) for id in range(1, count + 1))
+    for id in range(1, count + 1):
+        advisors[id] = set(rand.sample(range(1, id), min(id - 1, rand.randrange(4))))
+        for advisor in advisors[id]:
+            students[advisor].add(id)
+    graph = Graph()
+    graph.add_nodes(
+        (
+            "Mathematician {} {}".format(id, rand.choice(surnames)),
+            "University {}".format(rand.randrange(5000)),
+            rand.randrange(1500, 2025),
+            id,
+            advisors[id],
+            students[id],
+        )
+        for id in range(1, count + 1)
+    )
+    return graph
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=200000)
+    args = parser.parse_args()
+
+    graph = build_graph(args.nodes)
+    with open(os.devnull, "w") as outfile:
+        start = time.perf_counter()
+        graph.write_dot_file(outfile, True, True)
+        elapsed = time.perf_counter() - start
+
+    print("nodes: {}".format(args.nodes))
+    print("dot file: {:.2f} s".format(elapsed))
+
+
+if __name__ == "__main__":
+    main()
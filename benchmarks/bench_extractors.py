@@ -0,0 +1,68 @@
+"""Benchmark record extraction from the pages of test data, comparing the
+BeautifulSoup extractor with the lxml/XPath extractor.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_extractors [--rounds N]"""
+
+from argparse import ArgumentParser
+import time
+from bs4 import BeautifulSoup
+from geneagrapher.grabber import get_record_from_html, get_record_from_tree
+from tests.geneagrapher.local_data_grabber import LocalDataGrabber
+from tests.geneagrapher.local_http_server import data_ids
+
+
+def run(extract, pages, rounds):
+    """Extract every page rounds times and return the mean seconds per
+    page."""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for id, page in pages:
+            extract(page, id)
+    return (time.perf_counter() - start) / (rounds * len(pages))
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    pages = []
+    for id in data_ids():
+        with open(LocalDataGrabber.data_file("{}.html".format(id)), "rb") as fin:
+            pages.append((id, fin.read()))
+
+    results = [
+        (
+            "BeautifulSoup",
+            run(
+                lambda page, id: get_record_from_tree(BeautifulSoup(page, "lxml"), id),
+                pages,
+                args.rounds,
+            ),
+        ),
+        (
+            "lxml, sniffed charset",
+            run(get_record_from_html, pages, args.rounds),
+        ),
+        (
+            "lxml, header charset",
+            run(
+                lambda page, id: get_record_from_html(page, id, "utf-8"),
+                pages,
+                args.rounds,
+            ),
+        ),
+    ]
+    print("pages extracted per run: {}".format(args.rounds * len(pages)))
+    for name, seconds in results:
+        print(
+            "{:22} {:8.3f} ms/page  {:6.2f}x".format(
+                name + ":", seconds * 1e3, results[0][1] / seconds
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Benchmark building Graphs of synthetic records with Graph.add_nodes
+against calling Graph.add_node for each record, at sizes up to a million
+nodes.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_graph_add_nodes [--max-nodes N]"""
+
+from argparse import ArgumentParser
+import gc
+import random
+import time
+from geneagrapher.graph import Graph
+
+
+def records(count):
+    """Return count add_node argument tuples for synthetic records shaped
+    like those of the Mathematics Genealogy Project."""
+    rand = random.Random(0)
+    return [
+        (
+            "Mathematician {}".format(id),
+            "University {}".format(rand.randrange(5000)),
+            rand.randrange(1500, 2025),
+            id,
+            set(rand.randrange(1, count + 1) for i in range(rand.randrange(3))),
+            set(rand.randrange(1, count + 1) for i in range(rand.randrange(6))),
+        )
+        for id in range(1, count + 1)
+    ]
+
+
+def timed(function, data):
+    """Return the time taken to build a Graph of the records with function,
+    which is called with the graph and the records."""
+    graph = Graph()
+    start = time.perf_counter()
+    function(graph, data)
+    elapsed = time.perf_counter() - start
+    del graph
+    gc.collect()
+    return elapsed
+
+
+def add_each(graph, data):
+    for record in data:
+        graph.add_node(*record)
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-nodes", type=int, default=1000000)
+    args = parser.parse_args()
+
+    print("{:>9}  {:>10}  {:>10}".format("nodes", "add_node", "add_nodes"))
+    count = 10000
+    while count <= args.max_nodes:
+        data = records(count)
+        one_by_one = timed(add_each, data)
+        bulk = timed(Graph.add_nodes, data)
+        print("{:>9}  {:>9.2f}s  {:>9.2f}s".format(count, one_by_one, bulk))
+        count *= 10
+
+
+if __name__ == "__main__":
+    main()
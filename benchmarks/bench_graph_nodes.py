@@ -0,0 +1,75 @@
+"""Benchmark the memory taken by each node of a Graph and the rate at which
+nodes are built, through Graph.add_node and through the validating Record
+and Node constructors.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_graph_nodes [--nodes N]"""
+
+from argparse import ArgumentParser
+import random
+import time
+import tracemalloc
+from geneagrapher.graph import Graph, Node, Record
+
+
+def records(count):
+    """Return count (name, institution, year, id, advisors, advisees)
+    tuples of synthetic records, with institution names built afresh for
+    each record as they are when parsed from pages."""
+    rand = random.Random(0)
+    return [
+        (
+            "Mathematician {}".format(id),
+            "University {}".format(rand.randrange(500)),
+            rand.randrange(1500, 2025),
+            id,
+            set(rand.sample(range(1, count + 1), rand.randrange(3))),
+            set(rand.sample(range(1, count + 1), rand.randrange(6))),
+        )
+        for id in range(1, count + 1)
+    ]
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=100000)
+    args = parser.parse_args()
+    data = records(args.nodes)
+
+    def build_graph():
+        graph = Graph()
+        for record in data:
+            graph.add_node(*record)
+        return graph
+
+    start = time.perf_counter()
+    build_graph()
+    added = time.perf_counter() - start
+
+    # Memory is traced in a run of its own, as tracing slows the run down.
+    tracemalloc.start()
+    graph = build_graph()
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del graph
+
+    start = time.perf_counter()
+    for name, institution, year, id, advisors, advisees in data:
+        Node(Record(name, institution, year, id), set(), set())
+    validated = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for name, institution, year, id, advisors, advisees in data:
+        Node.trusted(Record.trusted(name, institution, year, id), set(), set())
+    trusted = time.perf_counter() - start
+
+    print("nodes: {}".format(args.nodes))
+    print("memory per node: {:.0f} bytes".format(allocated / args.nodes))
+    print("Graph.add_node: {:.0f} nodes/s".format(args.nodes / added))
+    print("validating constructors: {:.0f} nodes/s".format(args.nodes / validated))
+    print("trusted constructors: {:.0f} nodes/s".format(args.nodes / trusted))
+
+
+if __name__ == "__main__":
+    main()
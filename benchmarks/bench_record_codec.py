@@ -0,0 +1,70 @@
+"""Benchmark the compact record encoding of the cache against pickle on the
+records of the test data, comparing bytes per record and decode time.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_record_codec [--rounds N]"""
+
+from argparse import ArgumentParser
+import pickle
+import time
+from geneagrapher.grabber import SCHEMA_VERSION
+from geneagrapher.record_codec import decode_record, encode_record
+from tests.geneagrapher.local_data_grabber import LocalDataGrabber
+from tests.geneagrapher.local_http_server import data_ids
+
+
+def run(decode, encoded, rounds, *args):
+    """Decode every record rounds times, passing args after the data, and
+    return the mean seconds per record."""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for data in encoded:
+            decode(data, *args)
+    return (time.perf_counter() - start) / (rounds * len(encoded))
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=1000)
+    args = parser.parse_args()
+
+    grabber = LocalDataGrabber()
+    records = []
+    for id in data_ids():
+        record = grabber.get_record(id)
+        record["schema"] = SCHEMA_VERSION
+        records.append(record)
+
+    institutions = {}
+
+    def intern(name):
+        return institutions.setdefault(name, len(institutions) + 1)
+
+    pickled = [pickle.dumps(record, pickle.HIGHEST_PROTOCOL) for record in records]
+    compact = [encode_record(record, intern) for record in records]
+    names = {id: name for name, id in institutions.items()}
+    for record, data in zip(records, compact):
+        assert decode_record(data, names.__getitem__) == record
+
+    results = [
+        ("pickle", pickled, run(pickle.loads, pickled, args.rounds)),
+        (
+            "compact",
+            compact,
+            run(decode_record, compact, args.rounds, names.__getitem__),
+        ),
+    ]
+    print("records decoded per run: {}".format(args.rounds * len(records)))
+    for name, encoded, seconds in results:
+        print(
+            "{:8} {:7.1f} bytes/record  {:6.2f} us/record decode".format(
+                name + ":",
+                sum(len(data) for data in encoded) / len(encoded),
+                seconds * 1e6,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+from .graph.graph_arrays import graph_to_arrays, require_numpy, split_strings
+
+try:
+    import numpy
+except ImportError:
+    # Analytics need the numpy extra.
+    numpy = None
+
+# Number of 64-bit words of the masks of descendant_counts. Each pass
+# over the graph counts the ancestors of 64 times this many nodes.
+mask_words = 16
+
+
+class GenealogyArrays:
+    """
+    Class holding a genealogy graph as the columnar arrays of
+    graph_to_arrays, for computing metrics over it with NumPy operations
+    on whole frontiers of nodes at a time rather than by walking the
+    ancestor and descendant sets of nodes.
+
+    Nodes are numbered by their position in the ids array. Advisors and
+    students are kept in CSR form: the students of node i are
+    student_indexes[student_offsets[i]:student_offsets[i + 1]].
+    """
+
+    def __init__(self, arrays):
+        """
+        GenealogyArrays class constructor.
+
+        Parameters:
+            arrays: mapping of the arrays returned by graph_to_arrays, such
+                as an .npz file written by save_graph_arrays
+        """
+        require_numpy()
+        self.ids = numpy.asarray(arrays["ids"], dtype=numpy.int64)
+        self.names = split_strings(arrays["names"], arrays["name_offsets"])
+        self.seeds = numpy.asarray(arrays["seeds"], dtype=numpy.int64)
+        self.advisor_offsets = arrays["advisor_offsets"]
+        self.advisor_indexes = arrays["advisor_indexes"]
+        self.student_offsets = arrays["student_offsets"]
+        self.student_indexes = arrays["student_indexes"]
+        self.sorter = numpy.argsort(self.ids, kind="stable")
+
+    @classmethod
+    def from_graph(cls, graph):
+        """Return the arrays of a Graph."""
+        return cls(graph_to_arrays(graph))
+
+    @classmethod
+    def load(cls, filename):
+        """Return the arrays saved to an .npz file by save_graph_arrays."""
+        require_numpy()
+        with numpy.load(filename) as arrays:
+            return cls(dict(arrays))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def indexes(self, ids):
+        """Return the array of the node numbers of the given ids. Raises
+        KeyError for an id that is not in the graph."""
+        ids = numpy.asarray(ids, dtype=numpy.int64)
+        positions = numpy.searchsorted(self.ids, ids, sorter=self.sorter)
+        positions = numpy.minimum(positions, len(self.ids) - 1)
+        indexes = self.sorter[positions] if len(self.ids) else positions
+        missing = ids[self.ids[indexes] != ids] if len(self.ids) else ids
+        if len(missing):
+            raise KeyError(int(missing[0]))
+        return indexes
+
+    def students(self, frontier):
+        """Return the students of the nodes of a frontier, with repeats."""
+        return gather(self.student_offsets, self.student_indexes, frontier)
+
+    def advisors(self, frontier):
+        """Return the advisors of the nodes of a frontier, with repeats."""
+        return gather(self.advisor_offsets, self.advisor_indexes, frontier)
+
+    def generations(self, seeds=None, ancestors=False):
+        """
+        Return the array of the number of generations between each node
+        and the nearest seed, or -1 for nodes that cannot be reached.
+        Generations are counted down through students, or up through
+        advisors if ancestors is True. The seeds default to those of the
+        graph.
+        """
+        step = self.advisors if ancestors else self.students
+        depths = numpy.full(len(self), -1, dtype=numpy.int64)
+        frontier = numpy.unique(self.indexes(self.seeds if seeds is None else seeds))
+        depth = 0
+        while len(frontier):
+            depths[frontier] = depth
+            frontier = numpy.unique(step(frontier))
+            frontier = frontier[depths[frontier] < 0]
+            depth += 1
+        return depths
+
+    def topological_levels(self):
+        """
+        Return the array of the level of each node: 0 for nodes without
+        advisors in the graph, and otherwise one more than the highest
+        level of its advisors. Raises ValueError if the advisor links form
+        a cycle.
+        """
+        count = len(self)
+        waiting = numpy.bincount(self.student_indexes, minlength=count)
+        levels = numpy.full(count, -1, dtype=numpy.int64)
+        frontier = numpy.flatnonzero(waiting == 0)
+        level = 0
+        while len(frontier):
+            levels[frontier] = level
+            students = self.students(frontier)
+            waiting -= numpy.bincount(students, minlength=count)
+            students = numpy.unique(students)
+            frontier = students[waiting[students] == 0]
+            level += 1
+        if (levels < 0).any():
+            raise ValueError(
+                "{} mathematicians are in or below cycles of advisor links".format(
+                    int((levels < 0).sum())
+                )
+            )
+        return levels
+
+    def descendant_counts(self):
+        """
+        Return the array of the number of descendants of each node: its
+        students, their students, and so on, each counted once.
+        """
+        count = len(self)
+        levels = self.topological_levels()
+        # The links from advisors to students, latest advisors first.
+        advisors = numpy.repeat(
+            numpy.arange(count, dtype=numpy.int64), numpy.diff(self.student_offsets)
+        )
+        order = numpy.lexsort((advisors, -levels[advisors]))
+        advisors = advisors[order]
+        students = self.student_indexes[order]
+        bounds = numpy.flatnonzero(numpy.diff(levels[advisors])) + 1
+        groups = []
+        for group_advisors, group_students in zip(
+            numpy.split(advisors, bounds), numpy.split(students, bounds)
+        ):
+            # The links of each advisor are next to each other, so the
+            # masks of their students can be or-ed together with reduceat.
+            starts = numpy.flatnonzero(numpy.diff(group_advisors, prepend=-1))
+            groups.append((group_advisors[starts], group_students, starts))
+
+        # A batch of nodes is given a bit each. The masks are or-ed up
+        # from students to advisors a level at a time, so each node ends
+        # up with the bits of the nodes of the batch it is an ancestor of
+        # or is, which popcounts then add to its count.
+        counts = numpy.zeros(count, dtype=numpy.int64)
+        batch_size = 64 * mask_words
+        for start in range(0, count, batch_size):
+            batch = numpy.arange(start, min(start + batch_size, count))
+            offsets = batch - start
+            masks = numpy.zeros((count, mask_words), dtype=numpy.uint64)
+            masks[batch, offsets // 64] = numpy.left_shift(
+                numpy.uint64(1), (offsets % 64).astype(numpy.uint64)
+            )
+            for group_advisors, group_students, starts in groups:
+                masks[group_advisors] |= numpy.bitwise_or.reduceat(
+                    masks[group_students], starts
+                )
+            counts += popcount(masks)
+        return counts - 1
+
+    def longest_chain(self):
+        """Return the list of the ids of a longest chain of mathematicians
+        each advised by the one before, starting with the earliest."""
+        if not len(self):
+            return []
+        levels = self.topological_levels()
+        node = int(numpy.argmax(levels))
+        chain = [node]
+        while levels[node] > 0:
+            advisors = self.advisors(numpy.array([node]))
+            node = int(advisors[levels[advisors] == levels[node] - 1][0])
+            chain.append(node)
+        return self.ids[chain[::-1]].tolist()
+
+    def top_advisors(self, k):
+        """Return a list of (id, students) pairs for the k mathematicians
+        with the most students in the graph, most first, with ties broken
+        by id."""
+        return self.top(numpy.diff(self.student_offsets), k)
+
+    def top_descendants(self, k, counts=None):
+        """Return a list of (id, descendants) pairs for the k mathematicians
+        with the most descendants, ordered as by top_advisors. counts is
+        the array of descendant_counts, computed if not given."""
+        if counts is None:
+            counts = self.descendant_counts()
+        return self.top(counts, k)
+
+    def top(self, values, k):
+        """Return a list of (id, value) pairs for the k nodes with the
+        largest values, largest first, with ties broken by id."""
+        order = numpy.lexsort((self.ids, -values))[:k]
+        return list(zip(self.ids[order].tolist(), values[order].tolist()))
+
+
+def gather(offsets, indexes, frontier):
+    """Return the concatenation of the CSR rows of the nodes of a
+    frontier."""
+    starts = offsets[frontier]
+    lengths = offsets[frontier + 1] - starts
+    total = int(lengths.sum())
+    # Position j of the result is entry j - (start of its row in the
+    # result) of its row.
+    row_starts = numpy.cumsum(lengths) - lengths
+    positions = numpy.arange(total, dtype=numpy.int64) + numpy.repeat(
+        starts - row_starts, lengths
+    )
+    return indexes[positions]
+
+
+def popcount(masks):
+    """Return the number of bits set in each row of a uint64 array."""
+    if hasattr(numpy, "bitwise_count"):
+        return numpy.bitwise_count(masks).sum(axis=1, dtype=numpy.int64)
+    return numpy.unpackbits(masks.view(numpy.uint8), axis=1).sum(
+        axis=1, dtype=numpy.int64
+    )
@@ -0,0 +1,126 @@
+from argparse import ArgumentParser
+from collections import Counter
+from .analytics import GenealogyArrays
+from .cache_command import add_cache_backend_argument, add_cache_file_argument
+from .cache_grabber import CacheGrabber
+from .graph import Graph
+
+
+def cached_graph(args):
+    """Return the Graph of every record in the cache."""
+    graph = Graph()
+    with CacheGrabber(args.cache_file, backend=args.cache_backend) as cache:
+        graph.add_nodes(
+            (
+                record["name"],
+                record["institution"],
+                record["year"],
+                int(key),
+                record["advisors"],
+                record["descendants"],
+            )
+            for key, record in cache.cache.items()
+        )
+    graph.seeds = set()
+    return graph
+
+
+def print_table(title, rows, arrays, counts):
+    """Print a table of the mathematicians of the first items of rows, such
+    as the pairs of GenealogyArrays.top_advisors, with their numbers of
+    students and descendants and their names."""
+    print(
+        "{}\n  {:>8}  {:>8}  {:>11}  {}".format(
+            title, "id", "students", "descendants", "name"
+        )
+    )
+    indexes = arrays.indexes([row[0] for row in rows]).tolist()
+    students = arrays.student_offsets[1:] - arrays.student_offsets[:-1]
+    for index in indexes:
+        print(
+            "  {:>8}  {:>8}  {:>11}  {}".format(
+                int(arrays.ids[index]),
+                int(students[index]),
+                int(counts[index]),
+                arrays.names[index],
+            )
+        )
+
+
+def analytics_main(argv=None):
+    """Function to run the analytics command. This is the function called
+    when the ggrapher script is run with "analytics" as its first
+    argument."""
+    parser = ArgumentParser(
+        prog="ggrapher analytics",
+        description="Report metrics of a genealogy: the longest chain of \
+advisors, the mathematicians with the most students and descendants, and \
+the number of mathematicians in each generation from the seeds. The \
+genealogy is a graph saved by geneagrapher.graph.save_graph_arrays or, \
+without FILE, every record in the cache.",
+    )
+    parser.add_argument(
+        "graph_file",
+        metavar="FILE",
+        nargs="?",
+        default=None,
+        help="graph arrays (.npz) file to analyse",
+    )
+    add_cache_file_argument(parser)
+    add_cache_backend_argument(parser)
+    parser.add_argument(
+        "--seed",
+        dest="seeds",
+        type=int,
+        action="append",
+        default=None,
+        help="count generations from ID; may be given more than once \
+[default: the seeds of the graph]",
+        metavar="ID",
+    )
+    parser.add_argument(
+        "--ancestors",
+        action="store_true",
+        dest="ancestors",
+        default=False,
+        help="count generations up through advisors rather than down \
+through students",
+    )
+    parser.add_argument(
+        "--top",
+        dest="top",
+        type=int,
+        default=10,
+        help="list the top K mathematicians [default: 10]",
+        metavar="K",
+    )
+    args = parser.parse_args(argv)
+
+    if args.graph_file is not None:
+        arrays = GenealogyArrays.load(args.graph_file)
+    else:
+        arrays = GenealogyArrays.from_graph(cached_graph(args))
+    seeds = arrays.seeds.tolist() if args.seeds is None else args.seeds
+    try:
+        counts = arrays.descendant_counts()
+        chain = arrays.longest_chain()
+        generations = arrays.generations(seeds, args.ancestors)
+    except KeyError as e:
+        parser.error("mathematician {} is not in the graph".format(e.args[0]))
+    except ValueError as e:
+        parser.error(str(e))
+
+    print("Mathematicians: {}".format(len(arrays)))
+    print("Advisor links: {}".format(len(arrays.student_indexes)))
+    print("Longest advisor chain: {} mathematicians".format(len(chain)))
+    for index in arrays.indexes(chain).tolist():
+        print("  {:>8}  {}".format(int(arrays.ids[index]), arrays.names[index]))
+    print_table("Most students:", arrays.top_advisors(args.top), arrays, counts)
+    print_table(
+        "Most descendants:", arrays.top_descendants(args.top, counts), arrays, counts
+    )
+    if seeds:
+        print("Generations from the seeds:")
+        depths = Counter(depth for depth in generations.tolist() if depth >= 0)
+        for depth in sorted(depths):
+            print("  {:>3}  {}".format(depth, depths[depth]))
@@ -0,0 +1,875 @@
+from collections import OrderedDict
+import contextlib
+import dbm
+import os
+import pickle
+import shelve
+import sqlite3
+import struct
+import sys
+import threading
+from time import time
+from .record_codec import decode_record, encode_record
+
+try:
+    import fcntl
+except ImportError:
+    # File locking is not available on this platform.
+    fcntl = None
+
+try:
+    import dbm.gnu as dbm_gnu
+except ImportError:
+    dbm_gnu = None
+
+
+class CacheBackend:
+    """
+    Base class of the stores CacheGrabber keeps records in.
+
+    A backend maps the string form of a record id to the record dict,
+    including its "timestamp" entry, and supports the mapping operations
+    CacheGrabber and its users rely on. Subclasses implement get, get_many,
+    put_many, __delitem__, __len__, keys, close, file_size and compact.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __getitem__(self, key):
+        record = self.get(key)
+        if record is None:
+            raise KeyError(key)
+        return record
+
+    def __setitem__(self, key, record):
+        self.put_many([(key, record)])
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def get_many(self, keys):
+        """Return a dict mapping the given keys to their records. Keys that
+        are not in the store are left out."""
+        records = {}
+        for key in keys:
+            record = self.get(key)
+            if record is not None:
+                records[key] = record
+        return records
+
+    def items(self):
+        """Generate the (key, record) pairs in the store."""
+        for key in self.keys():
+            record = self.get(key)
+            if record is not None:
+                yield key, record
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Context manager grouping the writes made inside it, so they are
+        committed together where the backend supports it."""
+        yield self
+
+    def touch(self, keys):
+        """Note that the records with the given keys were used, for backends
+        that evict the least recently used records. Other backends evict
+        the least recently written records instead."""
+
+    def data_size(self):
+        """Return the number of bytes of record data in the store."""
+        return sum(len(pickle.dumps(record)) for key, record in self.items())
+
+    def evict(self, max_size, expired_before=None):
+        """Remove records until the record data fits in max_size bytes, and
+        return the number of records removed. Records stamped before
+        expired_before go first, then the least recently written ones, as
+        uses are not noted."""
+        sizes = {}
+        stamps = {}
+        for key, record in self.items():
+            sizes[key] = len(pickle.dumps(record))
+            stamps[key] = record["timestamp"]
+        return self.evict_from(sizes, stamps, max_size, expired_before)
+
+    def evict_from(self, sizes, stamps, max_size, expired_before):
+        """Remove records, given the size of each record and the time by
+        which records are ordered for eviction, as evict does."""
+        size = sum(sizes.values())
+        if size <= max_size:
+            return 0
+        victims = []
+        if expired_before is not None:
+            for key, stamp in stamps.items():
+                if stamp < expired_before:
+                    victims.append(key)
+                    size -= sizes[key]
+        for key in sorted(stamps, key=stamps.get):
+            if size <= max_size:
+                break
+            if expired_before is None or stamps[key] >= expired_before:
+                victims.append(key)
+                size -= sizes[key]
+        with self.batch():
+            for key in victims:
+                del self[key]
+        return len(victims)
+
+
+class ShelveBackend(CacheBackend):
+    """
+    Legacy backend keeping records in a shelve file. The files making up
+    the shelf depend on the dbm implementation of the platform.
+
+    The shelf is used while holding a lock on a file next to it: a shared
+    lock for reading and an exclusive one for writing. Where file locking
+    is not available, only one process at a time may use the shelf. An
+    open dbm file does not see the writes of other processes, so the lock
+    file also holds a generation number, increased with each batch of
+    writes. The shelf is kept open between reads, and opened again once
+    another process has changed it. It is closed after each batch of
+    writes, as some dbm flavours write their whole index again whenever
+    they are closed, which would undo the later writes of other processes.
+    """
+
+    name = "shelve"
+
+    def __init__(self, filename="geneacache"):
+        self.filename = filename
+        self.lock = threading.RLock()
+        open(filename + ".lock", "ab").close()
+        self.lock_file = open(filename + ".lock", "r+b", buffering=0)
+        # The number of locked() blocks entered and not yet left, and
+        # whether the lock they hold is exclusive.
+        self.lock_depth = 0
+        self.lock_exclusive = False
+        # The open shelf, the generation it was opened at, the number of
+        # open_shelf() blocks using it, whether one of them is writing,
+        # whether the writes made in it are still to be synced, and whether
+        # it has been written to since it was opened.
+        self.shelf = None
+        self.shelf_generation = None
+        self.shelf_depth = 0
+        self.writing = False
+        self.modified = False
+        self.written = False
+        # A new shelf is written once, so that its files exist before other
+        # processes open it.
+        new = dbm.whichdb(filename) is None
+        with self.open_shelf(write=True):
+            self.modified = new
+
+    def __delitem__(self, key):
+        with self.open_shelf(write=True) as shelf:
+            del shelf[key]
+            self.modified = True
+
+    def __len__(self):
+        with self.open_shelf() as shelf:
+            return len(shelf)
+
+    def __contains__(self, key):
+        with self.open_shelf() as shelf:
+            return key in shelf
+
+    @contextlib.contextmanager
+    def locked(self, write=False):
+        """Context manager holding the lock on the shelf, exclusive if
+        write is True and shared otherwise.
+
+        The lock is re-entrant. flock on a descriptor already holding a
+        lock converts that lock, so a nested block leaves the lock alone
+        unless it needs an exclusive lock where a shared one is held; it
+        then upgrades the lock and downgrades it again when it is done."""
+        with self.lock:
+            if self.lock_file is None:
+                raise ValueError("invalid operation on closed cache")
+            if fcntl is None:
+                yield
+                return
+            exclusive = self.lock_exclusive
+            if self.lock_depth == 0 or (write and not exclusive):
+                fcntl.flock(self.lock_file, fcntl.LOCK_EX if write else fcntl.LOCK_SH)
+                self.lock_exclusive = write
+            self.lock_depth += 1
+            try:
+                yield
+            finally:
+                self.lock_depth -= 1
+                if self.lock_depth == 0:
+                    fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+                    self.lock_exclusive = False
+                elif self.lock_exclusive and not exclusive:
+                    fcntl.flock(self.lock_file, fcntl.LOCK_SH)
+                    self.lock_exclusive = False
+
+    def generation(self):
+        """Return the generation number held in the lock file."""
+        self.lock_file.seek(0)
+        data = self.lock_file.read(generation_struct.size)
+        if len(data) < generation_struct.size:
+            return 0
+        return generation_struct.unpack(data)[0]
+
+    def next_generation(self):
+        """Increase the generation number in the lock file, so that other
+        processes open the shelf again, and note that this process has the
+        shelf as it is."""
+        generation = self.generation() + 1
+        self.lock_file.seek(0)
+        self.lock_file.write(generation_struct.pack(generation))
+        self.shelf_generation = generation
+
+    @contextlib.contextmanager
+    def open_shelf(self, write=False):
+        """Context manager yielding the shelf under its lock, opening it
+        again first if another process has changed it. The writes made in
+        the outermost block writing to the shelf are synced when it ends,
+        and the shelf is closed once no block uses it."""
+        with self.lock, self.locked(write):
+            if self.shelf_depth == 0:
+                generation = self.generation()
+                if generation != self.shelf_generation:
+                    self.close_shelf()
+                if self.shelf is None:
+                    self.shelf = open_shelf_file(self.filename)
+                    self.shelf_generation = generation
+            writing = write and not self.writing
+            self.writing = self.writing or write
+            self.shelf_depth += 1
+            try:
+                yield self.shelf
+            finally:
+                self.shelf_depth -= 1
+                if writing:
+                    self.writing = False
+                    if self.modified:
+                        self.modified = False
+                        self.written = True
+                        # Closing the shelf below syncs it otherwise.
+                        if self.shelf_depth:
+                            self.shelf.sync()
+                        self.next_generation()
+                if self.shelf_depth == 0 and self.written:
+                    self.written = False
+                    self.close_shelf()
+
+    def close_shelf(self):
+        """Close the shelf if it is open."""
+        if self.shelf is not None:
+            self.shelf.close()
+            self.shelf = None
+
+    def close(self):
+        """Release the shelf. All methods after calling this will raise
+        ValueError."""
+        with self.lock:
+            if self.lock_file is not None:
+                self.close_shelf()
+                self.lock_file.close()
+                self.lock_file = None
+
+    def get(self, key):
+        """Return the record stored under the key, or None."""
+        with self.open_shelf() as shelf:
+            return shelf.get(key)
+
+    def get_many(self, keys):
+        """Return a dict mapping the given keys to their records. Keys that
+        are not in the store are left out."""
+        with self.open_shelf() as shelf:
+            return CacheBackend.get_many(self, keys)
+
+    def put_many(self, items):
+        """Store the records of the given (key, record) pairs."""
+        with self.open_shelf(write=True) as shelf:
+            for key, record in items:
+                shelf[key] = record
+                self.modified = True
+
+    def keys(self):
+        """Return a list of the keys in the store."""
+        with self.open_shelf() as shelf:
+            return list(shelf.keys())
+
+    def items(self):
+        """Generate the (key, record) pairs in the store."""
+        with self.open_shelf() as shelf:
+            for key in list(shelf.keys()):
+                yield key, shelf[key]
+
+    def batch(self):
+        """Context manager holding an exclusive lock on the shelf for the
+        writes made inside it, which are synced together."""
+        return self.open_shelf(write=True)
+
+    def suffixes(self, filename=None):
+        """Return the suffixes, added to the filename, of the files making up
+        the shelf."""
+        filename = self.filename if filename is None else filename
+        return [
+            suffix
+            for suffix in ("",) + shelf_suffixes
+            if os.path.isfile(filename + suffix)
+        ]
+
+    def file_size(self):
+        """Return the number of bytes the shelf takes on disk."""
+        with self.locked():
+            if self.shelf is not None:
+                self.shelf.sync()
+            return sum(
+                os.path.getsize(self.filename + suffix) for suffix in self.suffixes()
+            )
+
+    def compact(self):
+        """Rewrite the shelf into new files holding only its current records,
+        and return the number of bytes reclaimed."""
+        with self.locked(write=True):
+            before = self.file_size()
+            temp = self.filename + ".compact"
+            with shelve.open(temp, "n") as new, self.open_shelf() as shelf:
+                for key in shelf.keys():
+                    new[key] = shelf[key]
+            self.close_shelf()
+            for suffix in self.suffixes():
+                os.remove(self.filename + suffix)
+            for suffix in self.suffixes(temp):
+                os.replace(temp + suffix, self.filename + suffix)
+            self.next_generation()
+            return before - self.file_size()
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    Backend keeping records in an SQLite database in write-ahead-log mode.
+
+    Each record is one row holding its timestamp in an indexed column and
+    the rest of the record in the compact encoding of record_codec, so a
+    lookup is a single indexed read. Institution names are interned in a
+    table of their own. Writes made inside a batch() block are committed
+    in one transaction.
+
+    Rows also hold the time their record was last used, for eviction. Uses
+    are noted in memory and written with the next transaction, so reads
+    never write to the database.
+    """
+
+    name = "sqlite"
+
+    # Largest number of ids looked up in one query.
+    query_size = 500
+    # Seconds to wait for other processes sharing the database to finish
+    # writing before giving up.
+    busy_timeout = 60.0
+
+    def __init__(self, filename="geneacache"):
+        self.filename = filename
+        self.path = sqlite_path(filename)
+        self.lock = threading.RLock()
+        self.batch_depth = 0
+        # Times records were used that are not yet written, by id.
+        self.accessed = {}
+        # Interned institution names by number, and numbers by name.
+        self.institution_names = {}
+        self.institution_ids = {}
+        self.db = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout,
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS records (
+                id INTEGER PRIMARY KEY,
+                timestamp REAL NOT NULL,
+                data BLOB NOT NULL,
+                accessed REAL NOT NULL
+            )""")
+        self.db.execute(
+            "CREATE INDEX IF NOT EXISTS records_timestamp ON records (timestamp)"
+        )
+        self.db.execute(
+            "CREATE INDEX IF NOT EXISTS records_accessed ON records (accessed)"
+        )
+        self.db.execute("""CREATE TABLE IF NOT EXISTS institutions (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE
+            )""")
+        self.load_institutions()
+
+    def __delitem__(self, key):
+        with self.lock:
+            self.check_open()
+            cursor = self.db.execute("DELETE FROM records WHERE id = ?", (int(key),))
+        if cursor.rowcount == 0:
+            raise KeyError(key)
+
+    def __len__(self):
+        with self.lock:
+            self.check_open()
+            return self.db.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def check_open(self):
+        """Raise ValueError if the database has been closed."""
+        if self.db is None:
+            raise ValueError("invalid operation on closed cache")
+
+    def close(self):
+        """Close the database. All methods after calling this will raise
+        ValueError."""
+        with self.lock:
+            if self.db is not None:
+                if self.accessed:
+                    # Write the pending uses.
+                    with self.batch():
+                        pass
+                self.db.close()
+                self.db = None
+
+    def get(self, key):
+        """Return the record stored under the key, or None."""
+        with self.lock:
+            self.check_open()
+            row = self.db.execute(
+                "SELECT timestamp, data FROM records WHERE id = ?", (int(key),)
+            ).fetchone()
+        if row is None:
+            return None
+        self.touch([key])
+        return self.decode_row(row)
+
+    def get_many(self, keys):
+        """Return a dict mapping the given keys to their records. Keys that
+        are not in the store are left out."""
+        keys = list(keys)
+        records = {}
+        for start in range(0, len(keys), self.query_size):
+            chunk = {int(key): key for key in keys[start : start + self.query_size]}
+            query = "SELECT id, timestamp, data FROM records WHERE id IN ({})".format(
+                ", ".join("?" * len(chunk))
+            )
+            with self.lock:
+                self.check_open()
+                rows = self.db.execute(query, list(chunk)).fetchall()
+            for row in rows:
+                records[chunk[row[0]]] = self.decode_row(row[1:])
+        self.touch(records)
+        return records
+
+    def put_many(self, items):
+        """Store the records of the given (key, record) pairs in one
+        transaction."""
+        now = time()
+        with self.batch():
+            # Encoding may intern new institutions, which must be written in
+            # the same transaction.
+            rows = [self.encode_row(key, record) + (now,) for key, record in items]
+            self.db.executemany(
+                "INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?)", rows
+            )
+
+    def keys(self):
+        """Return a list of the keys in the store."""
+        with self.lock:
+            self.check_open()
+            rows = self.db.execute("SELECT id FROM records ORDER BY id").fetchall()
+        return [str(row[0]) for row in rows]
+
+    def items(self):
+        """Generate the (key, record) pairs in the store, in id order."""
+        last = None
+        while True:
+            # Read in chunks so the whole store is never held in memory.
+            with self.lock:
+                self.check_open()
+                rows = self.db.execute(
+                    "SELECT id, timestamp, data FROM records WHERE id > ? "
+                    "ORDER BY id LIMIT ?",
+                    (last if last is not None else -(2**63), self.query_size),
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield str(row[0]), self.decode_row(row[1:])
+            last = rows[-1][0]
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Context manager committing the writes made inside it in one
+        transaction. Batches may be nested; the outermost one commits."""
+        with self.lock:
+            self.check_open()
+            if self.batch_depth == 0:
+                self.db.execute("BEGIN IMMEDIATE")
+                self.write_accessed()
+            self.batch_depth += 1
+            try:
+                yield self
+            except BaseException:
+                self.batch_depth -= 1
+                if self.batch_depth == 0:
+                    self.db.execute("ROLLBACK")
+                    # Institutions interned in the transaction are gone.
+                    self.institution_names.clear()
+                    self.institution_ids.clear()
+                    self.load_institutions()
+                raise
+            self.batch_depth -= 1
+            if self.batch_depth == 0:
+                self.db.execute("COMMIT")
+
+    def encode_row(self, key, record):
+        """Return the (id, timestamp, data) row storing a record."""
+        record = dict(record)
+        timestamp = record.pop("timestamp")
+        return int(key), timestamp, encode_record(record, self.intern)
+
+    def decode_row(self, row):
+        """Return the record stored in a (timestamp, data) row."""
+        record = decode_record(row[1], self.institution_name)
+        record["timestamp"] = row[0]
+        return record
+
+    def load_institutions(self):
+        """Read the interned institution names."""
+        with self.lock:
+            for id, name in self.db.execute("SELECT id, name FROM institutions"):
+                self.institution_names[id] = name
+                self.institution_ids[name] = id
+
+    def intern(self, name):
+        """Return the number of an institution name, interning the name if
+        it is new. Called within a transaction."""
+        id = self.institution_ids.get(name)
+        if id is None:
+            self.db.execute(
+                "INSERT OR IGNORE INTO institutions (name) VALUES (?)", (name,)
+            )
+            id = self.db.execute(
+                "SELECT id FROM institutions WHERE name = ?", (name,)
+            ).fetchone()[0]
+            self.institution_names[id] = name
+            self.institution_ids[name] = id
+        return id
+
+    def institution_name(self, id):
+        """Return the institution name with the given number."""
+        name = self.institution_names.get(id)
+        if name is None:
+            # The name may have been interned by another connection.
+            self.load_institutions()
+            name = self.institution_names.get(id)
+            if name is None:
+                raise ValueError("Unknown institution {}".format(id))
+        return name
+
+    def touch(self, keys):
+        """Note that the records with the given keys were used."""
+        now = time()
+        with self.lock:
+            for key in keys:
+                self.accessed[int(key)] = now
+
+    def write_accessed(self):
+        """Write the noted uses of records to the database. Called within a
+        transaction."""
+        accessed, self.accessed = self.accessed, {}
+        self.db.executemany(
+            "UPDATE records SET accessed = ? WHERE id = ?",
+            [(stamp, id) for id, stamp in accessed.items()],
+        )
+
+    def data_size(self):
+        """Return the number of bytes of record data in the store."""
+        with self.lock:
+            self.check_open()
+            return self.db.execute(
+                "SELECT COALESCE(SUM(LENGTH(data)), 0) FROM records"
+            ).fetchone()[0]
+
+    def evict(self, max_size, expired_before=None):
+        """Remove records until the record data fits in max_size bytes, and
+        return the number of records removed. Records stamped before
+        expired_before go first, then the least recently used ones."""
+        with self.batch():
+            size = self.data_size()
+            if size <= max_size:
+                return 0
+            evicted = 0
+            if expired_before is not None:
+                evicted += self.db.execute(
+                    "DELETE FROM records WHERE timestamp < ?", (expired_before,)
+                ).rowcount
+                size = self.data_size()
+            victims = []
+            rows = self.db.execute(
+                "SELECT id, LENGTH(data) FROM records ORDER BY accessed"
+            )
+            for id, length in rows:
+                if size <= max_size:
+                    break
+                victims.append((id,))
+                size -= length
+            rows.close()
+            self.db.executemany("DELETE FROM records WHERE id = ?", victims)
+        return evicted + len(victims)
+
+    def file_size(self):
+        """Return the number of bytes the database takes on disk, including
+        its write-ahead log."""
+        return sum(
+            os.path.getsize(path)
+            for path in (self.path, self.path + "-wal", self.path + "-shm")
+            if os.path.exists(path)
+        )
+
+    def compact(self):
+        """Rewrite the database without free space and fold the write-ahead
+        log back into it, and return the number of bytes reclaimed."""
+        with self.lock:
+            self.check_open()
+            if self.accessed:
+                with self.batch():
+                    pass
+            before = self.file_size()
+            self.db.execute("VACUUM")
+            self.db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            return before - self.file_size()
+
+
+class LRUBackend(CacheBackend):
+    """
+    Backend keeping the most recently used records of another backend in
+    memory, so repeated lookups of a record need not read and unpickle it
+    again.
+
+    The memory tier is bounded both by a number of entries and by an
+    approximate number of bytes, and the least recently used records are
+    evicted first. Every write through this backend invalidates the
+    records written, so the two tiers never disagree. Lookups answered
+    from memory and from the wrapped backend are counted in hits and
+    misses.
+    """
+
+    def __init__(self, store, max_entries=4096, max_bytes=32 * 2**20):
+        self.store = store
+        self.filename = store.filename
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.RLock()
+        # Records by key, least recently used first, each with its size.
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __delitem__(self, key):
+        with self.lock:
+            self.invalidate(key)
+            del self.store[key]
+
+    def __len__(self):
+        return len(self.store)
+
+    def close(self):
+        """Drop the records in memory and close the wrapped backend."""
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+            self.store.close()
+
+    def get(self, key):
+        """Return the record stored under the key, or None."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                self.store.touch([key])
+                return copy_record(entry[0])
+            self.misses += 1
+            record = self.store.get(key)
+            if record is not None:
+                self.remember(key, record)
+        return record
+
+    def get_many(self, keys):
+        """Return a dict mapping the given keys to their records. Keys that
+        are not in the store are left out."""
+        records = {}
+        missing = []
+        with self.lock:
+            for key in keys:
+                entry = self.entries.get(key)
+                if entry is not None:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    records[key] = copy_record(entry[0])
+                else:
+                    missing.append(key)
+            self.store.touch(records)
+            self.misses += len(missing)
+            if missing:
+                for key, record in self.store.get_many(missing).items():
+                    self.remember(key, record)
+                    records[key] = record
+        return records
+
+    def put_many(self, items):
+        """Store the records of the given (key, record) pairs in the wrapped
+        backend, dropping any copies of them held in memory."""
+        items = list(items)
+        with self.lock:
+            for key, record in items:
+                self.invalidate(key)
+            self.store.put_many(items)
+
+    def keys(self):
+        """Return a list of the keys in the store."""
+        return self.store.keys()
+
+    def items(self):
+        """Generate the (key, record) pairs in the wrapped backend, without
+        filling the memory tier."""
+        return self.store.items()
+
+    def batch(self):
+        """Context manager grouping writes in the wrapped backend."""
+        return self.store.batch()
+
+    def data_size(self):
+        """Return the number of bytes of record data in the wrapped
+        backend."""
+        return self.store.data_size()
+
+    def evict(self, max_size, expired_before=None):
+        """Evict records from the wrapped backend, dropping every record
+        held in memory."""
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+            return self.store.evict(max_size, expired_before)
+
+    def file_size(self):
+        """Return the number of bytes the wrapped backend takes on disk."""
+        return self.store.file_size()
+
+    def compact(self):
+        """Compact the wrapped backend."""
+        with self.lock:
+            return self.store.compact()
+
+    def remember(self, key, record):
+        """Keep a copy of a record in memory, evicting the least recently
+        used records to make room for it."""
+        size = record_size(record)
+        if self.max_entries <= 0 or size > self.max_bytes:
+            return
+        self.invalidate(key)
+        self.entries[key] = (copy_record(record), size)
+        self.size += size
+        while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+            key, (record, size) = self.entries.popitem(last=False)
+            self.size -= size
+
+    def invalidate(self, key):
+        """Drop the copy of a record held in memory, if there is one."""
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
+
+    def summary(self):
+        """Return a one-line description of the lookups made."""
+        lookups = self.hits + self.misses
+        rate = 100.0 * self.hits / lookups if lookups else 0.0
+        return "{} memory cache hits, {} misses ({:.1f}% hit rate)".format(
+            self.hits, self.misses, rate
+        )
+
+
+def record_size(record):
+    """Return the approximate number of bytes of memory used by a record."""
+    size = sys.getsizeof(record)
+    for value in record.values():
+        size += sys.getsizeof(value)
+        if isinstance(value, (set, frozenset, list, tuple)):
+            size += sum(sys.getsizeof(item) for item in value)
+    return size
+
+
+def copy_record(record):
+    """Return a copy of a record that shares none of its sets, such as the
+    advisor and descendant ids, with it."""
+    return dict(
+        (key, set(value) if isinstance(value, set) else value)
+        for key, value in record.items()
+    )
+
+
+# Suffixes of the files making up a shelf, which depend on the dbm flavour.
+shelf_suffixes = (".db", ".dat", ".dir", ".bak", ".pag")
+# The generation number at the start of the lock file of a shelf.
+generation_struct = struct.Struct("<Q")
+
+
+def open_shelf_file(filename):
+    """Open a shelf for reading and writing. GNU dbm locks the files it
+    opens for writing, which would keep other processes out of a shelf
+    kept open, so it is told not to; the lock file does that instead."""
+    flag = "c"
+    # New shelves are made with GNU dbm when it is available.
+    if dbm_gnu is not None and dbm.whichdb(filename) in ("dbm.gnu", None):
+        flag = "cu"
+    return shelve.open(filename, flag)
+
+
+def sqlite_path(filename):
+    """Return the path of the SQLite database for a cache filename."""
+    return filename + ".sqlite"
+
+
+# Backends by the names used to select them.
+backends = {backend.name: backend for backend in (SQLiteBackend, ShelveBackend)}
+
+
+def default_backend(filename):
+    """Return the name of the backend of the cache filename: shelve if only
+    a shelve cache exists for it, and sqlite otherwise."""
+    if not os.path.exists(sqlite_path(filename)) and any(
+        os.path.isfile(filename + suffix) for suffix in ("",) + shelf_suffixes
+    ):
+        return ShelveBackend.name
+    return SQLiteBackend.name
+
+
+def open_backend(name, filename):
+    """Open the backend with the given name for a cache filename. With no
+    name, the backend is the default_backend of the filename."""
+    if name is None:
+        name = default_backend(filename)
+    try:
+        backend = backends[name]
+    except KeyError:
+        raise ValueError("Unknown cache backend {}".format(name))
+    return backend(filename)
+
+
+def migrate(filename, source="shelve", target="sqlite"):
+    """Copy the records of the cache in one backend into another backend for
+    the same cache filename, and return the number of records copied.
+    Records already in the target are replaced."""
+    count = 0
+    with open_backend(source, filename) as old, open_backend(target, filename) as new:
+        with new.batch():
+            for key, record in old.items():
+                new[key] = record
+                count += 1
+    return count
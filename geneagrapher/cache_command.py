@@ -0,0 +1,271 @@
+from argparse import ArgumentParser, ArgumentTypeError
+from datetime import datetime
+import os
+from .cache_backends import backends, migrate as migrate_cache
+from .cache_grabber import CacheGrabber
+from .cache_snapshot import export_snapshot, import_snapshot, is_snapshot
+from .graph import write_csr_graph
+from .page_import import directory_pages, import_pages, warc_pages
+
+
+def add_cache_file_argument(parser):
+    """Add the option naming the cache file to a command's parser."""
+    parser.add_argument(
+        "--cache-file",
+        dest="cache_file",
+        help="use the cache in FILE [default: geneacache]",
+        metavar="FILE",
+        default="geneacache",
+    )
+
+
+def add_cache_backend_argument(parser):
+    """Add the option selecting the cache backend to a parser."""
+    parser.add_argument(
+        "--cache-backend",
+        dest="cache_backend",
+        choices=sorted(backends),
+        help="store the cache with BACKEND [default: sqlite, or shelve for an \
+existing shelve cache]",
+        metavar="BACKEND",
+        default=None,
+    )
+
+
+def parse_size(value):
+    """Return the number of bytes given by a size such as 500000, 64K, 32M
+    or 2G, with binary multiples."""
+    units = {"K": 2**10, "M": 2**20, "G": 2**30}
+    text = value.strip().upper().rstrip("B")
+    multiple = 1
+    if text[-1:] in units:
+        multiple = units[text[-1]]
+        text = text[:-1]
+    try:
+        size = int(float(text) * multiple)
+    except ValueError:
+        raise ArgumentTypeError("invalid size: {}".format(value))
+    if size < 0:
+        raise ArgumentTypeError("invalid size: {}".format(value))
+    return size
+
+
+def parse_time(value):
+    """Return the time given as seconds since the epoch or as an ISO 8601
+    date and time, in seconds since the epoch. Times without a time zone
+    are local."""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        raise ArgumentTypeError("invalid time: {}".format(value))
+
+
+def reparse_command(args):
+    """Extract the cached records again from their archived pages."""
+    with CacheGrabber(
+        args.cache_file, archive=True, backend=args.cache_backend
+    ) as cache:
+        count = cache.reparse(args.force)
+    print("Reparsed {} records".format(count))
+
+
+def compact_command(args):
+    """Evict records from the cache if it is over a size, then rewrite it
+    tightly."""
+    with CacheGrabber(
+        args.cache_file, backend=args.cache_backend, max_size=args.max_size
+    ) as cache:
+        if args.max_size is not None:
+            print("Evicted {} records".format(cache.evict()))
+        reclaimed = cache.cache.compact()
+        size = cache.cache.file_size()
+    print("Reclaimed {} bytes; the cache now takes {} bytes".format(reclaimed, size))
+
+
+def migrate_command(args):
+    """Copy the records of a cache from one backend into another."""
+    count = migrate_cache(args.cache_file, args.source, args.target)
+    print("Migrated {} records".format(count))
+
+
+def export_command(args):
+    """Write the records of the cache, or those grabbed since a time, to a
+    snapshot file."""
+    with CacheGrabber(args.cache_file, backend=args.cache_backend) as cache:
+        count = export_snapshot(cache.cache, args.snapshot, args.since)
+    print("Exported {} records".format(count))
+
+
+def import_command(args):
+    """Load the records of a snapshot file, a directory of pages or a WARC
+    file into the cache."""
+    with CacheGrabber(args.cache_file, backend=args.cache_backend) as cache:
+        if is_snapshot(args.source):
+            imported, kept = import_snapshot(cache.cache, args.source)
+            print(
+                "Imported {} records; kept {} more recent cached records".format(
+                    imported, kept
+                )
+            )
+            return
+        if os.path.isdir(args.source):
+            pages = directory_pages(args.source)
+        else:
+            pages = warc_pages(args.source)
+        imported, skipped = import_pages(cache, pages, args.processes)
+    print("Imported {} records; skipped {} pages".format(imported, skipped))
+
+
+def graph_command(args):
+    """Write the genealogy graph of the cached records to a CSR graph
+    file."""
+    with CacheGrabber(args.cache_file, backend=args.cache_backend) as cache:
+        nodes, links = write_csr_graph(cache.cache.items(), args.graph_file)
+    print("Wrote {} mathematicians and {} advisor links".format(nodes, links))
+
+
+def cache_main(argv=None):
+    """Function to run the cache maintenance commands. This is the function
+    called when the ggrapher script is run with "cache" as its first
+    argument."""
+    parser = ArgumentParser(
+        prog="ggrapher cache", description="Maintain the Geneagrapher record cache."
+    )
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND")
+    subparsers.required = True
+
+    reparse = subparsers.add_parser(
+        "reparse",
+        help="rebuild stale records from the page archive",
+        description="Extract records again from the pages archived alongside \
+the cache, without requesting any pages. By default only records extracted by \
+an older version of Geneagrapher are rebuilt.",
+    )
+    add_cache_file_argument(reparse)
+    add_cache_backend_argument(reparse)
+    reparse.add_argument(
+        "--force",
+        action="store_true",
+        dest="force",
+        default=False,
+        help="rebuild every archived record",
+    )
+    reparse.set_defaults(func=reparse_command)
+
+    compact = subparsers.add_parser(
+        "compact",
+        help="shrink the cache file",
+        description="Rewrite the cache without the space left by replaced and \
+removed records, and report the space reclaimed. With --max-size, records are \
+first evicted until the cache fits: expired records first, then the least \
+recently used ones (the least recently retrieved with the shelve backend).",
+    )
+    add_cache_file_argument(compact)
+    add_cache_backend_argument(compact)
+    compact.add_argument(
+        "--max-size",
+        dest="max_size",
+        type=parse_size,
+        default=None,
+        help="evict records until the record data takes at most SIZE bytes; \
+K, M and G suffixes are accepted",
+        metavar="SIZE",
+    )
+    compact.set_defaults(func=compact_command)
+
+    migrate = subparsers.add_parser(
+        "migrate",
+        help="copy the cache into another backend",
+        description="Copy the records of a cache kept by one backend into \
+another backend. By default a legacy shelve cache is copied into SQLite.",
+    )
+    add_cache_file_argument(migrate)
+    migrate.add_argument(
+        "--from",
+        dest="source",
+        choices=sorted(backends),
+        help="backend to copy from [default: shelve]",
+        metavar="BACKEND",
+        default="shelve",
+    )
+    migrate.add_argument(
+        "--to",
+        dest="target",
+        choices=sorted(backends),
+        help="backend to copy into [default: sqlite]",
+        metavar="BACKEND",
+        default="sqlite",
+    )
+    migrate.set_defaults(func=migrate_command)
+
+    export = subparsers.add_parser(
+        "export",
+        help="write the cache to a snapshot file",
+        description='Write the records of the cache to a single compressed \
+snapshot file, which can be loaded into a cache with any backend on any \
+system with "ggrapher cache import". The snapshot holds a checksum of its \
+contents, which is verified before it is loaded. With --since, only the \
+records grabbed after a time are exported, making a delta that brings a cache \
+exported from before then up to date.',
+    )
+    export.add_argument("snapshot", metavar="FILE", help="snapshot file to write")
+    add_cache_file_argument(export)
+    add_cache_backend_argument(export)
+    export.add_argument(
+        "--since",
+        dest="since",
+        type=parse_time,
+        default=None,
+        help="export only the records grabbed after TIME, given in seconds \
+since the epoch or as an ISO 8601 date and time",
+        metavar="TIME",
+    )
+    export.set_defaults(func=export_command)
+
+    import_ = subparsers.add_parser(
+        "import",
+        help="load records from a snapshot or saved pages",
+        description='Load records into the cache from SOURCE, which is a \
+snapshot written by "ggrapher cache export", a directory of saved record \
+pages named ID.html, or a WARC file of saved pages, which may be \
+gzip-compressed. Records extracted from pages are stamped with the time each \
+page was saved. A cached record is only replaced by a more recent one, so \
+snapshots and deltas may be imported in any order.',
+    )
+    import_.add_argument(
+        "source", metavar="SOURCE", help="snapshot, directory or WARC file"
+    )
+    add_cache_file_argument(import_)
+    add_cache_backend_argument(import_)
+    import_.add_argument(
+        "--processes",
+        dest="processes",
+        type=int,
+        default=None,
+        help="extract records from pages in N processes [default: one per \
+CPU]",
+        metavar="N",
+    )
+    import_.set_defaults(func=import_command)
+
+    graph = subparsers.add_parser(
+        "graph",
+        help="write the cached genealogy to a graph file",
+        description="Write the genealogy graph of the cached records to a \
+compact read-only file, which geneagrapher.graph.CSRGraph memory-maps to \
+answer advisor, student, ancestor and descendant queries without building a \
+Graph.",
+    )
+    graph.add_argument("graph_file", metavar="FILE", help="graph file to write")
+    add_cache_file_argument(graph)
+    add_cache_backend_argument(graph)
+    graph.set_defaults(func=graph_command)
+
+    args = parser.parse_args(argv)
+    if args.command == "migrate" and args.source == args.target:
+        parser.error("cannot migrate a cache into the backend it is in")
+    args.func(args)
@@ -1,16 +1,55 @@
-import shelve
+import threading
 from time import time
-from .grabber import Grabber
+from .cache_backends import LRUBackend, open_backend
+from .grabber import SCHEMA_VERSION, Grabber, get_record_from_html, grab_records
+from .page_archive import PageArchive
+from .single_flight import SingleFlight
 
 
 class CacheGrabber:
+    # Largest number of grabbed records written to the cache in one batch.
+    write_batch_size = 100
+    # Number of records written between checks of the size of the cache.
+    evict_interval = 1000
+
     def __init__(
-        self, filename="geneacache", record_grabber=Grabber, expiration_interval=604800.
+        self,
+        filename="geneacache",
+        record_grabber=Grabber,
+        expiration_interval=604800.,
+        archive=False,
+        backend=None,
+        memory_entries=4096,
+        memory_bytes=32 * 2**20,
+        max_size=None,
+        single_flight=None,
     ):
         self.filename = filename
         self.grabber = record_grabber()
         self.expiration_interval = float(expiration_interval)
-        self.cache = shelve.open(filename)
+        # When set, the record data in the cache is kept within max_size
+        # bytes by evicting records.
+        self.max_size = max_size
+        self.writes_since_evict = 0
+        # Recently used records are kept in memory in front of the backend.
+        # Its hits and misses attributes count the lookups answered by each
+        # tier.
+        self.cache = LRUBackend(
+            open_backend(backend, filename), memory_entries, memory_bytes
+        )
+        # Serializes access to the cache, as not every backend is safe to
+        # share between threads. Record grabbing itself happens outside of
+        # the lock.
+        self.lock = threading.Lock()
+        # Threads asking for a record that is already being grabbed wait for
+        # that grab instead of starting their own. Its saved attribute
+        # counts the grabs saved.
+        if single_flight is None:
+            single_flight = SingleFlight()
+        self.single_flight = single_flight
+        # When archiving, the raw pages of grabbed records are kept alongside
+        # the cache so the records can be extracted again later.
+        self.archive = PageArchive(filename + ".pages") if archive else None
 
     def __enter__(self):
         return self
@@ -21,35 +60,229 @@ class CacheGrabber:
     def close(self):
         """Close the cache. All methods after calling this will raise
         ValueError."""
+        self.evict()
         self.cache.close()
+        if self.archive is not None:
+            self.archive.close()
+        if hasattr(self.grabber, "close"):
+            self.grabber.close()
+
+    def evict(self):
+        """Remove records until the cache fits in its maximum size, expired
+        records first and then the least recently used ones, or the least
+        recently grabbed ones with a backend that does not note uses, and
+        return the number of records removed."""
+        if self.max_size is None:
+            return 0
+        with self.lock:
+            self.writes_since_evict = 0
+            return self.cache.evict(
+                self.max_size, time() - self.expiration_interval
+            )
 
     def is_expired(self, record):
         """Returns True if the given record is expired."""
         return time() - record["timestamp"] > self.expiration_interval
 
+    def is_stale(self, record):
+        """Returns True if the given record was extracted by an older
+        version of the extractors."""
+        return record.get("schema", 1) < SCHEMA_VERSION
+
     def get_record(self, id):
         """Return information for the mathematician associated with the given
         id."""
-        id_str = str(id)
-        if self.is_cached(id_str):
-            record = self.cache[id_str]
-            record["message"] = "cache hit"
+        with self.lock:
+            record = self.cache.get(str(id))
+        if record is not None and self.is_expired(record):
+            record = None
+        return self.finish_record(id, record)
+
+    def get_records(self, ids):
+        """Generate (id, record) pairs for the mathematicians associated with
+        the given ids. Cached records are looked up together and generated
+        first; the rest are then grabbed as a batch and generated as they
+        arrive, and written to the cache in batches."""
+        ids = list(ids)
+        with self.lock:
+            cached = self.cache.get_many([str(id) for id in ids])
+        misses = []
+        hits = []
+        for id in ids:
+            record = cached.get(str(id))
+            if record is not None and not self.is_expired(record):
+                hits.append((id, record))
+            else:
+                misses.append(id)
+
+        for id, record in hits:
+            yield id, self.finish_record(id, record)
+
+        if self.archive is not None:
+            # Pages are grabbed one at a time so they can be archived.
+            for id in misses:
+                yield id, self.finish_record(id, None)
+            return
+
+        # Records already being grabbed by another thread are waited for
+        # once the others are grabbed.
+        owned = {}
+        shared = []
+        for id in misses:
+            call, leader = self.single_flight.begin(id)
+            if leader:
+                owned[id] = call
+            else:
+                shared.append((id, call))
+
+        pending = []
+        try:
+            for id, record in grab_records(self.grabber, list(owned)):
+                result = dict(record, message="cache miss")
+                pending.append((id, record))
+                if len(pending) == self.write_batch_size:
+                    self.write_grabbed(pending, owned)
+                    pending = []
+                yield id, result
+        finally:
+            # Records grabbed before an error are kept, and the grabs given
+            # up are left to the threads waiting for them.
+            try:
+                if pending:
+                    self.write_grabbed(pending, owned)
+            finally:
+                for id in owned:
+                    self.single_flight.finish(id)
+
+        for id, call in shared:
+            record = self.single_flight.wait(call)
+            if record is None:
+                yield id, self.finish_record(id, None)
+            else:
+                yield id, self.strip_record(dict(record), "cache miss")
+
+    def write_grabbed(self, records, owned):
+        """Write grabbed records, given as (id, record) pairs, to the cache
+        and hand them to the threads waiting for them."""
+        with self.lock:
+            self.load_many_into_cache(records)
+        for id, record in records:
+            self.single_flight.finish(id, dict(record))
+            del owned[id]
+
+    def finish_record(self, id, record):
+        """Return the record for the given id, given its cached version (or
+        None if it is not cached). Stale records are extracted again from
+        their archived pages, and records that are not cached, or stale but
+        not archived, are grabbed."""
+        message = "cache hit"
+        if record is not None and self.is_stale(record):
+            record = self.reparse_record(id)
+            message = "cache reparse"
+        if record is None:
+            # The grabbed record may be shared with other threads.
+            record = dict(self.single_flight.do(id, self.grab, id))
+            message = "cache miss"
+        return self.strip_record(record, message)
+
+    def strip_record(self, record, message):
+        """Replace the cache bookkeeping fields of a record by the message
+        describing how it was obtained."""
+        del (record["timestamp"])
+        record.pop("schema", None)
+        record["message"] = message
+        return record
+
+    def grab(self, id):
+        """Grab the record for the given id, archive its page if archiving
+        is enabled, and insert it into the cache."""
+        timestamp = time()
+        if self.archive is not None and hasattr(self.grabber, "get_page"):
+            page, encoding = self.grabber.get_page(id)
+            record = get_record_from_html(page, id, encoding)
+            self.archive.store_page(id, page, encoding, timestamp)
         else:
             record = self.grabber.get_record(id)
-            self.load_into_cache(id, record)
-            record["message"] = "cache miss"
-        del (record["timestamp"])
+        with self.lock:
+            self.load_into_cache(id, record, timestamp)
         return record
 
+    def reparse_record(self, id):
+        """Extract the record for the given id again from its archived page
+        and insert it into the cache, keeping the time the page was grabbed
+        as its timestamp. Returns None if the page is not archived."""
+        reparsed = self.reparse_page(id)
+        if reparsed is None:
+            return None
+        record, timestamp = reparsed
+        with self.lock:
+            self.load_into_cache(id, record, timestamp)
+        return record
+
+    def reparse_page(self, id):
+        """Return a (record, timestamp) pair of the record extracted from the
+        archived page for the given id and the time the page was grabbed,
+        or None if the page is not archived."""
+        if self.archive is None:
+            return None
+        archived = self.archive.get_page(id)
+        if archived is None:
+            return None
+        page, encoding, timestamp = archived
+        return get_record_from_html(page, id, encoding), timestamp
+
+    def reparse(self, force=False):
+        """Extract the records of all archived pages again, without any
+        network requests, and return the number of records rebuilt. Only
+        stale or uncached records are rebuilt unless force is True."""
+        if self.archive is None:
+            raise ValueError("cache has no page archive")
+        count = 0
+        # The grabber lock is taken before the lock of the backend's batch,
+        # in the same order as everywhere else.
+        with self.lock, self.cache.batch():
+            for id in self.archive.ids():
+                if not force:
+                    record = self.cache.get(str(id))
+                    if record is not None and not self.is_stale(record):
+                        continue
+                reparsed = self.reparse_page(id)
+                if reparsed is None:
+                    continue
+                record, timestamp = reparsed
+                self.load_into_cache(id, record, timestamp)
+                count += 1
+        return count
+
     def is_cached(self, id):
         """Return True if an item with the given id is in the cache and has
         not expired."""
-        return str(id) in self.cache and not self.is_expired(self.cache[str(id)])
+        with self.lock:
+            record = self.cache.get(str(id))
+        return record is not None and not self.is_expired(record)
 
-    def load_into_cache(self, id, record):
+    def load_into_cache(self, id, record, timestamp=None):
         """Insert a new record into the cache.
 
         If the record already exists, its values are replaced with the values
-        provided as input to this method."""
-        record["timestamp"] = time()
-        self.cache[str(id)] = record
+        provided as input to this method. The record is stamped with the
+        given time, or the current time if none is given."""
+        self.load_many_into_cache([(id, record)], timestamp)
+
+    def load_many_into_cache(self, records, timestamp=None):
+        """Insert new records, given as (id, record) pairs, into the cache
+        in one batch, stamping them as load_into_cache does."""
+        if timestamp is None:
+            timestamp = time()
+        items = []
+        for id, record in records:
+            record["timestamp"] = timestamp
+            record["schema"] = SCHEMA_VERSION
+            items.append((str(id), record))
+        self.cache.put_many(items)
+        self.writes_since_evict += len(items)
+        if self.max_size is not None and (
+            self.writes_since_evict >= self.evict_interval
+        ):
+            self.writes_since_evict = 0
+            self.cache.evict(self.max_size, time() - self.expiration_interval)
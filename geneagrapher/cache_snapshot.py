@@ -0,0 +1,193 @@
+import gzip
+import hashlib
+from itertools import islice
+import json
+import struct
+from time import time
+from .record_codec import decode_record, encode_record, read_varint, write_varint
+
+# Snapshot files start with this line, followed by a JSON header padded to
+# header_size bytes and then the gzip-compressed records.
+MAGIC = b"GGCACHE\n"
+SNAPSHOT_FORMAT = "geneagrapher-cache-snapshot"
+SNAPSHOT_VERSION = 1
+header_size = 1024
+
+# Kinds of the entries in the compressed body: an institution name, given
+# the next number, and a record.
+INSTITUTION = b"I"
+RECORD = b"R"
+
+# Number of records written to the cache in one batch when importing.
+import_batch_size = 1000
+# Number of bytes of the body decompressed at a time when reading, and the
+# most bytes an entry takes before its data.
+chunk_size = 2**16
+entry_head_size = 1 + 10 + 8 + 10
+unpack_timestamp = struct.Struct("<d").unpack_from
+pack_timestamp = struct.Struct("<d").pack
+
+
+def export_snapshot(backend, filename, since=None):
+    """Write the records of a cache backend to a snapshot file and return
+    the number of records written. If since is given, only records stamped
+    after that time are written.
+
+    A snapshot does not depend on the backend or the platform it was
+    written on. Its header describes it and holds a checksum of the
+    compressed records, which are in the compact record encoding with
+    their institutions written once."""
+    institutions = {}
+    count = 0
+    with open(filename, "wb") as fout:
+        fout.write(b"\0" * (len(MAGIC) + header_size))
+        with gzip.GzipFile(fileobj=fout, mode="wb", mtime=0) as body:
+
+            def intern(name):
+                number = institutions.get(name)
+                if number is None:
+                    number = institutions[name] = len(institutions) + 1
+                    data = name.encode("utf-8")
+                    out = bytearray(INSTITUTION)
+                    write_varint(out, len(data))
+                    body.write(out + data)
+                return number
+
+            for key, record in backend.items():
+                if since is not None and record["timestamp"] <= since:
+                    continue
+                record = dict(record)
+                timestamp = record.pop("timestamp")
+                data = encode_record(record, intern)
+                out = bytearray(RECORD)
+                write_varint(out, int(key))
+                out += pack_timestamp(timestamp)
+                write_varint(out, len(data))
+                body.write(out + data)
+                count += 1
+        fout.flush()
+        header = {
+            "format": SNAPSHOT_FORMAT,
+            "version": SNAPSHOT_VERSION,
+            "created": time(),
+            "since": since,
+            "records": count,
+            "compression": "gzip",
+            "sha256": checksum(fout.name),
+        }
+        fout.seek(0)
+        fout.write(MAGIC + json.dumps(header).encode("ascii").ljust(header_size))
+    return count
+
+
+def checksum(filename):
+    """Return the hex SHA-256 digest of the part of a snapshot file after its
+    header."""
+    digest = hashlib.sha256()
+    with open(filename, "rb") as fin:
+        fin.seek(len(MAGIC) + header_size)
+        for chunk in iter(lambda: fin.read(2**20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_snapshot(filename):
+    """Return True if the file is a cache snapshot."""
+    try:
+        with open(filename, "rb") as fin:
+            return fin.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def read_header(filename):
+    """Return the header of a snapshot file, after checking that the file
+    is a snapshot this version can read and that it is intact."""
+    with open(filename, "rb") as fin:
+        if fin.read(len(MAGIC)) != MAGIC:
+            raise ValueError("{} is not a cache snapshot".format(filename))
+        header = json.loads(fin.read(header_size).decode("ascii"))
+    if header.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError("{} is not a cache snapshot".format(filename))
+    if header["version"] > SNAPSHOT_VERSION:
+        raise ValueError("Unsupported snapshot version {}".format(header["version"]))
+    if checksum(filename) != header["sha256"]:
+        raise ValueError("Snapshot {} is corrupt".format(filename))
+    return header
+
+
+def snapshot_records(filename):
+    """Generate the (key, record) pairs held in a snapshot file, after
+    checking the file with read_header."""
+    read_header(filename)
+    names = {}
+    with open(filename, "rb") as fin:
+        fin.seek(len(MAGIC) + header_size)
+        with gzip.GzipFile(fileobj=fin, mode="rb") as body:
+            try:
+                for kind, key, timestamp, data in body_entries(body):
+                    if kind == INSTITUTION:
+                        names[len(names) + 1] = data.decode("utf-8")
+                    elif kind == RECORD:
+                        record = decode_record(data, names.__getitem__)
+                        record["timestamp"] = timestamp
+                        yield str(key), record
+                    else:
+                        raise ValueError(
+                            "Corrupt snapshot entry in {}".format(filename)
+                        )
+            except (IndexError, struct.error):
+                raise ValueError("Snapshot {} is truncated".format(filename))
+
+
+def body_entries(body):
+    """Generate (kind, key, timestamp, data) tuples for the entries of a
+    snapshot body, with key and timestamp None for institutions."""
+    # The body is decompressed a chunk at a time and parsed in place, as a
+    # call per value would take most of the time.
+    data = b""
+    pos = 0
+    while True:
+        if len(data) - pos < entry_head_size:
+            data = data[pos:] + body.read(chunk_size)
+            pos = 0
+            if not data:
+                return
+        kind = data[pos : pos + 1]
+        key = timestamp = None
+        if kind == RECORD:
+            key, pos = read_varint(data, pos + 1)
+            (timestamp,) = unpack_timestamp(data, pos)
+            length, pos = read_varint(data, pos + 8)
+        else:
+            length, pos = read_varint(data, pos + 1)
+        if len(data) - pos < length:
+            data = data[pos:] + body.read(max(length, chunk_size))
+            pos = 0
+            if len(data) < length:
+                raise IndexError("entry runs past the end of the body")
+        yield kind, key, timestamp, data[pos : pos + length]
+        pos += length
+
+
+def import_snapshot(backend, filename):
+    """Merge the records of a snapshot file into a cache backend and return
+    an (imported, kept) pair counting the records loaded and the records
+    skipped because the cache holds a record at least as recent. Nothing
+    is loaded from a corrupt snapshot."""
+    imported = kept = 0
+    # The records are loaded in one transaction where the backend supports
+    # it, so a snapshot that turns out to be truncated loads nothing.
+    with backend.batch():
+        records = snapshot_records(filename)
+        for batch in iter(lambda: list(islice(records, import_batch_size)), []):
+            cached = backend.get_many([key for key, record in batch])
+            newer = [
+                (key, record)
+                for key, record in batch
+                if key not in cached or cached[key]["timestamp"] < record["timestamp"]
+            ]
+            backend.put_many(newer)
+            imported += len(newer)
+            kept += len(batch) - len(newer)
+    return imported, kept
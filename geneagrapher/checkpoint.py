@@ -0,0 +1,139 @@
+import json
+import os
+
+# The first line of a checkpoint file describes the crawl.
+CHECKPOINT_FORMAT = "geneagrapher-crawl-checkpoint"
+CHECKPOINT_VERSION = 1
+
+# Kinds of the lines after the first: a BFS level grabbed, and the end of
+# a portion of the crawl (the seeds, the ancestors or the descendants).
+LEVEL = "level"
+PORTION_END = "end"
+
+
+class CrawlCheckpoint:
+    """
+    Class recording the progress of a crawl in a state file, so that an
+    interrupted crawl can be resumed where it stopped.
+
+    The file is a journal of JSON lines. The first describes the crawl: its
+    seeds and options. A line is added for each BFS level grabbed, with the
+    records added to the graph and the queues of the crawl once the links of
+    the level are queued, and for the end of each portion of the crawl, with
+    the links the crawl limits left out. A level thus costs a line in
+    proportion to its size however large the graph has grown, and a line cut
+    short by an interruption is dropped when the crawl is resumed.
+    """
+
+    def __init__(self, filename, crawl, queues, resume=False):
+        """
+        CrawlCheckpoint class constructor.
+
+        Parameters:
+            filename: name of the state file
+            crawl: dictionary describing the crawl, which the crawl recorded
+                in the file must match to be resumed
+            queues: dictionary of the queues of the portions of the crawl,
+                holding (linked id, id) pairs, written with each level
+            resume: if True and the file exists, read the entries recorded
+                in it, which are then appended to; otherwise the file is
+                started anew
+        """
+        self.filename = filename
+        self.queues = queues
+        self.entries = []
+        if resume and os.path.exists(filename):
+            self.entries = read_checkpoint(filename, crawl)
+            self.outfile = open(filename, "a", encoding="utf-8")
+        else:
+            self.outfile = open(filename, "w", encoding="utf-8")
+            self.write(
+                {
+                    "format": CHECKPOINT_FORMAT,
+                    "version": CHECKPOINT_VERSION,
+                    "crawl": crawl,
+                }
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.outfile.close()
+
+    def write(self, entry):
+        """Append an entry to the file and flush it."""
+        self.outfile.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self.outfile.flush()
+
+    def write_level(self, portion, generation, records):
+        """
+        Record a level of a portion of the crawl, the generation-th, given
+        the (name, institution, year, id, advisors, advisees) tuples added
+        to the graph for it.
+        """
+        self.write(
+            {
+                "kind": LEVEL,
+                "portion": portion,
+                "generation": generation,
+                "records": [
+                    [name, institution, year, id, list(advisors), list(advisees)]
+                    for name, institution, year, id, advisors, advisees in records
+                ],
+                "queues": dict(
+                    (name, [list(pair) for pair in queue])
+                    for name, queue in self.queues.items()
+                ),
+            }
+        )
+
+    def write_portion_end(self, portion, truncated=None):
+        """Record the end of a portion of the crawl, with its dictionary of
+        the links left out of the graph, if any."""
+        self.write(
+            {
+                "kind": PORTION_END,
+                "portion": portion,
+                "truncated": [
+                    [linked, list(ids)] for linked, ids in (truncated or {}).items()
+                ],
+            }
+        )
+
+
+def read_checkpoint(filename, crawl):
+    """
+    Return the list of the entries after the first line of a checkpoint
+    file, raising ValueError if it is not a checkpoint of the given crawl.
+    A last line cut short is cut off the file.
+    """
+    entries = []
+    with open(filename, "rb") as fin:
+        header = fin.readline()
+        try:
+            header = json.loads(header)
+            is_checkpoint = header["format"] == CHECKPOINT_FORMAT
+        except (ValueError, TypeError, KeyError):
+            is_checkpoint = False
+        if not is_checkpoint:
+            raise ValueError("{} is not a crawl checkpoint".format(filename))
+        if header["version"] > CHECKPOINT_VERSION:
+            raise ValueError(
+                "Unsupported crawl checkpoint version {}".format(header["version"])
+            )
+        if header["crawl"] != crawl:
+            raise ValueError(
+                "{} is the checkpoint of a different crawl".format(filename)
+            )
+        end = fin.tell()
+        for line in fin:
+            if not line.endswith(b"\n"):
+                break
+            entries.append(json.loads(line))
+            end += len(line)
+    os.truncate(filename, end)
+    return entries
@@ -0,0 +1,163 @@
+import http.client
+import ssl
+import threading
+import urllib.error
+import urllib.parse
+import zlib
+
+
+class ConnectionPool:
+    """
+    Class keeping persistent HTTP connections to the hosts that records are
+    grabbed from.
+
+    Connections are kept alive between requests and handed out to one
+    thread at a time, so a pool may be shared by several threads. Responses
+    are requested with gzip or deflate compression and decompressed
+    transparently.
+    """
+
+    # Response codes that are followed to the location they name.
+    redirect_codes = (301, 302, 303, 307, 308)
+
+    def __init__(self, maxsize=8, timeout=60.0, max_redirects=5):
+        """
+        ConnectionPool class constructor.
+
+        Parameters:
+            maxsize: number of idle connections kept per host
+            timeout: socket timeout, in seconds, for new connections
+            max_redirects: number of redirects followed for a request
+        """
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.max_redirects = max_redirects
+        self.lock = threading.Lock()
+        self.idle = {}
+        self.ssl_context = None
+        self.connections_opened = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Close all idle connections. The pool may still be used
+        afterwards; new connections are opened as needed."""
+        with self.lock:
+            idle = self.idle
+            self.idle = {}
+        for connections in idle.values():
+            for conn in connections:
+                conn.close()
+
+    def get(self, url):
+        """Request the given URL and return a (data, encoding) pair, where
+        data is the decompressed response body and encoding is the charset
+        named by the Content-Type header (or None if there is none).
+
+        HTTP errors are raised as urllib.error.HTTPError."""
+        for _ in range(self.max_redirects + 1):
+            response, data = self.request(url)
+            if response.status in self.redirect_codes:
+                location = response.getheader("Location")
+                if location is None:
+                    break
+                url = urllib.parse.urljoin(url, location)
+                continue
+            break
+
+        if response.status != 200:
+            raise urllib.error.HTTPError(
+                url, response.status, response.reason, response.headers, None
+            )
+        return decode_body(response, data), response.headers.get_content_charset()
+
+    def request(self, url):
+        """Send a GET request for the URL over a pooled connection and return
+        the response with its raw body."""
+        parts = urllib.parse.urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        headers = {"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"}
+
+        conn, reused = self.acquire(key)
+        try:
+            response = self.send(conn, path, headers)
+        except (http.client.RemoteDisconnected, ConnectionError):
+            if not reused:
+                raise
+            # The server closed the idle connection. Retry once on a new one.
+            conn, reused = self.acquire(key, fresh=True)
+            response = self.send(conn, path, headers)
+
+        try:
+            data = response.read()
+        except BaseException:
+            conn.close()
+            raise
+        if response.will_close:
+            conn.close()
+        else:
+            self.release(key, conn)
+        return response, data
+
+    def send(self, conn, path, headers):
+        """Send a GET request for the path on a connection and return the
+        response, closing the connection if that fails."""
+        try:
+            conn.request("GET", path, headers=headers)
+            return conn.getresponse()
+        except BaseException:
+            conn.close()
+            raise
+
+    def acquire(self, key, fresh=False):
+        """Return a (connection, reused) pair for the host key, reusing an
+        idle connection unless fresh is True."""
+        if not fresh:
+            with self.lock:
+                connections = self.idle.get(key)
+                if connections:
+                    return connections.pop(), True
+
+        scheme, host, port = key
+        if scheme == "https":
+            with self.lock:
+                if self.ssl_context is None:
+                    self.ssl_context = ssl._create_unverified_context()
+            conn = http.client.HTTPSConnection(
+                host, port, timeout=self.timeout, context=self.ssl_context
+            )
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=self.timeout)
+        with self.lock:
+            self.connections_opened += 1
+        return conn, False
+
+    def release(self, key, conn):
+        """Return a connection to the pool after its response was read."""
+        with self.lock:
+            connections = self.idle.setdefault(key, [])
+            if len(connections) < self.maxsize:
+                connections.append(conn)
+                return
+        conn.close()
+
+
+def decode_body(response, data):
+    """Undo the content encoding of a response body."""
+    encoding = (response.getheader("Content-Encoding") or "identity").lower()
+    if encoding in ("gzip", "x-gzip"):
+        return zlib.decompress(data, 16 + zlib.MAX_WBITS)
+    if encoding == "deflate":
+        try:
+            return zlib.decompress(data)
+        except zlib.error:
+            # Some servers send a raw deflate stream without the zlib header.
+            return zlib.decompress(data, -zlib.MAX_WBITS)
+    return data
@@ -0,0 +1,97 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from .grabber import grab_records
+
+
+class Crawler:
+    """
+    Class for fetching the records of a whole BFS frontier with a bounded
+    number of grabber calls in flight.
+
+    Record grabbers are blocking, so each call is run on a worker thread and
+    an asyncio event loop keeps at most concurrency of them outstanding.
+    Grabbers that provide a batch get_records method are handed the
+    frontier in batches; other grabbers are called once per id.
+    """
+
+    # Number of batches per worker a frontier is split into, so a slow
+    # batch does not hold up the results of the others for long.
+    batches_per_worker = 4
+
+    def __init__(self, grabber, concurrency=1):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.grabber = grabber
+        self.concurrency = concurrency
+        self.loop = None
+        self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Shut down the event loop and the worker threads."""
+        if self.loop is not None:
+            self.loop.close()
+            self.loop = None
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    def get_records(self, ids):
+        """Generate (id, record) pairs for the given ids as the records
+        arrive. The first exception raised by the grabber is propagated after
+        the outstanding calls are cancelled."""
+        ids = list(ids)
+        if self.concurrency == 1 or len(ids) < 2:
+            yield from grab_records(self.grabber, ids)
+            return
+
+        if self.loop is None:
+            self.loop = asyncio.new_event_loop()
+            self.executor = ThreadPoolExecutor(max_workers=self.concurrency)
+
+        pending = set(
+            self.loop.create_task(self.fetch_batch(batch))
+            for batch in self.batches(ids)
+        )
+        try:
+            while pending:
+                done, pending = self.loop.run_until_complete(
+                    asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                )
+                for task in done:
+                    yield from task.result()
+        finally:
+            if pending:
+                for task in pending:
+                    task.cancel()
+                self.loop.run_until_complete(
+                    asyncio.gather(*pending, return_exceptions=True)
+                )
+
+    def fetch(self, ids):
+        """Return a list of (id, record) pairs for the given ids, in the
+        order the ids were given."""
+        ids = list(ids)
+        records = dict(self.get_records(ids))
+        return [(id, records[id]) for id in ids]
+
+    def batches(self, ids):
+        """Split the ids into the batches handed to the worker threads."""
+        if not hasattr(self.grabber, "get_records"):
+            return [[id] for id in ids]
+        count = self.concurrency * self.batches_per_worker
+        size = max(1, -(-len(ids) // count))
+        return [ids[i : i + size] for i in range(0, len(ids), size)]
+
+    async def fetch_batch(self, ids):
+        """Coroutine grabbing the records for a batch of ids on a worker
+        thread."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, lambda: list(grab_records(self.grabber, ids))
+        )
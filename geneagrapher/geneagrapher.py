@@ -1,10 +1,19 @@
 from argparse import ArgumentParser
 from collections import deque
+import contextlib
+import functools
 import pkg_resources
 import sys
+from .analytics_command import analytics_main
+from .cache_backends import backends
+from .cache_command import cache_main, parse_size
 from .cache_grabber import CacheGrabber
-from .graph import Graph
+from .checkpoint import LEVEL, CrawlCheckpoint
+from .crawler import Crawler
+from .graph import DotFileWriter, Graph
 from .grabber import Grabber
+from .single_flight import SingleFlight
+from .throttle import Throttle, ThrottledGrabber
 
 
 class Geneagrapher:
@@ -18,10 +27,28 @@ class Geneagrapher:
         self.seed_ids = []
         self.get_ancestors = False
         self.get_descendants = False
+        self.max_generations = None
+        self.max_nodes = None
+        self.checkpoint_file = None
+        self.resume = False
+        self.checkpoint = None
+        self.checkpoint_generations = {}
+        self.checkpoint_finished = set()
         self.verbose = False
         self.write_filename = None
+        self.stream = False
+        self.dot_writer = None
         self.use_cache = True
         self.cache_file = "geneacache"
+        self.cache_backend = None
+        self.cache_max_size = None
+        self.archive_pages = False
+        self.concurrency = 1
+        self.rate_limit = None
+        self.adaptive = False
+        self.throttle = None
+        self.single_flight = None
+        self.grabber = None
 
     def parse_input(self):
         """
@@ -48,6 +75,14 @@ Project. Multiple IDs may be passed.'
             metavar="FILE",
             default=None,
         )
+        self.parser.add_argument(
+            "--stream",
+            action="store_true",
+            dest="stream",
+            default=False,
+            help="write each node as soon as its record is retrieved, \
+in the order retrieved",
+        )
         self.parser.add_argument(
             "-a",
             "--with-ancestors",
@@ -65,6 +100,40 @@ in graph",
             default=False,
             help="retrieve descendants of IDs and \
 include in graph",
+        )
+        self.parser.add_argument(
+            "--max-generations",
+            dest="max_generations",
+            type=int,
+            default=None,
+            help="retrieve at most N generations of ancestors \
+and of descendants",
+            metavar="N",
+        )
+        self.parser.add_argument(
+            "--max-nodes",
+            dest="max_nodes",
+            type=int,
+            default=None,
+            help="stop retrieving ancestors and descendants \
+once the graph has N nodes",
+            metavar="N",
+        )
+        self.parser.add_argument(
+            "--checkpoint",
+            dest="checkpoint_file",
+            default=None,
+            help="record the progress of the crawl in FILE \
+after each generation",
+            metavar="FILE",
+        )
+        self.parser.add_argument(
+            "--resume",
+            action="store_true",
+            dest="resume",
+            default=False,
+            help="continue the crawl recorded in the \
+--checkpoint FILE, if there is one",
         )
         self.parser.add_argument(
             "--disable-cache",
@@ -81,6 +150,60 @@ geneacache]",
             metavar="FILE",
             default="geneacache",
         )
+        self.parser.add_argument(
+            "--cache-backend",
+            dest="cache_backend",
+            choices=sorted(backends),
+            help="store the cache with BACKEND: sqlite, or \
+the legacy shelve [default: sqlite, or shelve for an existing shelve cache]",
+            metavar="BACKEND",
+            default=None,
+        )
+        self.parser.add_argument(
+            "--cache-max-size",
+            dest="cache_max_size",
+            type=parse_size,
+            default=None,
+            help="keep the cache within SIZE bytes (K, M \
+and G suffixes accepted) by evicting expired records, then the least \
+recently used ones (the least recently retrieved with the shelve backend)",
+            metavar="SIZE",
+        )
+        self.parser.add_argument(
+            "--archive-pages",
+            action="store_true",
+            dest="archive_pages",
+            default=False,
+            help="keep the raw pages of grabbed records \
+alongside the cache",
+        )
+        self.parser.add_argument(
+            "-c",
+            "--concurrency",
+            dest="concurrency",
+            type=int,
+            default=1,
+            help="number of records to retrieve in parallel \
+[default: 1]",
+            metavar="N",
+        )
+        self.parser.add_argument(
+            "--rate-limit",
+            dest="rate_limit",
+            type=float,
+            default=None,
+            help="request at most RPS records per second from \
+the Mathematics Genealogy Project",
+            metavar="RPS",
+        )
+        self.parser.add_argument(
+            "--adaptive",
+            action="store_true",
+            dest="adaptive",
+            default=False,
+            help="back off when the server is slow or \
+overloaded and speed back up when it recovers",
+        )
         self.parser.add_argument(
             "-v",
             "--verbose",
@@ -94,100 +217,311 @@ geneacache]",
         )
 
         args = self.parser.parse_args()
+        if args.resume and args.checkpoint_file is None:
+            self.parser.error("--resume needs a --checkpoint FILE")
 
         self.get_ancestors = args.get_ancestors
         self.get_descendants = args.get_descendants
+        self.max_generations = args.max_generations
+        self.max_nodes = args.max_nodes
+        self.checkpoint_file = args.checkpoint_file
+        self.resume = args.resume
         self.verbose = args.verbose
         self.write_filename = args.filename
+        self.stream = args.stream
         self.use_cache = args.use_cache
         self.cache_file = args.cache_file
+        self.cache_backend = args.cache_backend
+        self.cache_max_size = args.cache_max_size
+        self.archive_pages = args.archive_pages
+        self.concurrency = args.concurrency
+        self.rate_limit = args.rate_limit
+        self.adaptive = args.adaptive
         self.seed_ids = [int(arg) for arg in args.ids]
 
-    def build_graph_portion(self, grab_queue, is_seed, grabber, **kwargs):
+    def build_graph_portion(
+        self, grab_queue, is_seed, crawler, truncated=None, portion=None, **kwargs
+    ):
         """Handle grabbing and storing nodes in the graph. Depending on the
         arguments, this method handles seed nodes, ancestors, or
-        descendants."""
+        descendants.
+
+        The queue holds (linked id, id) pairs, the linked id being that of
+        the node whose record listed the id, or None for seeds. It is
+        consumed one BFS level at a time: every id in the queue that is not
+        yet in the graph forms the frontier, whose records are grabbed as a
+        batch through the crawler and then added to the graph in queue
+        order.
+
+        Unless truncated is None, the crawl stops after max_generations
+        levels, and once the graph has max_nodes nodes. The ids then left
+        in the queue are added to the sets of truncated, a dictionary of
+        the graph, under the ids of the nodes that listed them.
+
+        With a checkpoint, each level is recorded under the name of the
+        portion, and a portion the checkpoint has finished is skipped."""
+        generation = 0
+        if self.checkpoint is not None:
+            if portion in self.checkpoint_finished:
+                return
+            generation = self.checkpoint_generations.get(portion, 0)
         while len(grab_queue) != 0:
-            id = grab_queue.popleft()
-            if not self.graph.has_node(id):
-                # Then this information has not yet been grabbed.
+            if truncated is not None and self.crawl_limit_reached(generation):
+                break
+            frontier = []
+            queued = set()
+            while len(grab_queue) != 0:
+                linked, id = grab_queue[0]
+                if not self.graph.has_node(id) and id not in queued:
+                    # Then this information has not yet been grabbed.
+                    if truncated is not None and self.max_nodes is not None:
+                        if len(self.graph) + len(frontier) >= self.max_nodes:
+                            # Leave the rest of the level in the queue.
+                            break
+                    frontier.append(id)
+                    queued.add(id)
+                grab_queue.popleft()
+
+            records = {}
+            for id, record in crawler.get_records(frontier):
                 if self.verbose:
                     sys.stdout.write("Grabbing record #{}...".format(id))
-                record = grabber.get_record(id)
-                if self.verbose:
                     if "message" in record:
                         print(record["message"])
                     else:
                         print()
-                self.graph.add_node(
-                    record["name"],
-                    record["institution"],
-                    record["year"],
+                records[id] = record
+
+            added = [
+                (
+                    records[id]["name"],
+                    records[id]["institution"],
+                    records[id]["year"],
                     id,
-                    record["advisors"],
-                    record["descendants"],
-                    is_seed,
+                    records[id]["advisors"],
+                    records[id]["descendants"],
                 )
+                for id in frontier
+            ]
+            self.graph.add_nodes(added, is_seed)
+            if self.dot_writer is not None:
+                self.dot_writer.write_nodes(frontier)
+            for id in frontier:
+                record = records[id]
                 if self.get_ancestors and "ancestor_queue" in kwargs:
-                    kwargs["ancestor_queue"].extend(record["advisors"])
+                    kwargs["ancestor_queue"].extend(
+                        (id, advisor) for advisor in record["advisors"]
+                    )
                 if self.get_descendants and "descendant_queue" in kwargs:
-                    kwargs["descendant_queue"].extend(record["descendants"])
+                    kwargs["descendant_queue"].extend(
+                        (id, descendant) for descendant in record["descendants"]
+                    )
+            generation += 1
+            if self.checkpoint is not None:
+                self.checkpoint.write_level(portion, generation, added)
+
+        if truncated is not None:
+            for linked, id in grab_queue:
+                if not self.graph.has_node(id):
+                    truncated.setdefault(linked, set()).add(id)
+            grab_queue.clear()
+        if self.checkpoint is not None:
+            self.checkpoint.write_portion_end(portion, truncated)
+
+    def crawl_limit_reached(self, generation):
+        """Return True if a crawl that has grabbed the given number of
+        generations of ancestors or descendants must stop."""
+        if self.max_generations is not None and generation >= self.max_generations:
+            return True
+        return self.max_nodes is not None and len(self.graph) >= self.max_nodes
 
     def build_graph_complete(self, record_grabber=Grabber, **kwargs):
         """
         Populate the graph member by grabbing the mathematician
-        pages and extracting relevant data.
+        pages and extracting relevant data. Ancestors and descendants are
+        grabbed up to max_generations generations each from the seeds, and
+        until the graph has max_nodes nodes, ancestors first.
+
+        With a checkpoint_file, the progress of the crawl is recorded in
+        it, and with resume the crawl continues from where the file left
+        off.
         """
-        seed_queue = deque(self.seed_ids)
-        ancestor_queue = deque()
-        descendant_queue = deque()
-        with record_grabber(**kwargs) as grabber:
+        queues = {
+            "seeds": deque((None, id) for id in self.seed_ids),
+            "ancestors": deque(),
+            "descendants": deque(),
+        }
+        with record_grabber(**kwargs) as grabber, Crawler(
+            grabber, self.concurrency
+        ) as crawler, self.open_checkpoint(queues):
+            self.grabber = grabber
             # Grab "seed" nodes.
             self.build_graph_portion(
-                seed_queue,
+                queues["seeds"],
                 True,
-                grabber,
-                ancestor_queue=ancestor_queue,
-                descendant_queue=descendant_queue,
+                crawler,
+                portion="seeds",
+                ancestor_queue=queues["ancestors"],
+                descendant_queue=queues["descendants"],
             )
 
             # Grab ancestors of seed nodes.
             if self.get_ancestors:
                 self.build_graph_portion(
-                    ancestor_queue, False, grabber, ancestor_queue=ancestor_queue
+                    queues["ancestors"],
+                    False,
+                    crawler,
+                    self.graph.truncated_ancestors,
+                    portion="ancestors",
+                    ancestor_queue=queues["ancestors"],
                 )
 
             # Grab descendants of seed nodes.
             if self.get_descendants:
                 self.build_graph_portion(
-                    descendant_queue, False, grabber, descendant_queue=descendant_queue
+                    queues["descendants"],
+                    False,
+                    crawler,
+                    self.graph.truncated_descendants,
+                    portion="descendants",
+                    descendant_queue=queues["descendants"],
                 )
 
+    @contextlib.contextmanager
+    def open_checkpoint(self, queues):
+        """
+        Context manager opening the checkpoint of the crawl, if there is a
+        checkpoint_file, and closing it afterwards. On resuming, the graph
+        and the queues are restored from the checkpoint.
+        """
+        if self.checkpoint_file is None:
+            yield
+            return
+        crawl = {
+            "seeds": list(self.seed_ids),
+            "ancestors": self.get_ancestors,
+            "descendants": self.get_descendants,
+            "max_generations": self.max_generations,
+            "max_nodes": self.max_nodes,
+        }
+        self.checkpoint_generations = {}
+        self.checkpoint_finished = set()
+        with CrawlCheckpoint(
+            self.checkpoint_file, crawl, queues, self.resume
+        ) as self.checkpoint:
+            try:
+                self.replay_checkpoint(queues)
+                yield
+            finally:
+                self.checkpoint = None
+
+    def replay_checkpoint(self, queues):
+        """Rebuild the graph recorded in the checkpoint and restore the
+        queues of the crawl as they were after the last level recorded."""
+        truncated = {
+            "ancestors": self.graph.truncated_ancestors,
+            "descendants": self.graph.truncated_descendants,
+        }
+        last_queues = None
+        for entry in self.checkpoint.entries:
+            portion = entry["portion"]
+            if entry["kind"] == LEVEL:
+                records = [tuple(record) for record in entry["records"]]
+                self.graph.add_nodes(records, portion == "seeds")
+                if self.dot_writer is not None:
+                    self.dot_writer.write_nodes([record[3] for record in records])
+                self.checkpoint_generations[portion] = entry["generation"]
+                last_queues = entry["queues"]
+            else:
+                for linked, ids in entry["truncated"]:
+                    truncated[portion][linked] = set(ids)
+                self.checkpoint_finished.add(portion)
+        if last_queues is not None:
+            for name, queue in queues.items():
+                queue.clear()
+                if name not in self.checkpoint_finished:
+                    queue.extend(tuple(pair) for pair in last_queues[name])
+        # The entries are no longer needed.
+        self.checkpoint.entries = []
+
     def build_graph(self):
         """Call the graph builder method with the correct arguments, based
         on the command-line arguments."""
-        if self.use_cache:
-            record_grabber = CacheGrabber
-        else:
-            record_grabber = Grabber
-        self.build_graph_complete(record_grabber, filename=self.cache_file)
+        record_grabber = Grabber
+        if self.rate_limit is not None or self.adaptive:
+            self.throttle = Throttle(self.rate_limit, self.concurrency, self.adaptive)
+            record_grabber = functools.partial(ThrottledGrabber, throttle=self.throttle)
+
+        try:
+            if self.use_cache:
+                self.single_flight = SingleFlight()
+                # The record grabber is bound here, as it would otherwise
+                # clash with the first argument of build_graph_complete.
+                self.build_graph_complete(
+                    functools.partial(CacheGrabber, record_grabber=record_grabber),
+                    filename=self.cache_file,
+                    archive=self.archive_pages,
+                    backend=self.cache_backend,
+                    max_size=self.cache_max_size,
+                    single_flight=self.single_flight,
+                )
+            else:
+                self.build_graph_complete(record_grabber, filename=self.cache_file)
+        finally:
+            if self.throttle is not None:
+                sys.stderr.write("Grabbed {}\n".format(self.throttle.summary()))
+            if self.single_flight is not None and self.single_flight.saved:
+                sys.stderr.write("{}\n".format(self.single_flight.summary()))
+            if self.verbose and isinstance(self.grabber, CacheGrabber):
+                sys.stderr.write("{}\n".format(self.grabber.cache.summary()))
 
     def generate_dot_file(self):
-        dotfile = self.graph.generate_dot_file(self.get_ancestors, self.get_descendants)
+        if self.write_filename is not None:
+            with open(self.write_filename, "w") as outfile:
+                self.graph.write_dot_file(
+                    outfile, self.get_ancestors, self.get_descendants
+                )
+        else:
+            self.graph.write_dot_file(
+                sys.stdout, self.get_ancestors, self.get_descendants
+            )
+
+    def stream_dot_file(self):
+        """Build the graph, writing the dot file as the nodes are added.
+        The dot file is finished even if building the graph fails."""
         if self.write_filename is not None:
             outfile = open(self.write_filename, "w")
-            outfile.write(dotfile)
-            outfile.close()
         else:
-            print(dotfile, end='')
+            outfile = sys.stdout
+        self.dot_writer = DotFileWriter(self.graph, outfile)
+        try:
+            self.build_graph()
+        finally:
+            self.dot_writer.close()
+            if outfile is not sys.stdout:
+                outfile.close()
 
 
 def ggrapher():
     """Function to run the Geneagrapher. This is the function called when
     the ggrapher script is run."""
+    if len(sys.argv) > 1 and sys.argv[1] == "cache":
+        cache_main(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "analytics":
+        analytics_main(sys.argv[2:])
+        return
+
     ggrapher = Geneagrapher()
     ggrapher.parse_input()
 
+    if ggrapher.stream:
+        try:
+            ggrapher.stream_dot_file()
+        except ValueError as e:
+            print(e)
+        return
+
     try:
         ggrapher.build_graph()
     except ValueError as e:
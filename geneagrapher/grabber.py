@@ -1,23 +1,43 @@
-import urllib.request, urllib.parse, urllib.error
 import re
-import ssl
 from bs4 import BeautifulSoup
+from .connection_pool import ConnectionPool
+from .lxml_extractor import (
+    UnsupportedPageError,
+    get_record_from_lxml_tree,
+    parse_html,
+)
+
+# Version of the records extracted from pages. Increase this whenever a
+# change to the extractors changes the records extracted from a page, so
+# records cached by earlier versions are extracted again.
+SCHEMA_VERSION = 1
 
 
 class Grabber:
     """
     Class for grabbing and parsing mathematician information from
     Math Genealogy Database.
+
+    Pages are requested through a pool of persistent, compressed HTTP
+    connections, which may be shared by several threads.
     """
 
-    def __init__(self, **kwargs):
-        pass
+    record_url = "http://mathgenealogy.org/id.php?id={}"
+
+    def __init__(self, record_url=None, **kwargs):
+        if record_url is not None:
+            self.record_url = record_url
+        self.pool = ConnectionPool()
 
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
-        pass
+        self.close()
+
+    def close(self):
+        """Close the connections held by this grabber."""
+        self.pool.close()
 
     def get_record(self, id):
         """
@@ -25,11 +45,50 @@ class Grabber:
         advisor ids, the mathematician name, the mathematician
         institution, and the year of the mathematician's degree.
         """
-        url = "http://mathgenealogy.org/id.php?id=" + str(id)
-        page = urllib.request.urlopen(url, context=ssl._create_unverified_context())
-        soup = BeautifulSoup(page, "lxml")
-        page.close()
+        page, encoding = self.get_page(id)
+        return get_record_from_html(page, id, encoding)
+
+    def get_page(self, id):
+        """
+        Return a (page, encoding) pair holding the raw page of the
+        mathematician with the given id and the encoding it was served
+        with (None if the server did not give one).
+        """
+        return self.pool.get(self.record_url.format(id))
+
+    def get_records(self, ids):
+        """
+        Generate (id, record) pairs for the mathematicians with the given
+        ids, in the order the records are retrieved.
+        """
+        for id in ids:
+            yield id, self.get_record(id)
+
+
+def grab_records(grabber, ids):
+    """Generate (id, record) pairs for the given ids using the grabber's
+    get_records method, or its get_record method if the grabber only
+    supports single ids."""
+    if hasattr(grabber, "get_records"):
+        return grabber.get_records(ids)
+    return ((id, grabber.get_record(id)) for id in ids)
 
+
+def get_record_from_html(page, id, encoding=None):
+    """Extract and return the fields in the mathematician record from the
+    page, given as bytes or text. The encoding of a page given as bytes may
+    be passed when it is known, for instance from the HTTP headers.
+
+    The page is parsed with lxml and the fields are located with precompiled
+    XPath expressions. Pages that do not have the expected layout are
+    handed to BeautifulSoup instead."""
+    try:
+        return get_record_from_lxml_tree(parse_html(page, encoding), id)
+    except UnsupportedPageError:
+        if isinstance(page, str):
+            soup = BeautifulSoup(page, "lxml")
+        else:
+            soup = BeautifulSoup(page, "lxml", from_encoding=encoding)
         return get_record_from_tree(soup, id)
 
 
@@ -1,3 +1,6 @@
+from .csr_graph import CSRGraph, write_csr_graph
+from .dot_writer import DotFileWriter
 from .graph import DuplicateNodeError, Graph
+from .graph_arrays import load_graph_arrays, save_graph_arrays
 from .node import Node
 from .record import Record
@@ -0,0 +1,263 @@
+from array import array
+from bisect import bisect_left
+import mmap
+import struct
+
+# CSR graph files start with the magic bytes and a header giving the
+# format version, a marker showing the byte order the file was written
+# in, and the numbers of nodes, advisor links, student links and
+# institutions. The sections listed in sections follow, in order, each
+# padded to a multiple of eight bytes.
+MAGIC = b"GGCSR\0\0\0"
+CSR_VERSION = 1
+BYTE_ORDER_MARK = 0x01020304
+header = struct.Struct("=8sIIQQQQ")
+
+# Year stored for records without one.
+NO_YEAR = -(2**31)
+
+
+class CSRGraph:
+    """
+    Class giving read-only access to a genealogy graph stored in a file by
+    write_csr_graph, without building Node objects.
+
+    Nodes are numbered by the rank of their Mathematics Genealogy Project
+    id. Advisors and students are kept as compressed sparse rows: the
+    links of node i are the entries of the link array from offsets[i] up
+    to offsets[i + 1]. Names and institutions are kept as UTF-8 string
+    tables. The file is memory-mapped and its arrays are used in place,
+    so opening it takes no time to speak of, and processes forked after
+    it is opened share its pages rather than copying them.
+    """
+
+    sections = [
+        ("ids", "q"),
+        ("years", "i"),
+        ("institution_numbers", "I"),
+        ("advisor_offsets", "I"),
+        ("advisor_indexes", "I"),
+        ("student_offsets", "I"),
+        ("student_indexes", "I"),
+        ("name_offsets", "I"),
+        ("names", "B"),
+        ("institution_offsets", "I"),
+        ("institutions", "B"),
+    ]
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, "rb") as fin:
+            self.map = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self.map)
+        magic, version, mark, nodes, advisors, students, institutions = (
+            header.unpack_from(view)
+        )
+        if magic != MAGIC:
+            raise ValueError("{} is not a CSR graph file".format(filename))
+        if version > CSR_VERSION:
+            raise ValueError("Unsupported CSR graph version {}".format(version))
+        if mark != BYTE_ORDER_MARK:
+            raise ValueError(
+                "{} was written on a platform with another byte order".format(filename)
+            )
+        lengths = {
+            "ids": nodes,
+            "years": nodes,
+            "institution_numbers": nodes,
+            "advisor_offsets": nodes + 1,
+            "advisor_indexes": advisors,
+            "student_offsets": nodes + 1,
+            "student_indexes": students,
+            "name_offsets": nodes + 1,
+            "institution_offsets": institutions + 1,
+        }
+        self.views = [view]
+        pos = header.size
+        for name, code in self.sections:
+            if name == "names":
+                length = self.name_offsets[-1]
+            elif name == "institutions":
+                length = self.institution_offsets[-1]
+            else:
+                length = lengths[name]
+            size = length * struct.calcsize(code)
+            section = view[pos : pos + size].cast(code)
+            self.views.append(section)
+            setattr(self, name, section)
+            pos += -(-size // 8) * 8
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, id):
+        index = bisect_left(self.ids, id)
+        return index < len(self.ids) and self.ids[index] == id
+
+    def close(self):
+        """Release the mapped file."""
+        for view in reversed(self.views):
+            view.release()
+        self.views = []
+        self.map.close()
+
+    def index(self, id):
+        """Return the node number of the record with the given id. Raises
+        KeyError if there is no such record."""
+        index = bisect_left(self.ids, id)
+        if index == len(self.ids) or self.ids[index] != id:
+            raise KeyError(id)
+        return index
+
+    def name(self, id):
+        """Return the name of the mathematician with the given id."""
+        index = self.index(id)
+        start, end = self.name_offsets[index], self.name_offsets[index + 1]
+        return str(self.names[start:end], "utf-8")
+
+    def institution(self, id):
+        """Return the institution of the mathematician with the given id, or
+        None."""
+        number = self.institution_numbers[self.index(id)]
+        if number == 0:
+            return None
+        start = self.institution_offsets[number - 1]
+        end = self.institution_offsets[number]
+        return str(self.institutions[start:end], "utf-8")
+
+    def year(self, id):
+        """Return the year of the degree of the mathematician with the given
+        id, or None."""
+        year = self.years[self.index(id)]
+        return None if year == NO_YEAR else year
+
+    def advisors(self, id):
+        """Return the list of the ids of the advisors of the mathematician
+        with the given id."""
+        return self.neighbours(id, self.advisor_offsets, self.advisor_indexes)
+
+    def students(self, id):
+        """Return the list of the ids of the students of the mathematician
+        with the given id."""
+        return self.neighbours(id, self.student_offsets, self.student_indexes)
+
+    def ancestors(self, id):
+        """Return the set of the ids of the advisors of the mathematician
+        with the given id, their advisors, and so on."""
+        return self.reachable(id, self.advisor_offsets, self.advisor_indexes)
+
+    def descendants(self, id):
+        """Return the set of the ids of the students of the mathematician
+        with the given id, their students, and so on."""
+        return self.reachable(id, self.student_offsets, self.student_indexes)
+
+    def neighbours(self, id, offsets, indexes):
+        """Return the ids of the nodes linked to a node in one direction."""
+        index = self.index(id)
+        ids = self.ids
+        return [ids[i] for i in indexes[offsets[index] : offsets[index + 1]]]
+
+    def reachable(self, id, offsets, indexes):
+        """Return the ids of the nodes reachable from a node in one
+        direction, not counting the node itself."""
+        start = self.index(id)
+        seen = set([start])
+        stack = [start]
+        while stack:
+            index = stack.pop()
+            for linked in indexes[offsets[index] : offsets[index + 1]]:
+                if linked not in seen:
+                    seen.add(linked)
+                    stack.append(linked)
+        seen.discard(start)
+        ids = self.ids
+        return set(ids[i] for i in seen)
+
+
+def write_csr_graph(records, filename):
+    """Write the genealogy graph of the given (id, record) pairs, such as the
+    items of a cache backend, to a file for CSRGraph and return a (nodes,
+    links) pair counting the mathematicians and advisor links written.
+    Links to mathematicians that are not among the records are left
+    out."""
+    nodes = []
+    for key, record in records:
+        nodes.append(
+            (
+                int(key),
+                record["name"],
+                record["institution"],
+                record["year"],
+                sorted(record["advisors"]),
+                sorted(record["descendants"]),
+            )
+        )
+    nodes.sort()
+    ids = array("q", [node[0] for node in nodes])
+    indexes = dict((id, index) for index, id in enumerate(ids))
+
+    years = array("i")
+    institution_numbers = array("I")
+    institution_table = {}
+    advisor_offsets = array("I", [0])
+    advisor_indexes = array("I")
+    student_offsets = array("I", [0])
+    student_indexes = array("I")
+    name_offsets = array("I", [0])
+    names = bytearray()
+    for id, name, institution, year, advisors, students in nodes:
+        years.append(NO_YEAR if year is None else year)
+        if institution is None:
+            institution_numbers.append(0)
+        else:
+            institution_numbers.append(
+                institution_table.setdefault(institution, len(institution_table) + 1)
+            )
+        advisor_indexes.extend(indexes[a] for a in advisors if a in indexes)
+        advisor_offsets.append(len(advisor_indexes))
+        student_indexes.extend(indexes[s] for s in students if s in indexes)
+        student_offsets.append(len(student_indexes))
+        names += name.encode("utf-8")
+        name_offsets.append(len(names))
+
+    institution_offsets = array("I", [0])
+    institutions = bytearray()
+    for institution in institution_table:
+        institutions += institution.encode("utf-8")
+        institution_offsets.append(len(institutions))
+
+    sections = [
+        ids,
+        years,
+        institution_numbers,
+        advisor_offsets,
+        advisor_indexes,
+        student_offsets,
+        student_indexes,
+        name_offsets,
+        names,
+        institution_offsets,
+        institutions,
+    ]
+    with open(filename, "wb") as fout:
+        fout.write(
+            header.pack(
+                MAGIC,
+                CSR_VERSION,
+                BYTE_ORDER_MARK,
+                len(ids),
+                len(advisor_indexes),
+                len(student_indexes),
+                len(institution_table),
+            )
+        )
+        for section in sections:
+            data = bytes(section)
+            fout.write(data + b"\0" * (-len(data) % 8))
+    return len(ids), len(advisor_indexes)
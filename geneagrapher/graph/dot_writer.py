@@ -0,0 +1,70 @@
+from .graph import dot_file_header
+
+
+class DotFileWriter:
+    """
+    Class writing the dot file of a graph while the graph is built, so
+    that the nodes reach the output as soon as they are added rather than
+    once the whole graph is known.
+
+    The nodes are written in the order they are added, each followed by
+    the edges joining it to the nodes written before it, so every edge is
+    written once both of its ends are known. The file is not in the order
+    Graph.generate_dot_file uses, but describes the same graph.
+    """
+
+    def __init__(self, graph, outfile):
+        """
+        DotFileWriter class constructor.
+
+        Parameters:
+            graph: the Graph being built
+            outfile: text file object the dot file is written to
+        """
+        self.graph = graph
+        self.outfile = outfile
+        self.written = set()
+
+    def write_nodes(self, ids):
+        """
+        Write the nodes of the graph with the given ids, which have just
+        been added, with the edges joining them to the nodes already
+        written, and flush the output.
+        """
+        lines = []
+        if not self.written and ids:
+            lines.append(dot_file_header)
+        for id in ids:
+            node = self.graph[id]
+            lines.append('    {} [label="{}"];\n'.format(id, node))
+            for advisor in sorted(node.ancestors):
+                if advisor in self.written:
+                    lines.append("    {} -> {};\n".format(advisor, id))
+            for student in sorted(node.descendants):
+                if student in self.written:
+                    lines.append("    {} -> {};\n".format(id, student))
+            self.written.add(id)
+        self.outfile.writelines(lines)
+        self.outfile.flush()
+
+    def close(self):
+        """
+        Finish the dot file, marking the advisors and students the crawl
+        left out, which are only known once it is over. Nothing is written
+        for a graph without nodes, as for Graph.generate_dot_file.
+        """
+        if self.written:
+            graph = self.graph
+            lines = []
+            edges = []
+            for id in sorted(
+                set(graph.truncated_ancestors) | set(graph.truncated_descendants)
+            ):
+                if id in self.written:
+                    marker_nodes, marker_edges = graph.truncation_lines(id, True, True)
+                    lines.extend(marker_nodes)
+                    edges.extend("    {}\n".format(edge) for edge in marker_edges)
+            lines.extend(edges)
+            lines.append("}\n")
+            self.outfile.writelines(lines)
+            self.outfile.flush()
@@ -1,6 +1,31 @@
+from collections import deque
+import contextlib
+import gc
 from .node import Node
 from .record import Record
 
+# The opening of the dot file of a graph.
+dot_file_header = """digraph genealogy {
+    graph [charset="utf-8"];
+    node [shape=plaintext];
+    edge [style=bold];\n\n"""
+
+
+@contextlib.contextmanager
+def paused_collection():
+    """
+    Context manager pausing the garbage collector, for code making many
+    objects that outlive it, which the collector would otherwise rescan
+    over and over while they are made.
+    """
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if collecting:
+            gc.enable()
+
 
 class DuplicateNodeError(Exception):
     def __init__(self, value):
@@ -47,6 +72,12 @@ of Node objects for 'seed_nodes'"
 
         self.supp_id = -1
 
+        # Map the ids of nodes whose advisors or students were left out
+        # of the graph by the limits of a crawl to the sets of the ids
+        # left out. The dot file marks these links as truncated.
+        self.truncated_ancestors = {}
+        self.truncated_descendants = {}
+
     def has_node(self, id):
         """
         Check if the graph contains a node with the given id.
@@ -71,7 +102,7 @@ of Node objects for 'seed_nodes'"
         Add a new node to the graph if a matching node is not already
         present.
         """
-        record = Record(name, institution, year, id)
+        record = Record.trusted(name, institution, year, id)
 
         # Ancestors is the set of advisors already in the graph.
         graph_ancestors = set([advisor for advisor in advisors if advisor in self])
@@ -89,9 +120,77 @@ of Node objects for 'seed_nodes'"
         for descendant in graph_descendants:
             self[descendant].ancestors.add(id)
 
-        node = Node(record, graph_ancestors, graph_descendants)
+        node = Node.trusted(record, graph_ancestors, graph_descendants)
         self.add_node_object(node, is_seed)
 
+    def add_nodes(self, records, is_seed=False):
+        """
+        Add new nodes to the graph for an iterable of (name, institution,
+        year, id, advisors, advisees) tuples, the arguments taken by
+        add_node. All the nodes are created first and their edges are
+        then linked in one pass, leaving the graph as it would be after
+        adding the records one at a time with add_node. If an id is
+        already in the graph or repeated, DuplicateNodeError is raised
+        before any node is added.
+        """
+        records = list(records)
+        position = {}
+        for index, record in enumerate(records):
+            id = record[3]
+            if id is not None and (id in self or id in position):
+                msg = "node with id {} already exists".format(id)
+                raise DuplicateNodeError(msg)
+            position[id] = index
+        position.pop(None, None)
+
+        with paused_collection():
+            nodes = []
+            for name, institution, year, id, advisors, advisees in records:
+                record = Record.trusted(name, institution, year, id)
+                node = Node.trusted(record, set(), set())
+                self.add_node_object(node, is_seed)
+                nodes.append(node)
+            self.link_added_nodes(records, nodes, position)
+
+    def link_added_nodes(self, records, nodes, position):
+        """
+        Link the edges of the nodes created by add_nodes for records,
+        given the position of each id in records.
+        """
+        # A node only links to the nodes that add_node would have found
+        # in the graph: those already there and those earlier in records.
+        # Linking in the same order as add_node fills every set in the
+        # same order, so even the iteration order of the sets matches.
+        added_at = position.get
+        get_node = self.get
+        for index, node in enumerate(nodes):
+            id = node.record.id
+            advisors, advisees = records[index][4:]
+            for advisor in advisors:
+                at = added_at(advisor)
+                if at is None:
+                    linked = get_node(advisor)
+                    if linked is None:
+                        continue
+                elif at < index:
+                    linked = nodes[at]
+                else:
+                    continue
+                node.ancestors.add(advisor)
+                linked.descendants.add(id)
+            for descendant in advisees:
+                at = added_at(descendant)
+                if at is None:
+                    linked = get_node(descendant)
+                    if linked is None:
+                        continue
+                elif at < index:
+                    linked = nodes[at]
+                else:
+                    continue
+                node.descendants.add(descendant)
+                linked.ancestors.add(id)
+
     def add_node_object(self, node, is_seed=False):
         """
         Add a new node object to the graph if a node with the same id
@@ -113,23 +212,84 @@ of Node objects for 'seed_nodes'"
         Return a string that contains the content of the Graphviz dotfile
         format for this graph.
         """
+        return "".join(self.dot_file_lines(include_ancestors, include_descendants))
+
+    def write_dot_file(self, outfile, include_ancestors, include_descendants):
+        """
+        Write the content of the Graphviz dotfile format for this graph to
+        a text file object, a piece at a time.
+        """
+        outfile.writelines(self.dot_file_lines(include_ancestors, include_descendants))
+
+    def surname_ranks(self):
+        """
+        Return a dictionary mapping the id of each node to the dense rank
+        of the surname of its mathematician, taken to be the last word of
+        the name, among the surnames in the graph.
+        """
+        surnames = {}
+        for id, node in self.items():
+            words = node.record.name.split()
+            surnames[id] = words[-1] if words else ""
+        ranks = dict(
+            (surname, rank)
+            for rank, surname in enumerate(sorted(set(surnames.values())))
+        )
+        return dict((id, ranks[surname]) for id, surname in surnames.items())
+
+    def truncation_lines(self, node_id, include_ancestors, include_descendants):
+        """
+        Return a pair of lists of the node lines and edge statements
+        marking the truncated advisors and students of a node in the dot
+        file, each as a placeholder node with a dashed edge.
+        """
+        nodes = []
+        edges = []
+        if include_ancestors and node_id in self.truncated_ancestors:
+            count = len(self.truncated_ancestors[node_id])
+            marker = '"{}-advisors"'.format(node_id)
+            nodes.append(
+                '    {} [label="{} more advisor{}"];\n'.format(
+                    marker, count, "" if count == 1 else "s"
+                )
+            )
+            edges.append("{} -> {} [style=dashed];".format(marker, node_id))
+        if include_descendants and node_id in self.truncated_descendants:
+            count = len(self.truncated_descendants[node_id])
+            marker = '"{}-students"'.format(node_id)
+            nodes.append(
+                '    {} [label="{} more student{}"];\n'.format(
+                    marker, count, "" if count == 1 else "s"
+                )
+            )
+            edges.append("{} -> {} [style=dashed];".format(node_id, marker))
+        return nodes, edges
+
+    def dot_file_lines(self, include_ancestors, include_descendants):
+        """
+        Generate the content of the Graphviz dotfile format for this graph
+        in pieces of a line or so, without holding the whole of it in
+        memory.
+        """
         if self.seeds == set():
-            return ""
+            return
 
-        queue = []
-        for seed in self.seeds:
-            queue.append(seed)
-        edges = ""
-        dotfile = ""
+        queue = deque(self.seeds)
 
-        dotfile += """digraph genealogy {
-    graph [charset="utf-8"];
-    node [shape=plaintext];
-    edge [style=bold];\n\n"""
+        yield dot_file_header
+
+        # Neighbours are printed in order of surname. Sorting them by the
+        # dense rank of their surnames gives the same order, ties and all,
+        # without splitting a name for every sort.
+        rank = self.surname_ranks()
 
+        # Maps the id of each printed node to its advisors in the graph,
+        # whose edges are printed after all the nodes.
         printed_nodes = {}
+        truncated = set(self.truncated_ancestors) | set(self.truncated_descendants)
+        truncated_edges = []
         while len(queue) > 0:
-            node_id = queue.pop(0)
+            node_id = queue.popleft()
             if not self.has_node(node_id):
                 # Skip this id if a corresponding node is not present.
                 continue
@@ -137,39 +297,38 @@ of Node objects for 'seed_nodes'"
                 # Skip this id because it is already printed.
                 continue
             node = self.get_node(node_id)
-            printed_nodes[node_id] = node
 
             sorted_ancestors = sorted(
-                [a for a in node.ancestors if a in self],
-                key=lambda n: self[n].record.name.split()[-1]
+                [a for a in node.ancestors if a in rank], key=rank.__getitem__
             )
             sorted_descendants = sorted(
-                [d for d in node.descendants if d in self],
-                key=lambda n: self[n].record.name.split()[-1]
+                [d for d in node.descendants if d in rank], key=rank.__getitem__
             )
+            printed_nodes[node_id] = tuple(sorted_ancestors)
 
             if include_ancestors:
                 # Add this node's advisors to queue.
-                queue += sorted_ancestors
+                queue.extend(sorted_ancestors)
 
             if include_descendants:
                 # Add this node's descendants to queue.
-                queue += sorted_descendants
+                queue.extend(sorted_descendants)
 
             # Print this node's information.
-            nodestr = '    {} [label="{}"];'.format(node_id, node)
-            dotfile += nodestr
-
-            # Store the connection information for this node.
-            for advisor in sorted_ancestors:
-                if self.has_node(advisor):
-                    edgestr = "\n    {} -> {};".format(advisor, node_id)
-                    edges += edgestr
-
-            dotfile += "\n"
+            yield '    {} [label="{}"];\n'.format(node_id, node)
+            if node_id in truncated:
+                marker_nodes, marker_edges = self.truncation_lines(
+                    node_id, include_ancestors, include_descendants
+                )
+                for line in marker_nodes:
+                    yield line
+                truncated_edges.extend(marker_edges)
 
         # Now print the connections between the nodes.
-        dotfile += edges
+        for node_id, sorted_ancestors in printed_nodes.items():
+            for advisor in sorted_ancestors:
+                yield "\n    {} -> {};".format(advisor, node_id)
+        for edge in truncated_edges:
+            yield "\n    {}".format(edge)
 
-        dotfile += "\n}\n"
-        return dotfile
+        yield "\n}\n"
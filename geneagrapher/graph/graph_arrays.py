@@ -0,0 +1,176 @@
+from .graph import Graph, paused_collection
+from .node import Node
+from .record import Record
+
+try:
+    import numpy
+except ImportError:
+    # Saving and loading graph arrays needs the numpy extra.
+    numpy = None
+
+# Version of the layout of the arrays, stored in the "version" array.
+ARRAYS_VERSION = 1
+
+# Year and institution code stored for records without one.
+NO_YEAR = -(2**31)
+NO_INSTITUTION = -1
+
+
+def require_numpy():
+    """Raise ImportError if numpy is not installed."""
+    if numpy is None:
+        raise ImportError(
+            "numpy is needed for graph arrays; install geneagrapher[numpy]"
+        )
+
+
+def save_graph_arrays(graph, filename, compress=False):
+    """
+    Save a Graph to a NumPy .npz file of the columnar arrays returned by
+    graph_to_arrays, compressed if compress is True.
+    """
+    arrays = graph_to_arrays(graph)
+    save = numpy.savez_compressed if compress else numpy.savez
+    save(filename, **arrays)
+
+
+def graph_to_arrays(graph):
+    """
+    Return a dictionary of the columnar arrays representing a Graph.
+
+    Node i of the arrays is the i-th node of the graph. The arrays are:
+        ids, years, institution_codes: per node, with NO_YEAR and
+            NO_INSTITUTION for missing values
+        institutions, institution_offsets: the institution names, as the
+            UTF-8 encoding of their concatenation and the offsets, in
+            characters, of code i from institution_offsets[i] up to
+            institution_offsets[i + 1]
+        names, name_offsets: the names of the nodes, in the same form
+        advisor_offsets, advisor_indexes: the advisors of each node in
+            CSR form, as node numbers: those of node i are
+            advisor_indexes[advisor_offsets[i]:advisor_offsets[i + 1]]
+        student_offsets, student_indexes: the students, in the same form
+        seeds: the ids of the seed nodes
+        supp_id: the next id the graph gives a node without one
+        version: ARRAYS_VERSION
+    Links to ids that are not in the graph are left out.
+    """
+    require_numpy()
+    ids = list(graph)
+    index = dict((id, i) for i, id in enumerate(ids))
+    years = []
+    institution_codes = []
+    institution_table = {}
+    names = []
+    advisors = []
+    advisor_counts = []
+    students = []
+    student_counts = []
+    for node in graph.values():
+        record = node.record
+        years.append(NO_YEAR if record.year is None else record.year)
+        if record.institution is None:
+            institution_codes.append(NO_INSTITUTION)
+        else:
+            institution_codes.append(
+                institution_table.setdefault(record.institution, len(institution_table))
+            )
+        names.append(record.name)
+        linked = [index[a] for a in node.ancestors if a in index]
+        advisors.extend(linked)
+        advisor_counts.append(len(linked))
+        linked = [index[d] for d in node.descendants if d in index]
+        students.extend(linked)
+        student_counts.append(len(linked))
+
+    institutions, institution_offsets = string_arrays(list(institution_table))
+    names, name_offsets = string_arrays(names)
+    return dict(
+        version=numpy.array(ARRAYS_VERSION),
+        ids=numpy.array(ids, dtype=numpy.int64),
+        years=numpy.array(years, dtype=numpy.int32),
+        institution_codes=numpy.array(institution_codes, dtype=numpy.int32),
+        institutions=institutions,
+        institution_offsets=institution_offsets,
+        names=names,
+        name_offsets=name_offsets,
+        advisor_offsets=offsets(advisor_counts),
+        advisor_indexes=numpy.array(advisors, dtype=numpy.int64),
+        student_offsets=offsets(student_counts),
+        student_indexes=numpy.array(students, dtype=numpy.int64),
+        seeds=numpy.array(sorted(graph.seeds), dtype=numpy.int64),
+        supp_id=numpy.array(graph.supp_id),
+    )
+
+
+def string_arrays(strings):
+    """Return the UTF-8 encoding of the concatenation of strings as a uint8
+    array, with an array of the offsets of the strings in characters."""
+    data = numpy.frombuffer("".join(strings).encode("utf-8"), dtype=numpy.uint8)
+    return data, offsets([len(string) for string in strings])
+
+
+def offsets(counts):
+    """Return the CSR offsets array for a list of row lengths."""
+    result = numpy.zeros(len(counts) + 1, dtype=numpy.int64)
+    numpy.cumsum(counts, out=result[1:])
+    return result
+
+
+def split_strings(data, string_offsets):
+    """Return the list of strings stored by string_arrays."""
+    text = data.tobytes().decode("utf-8")
+    bounds = string_offsets.tolist()
+    return [text[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+def split_rows(values, row_offsets):
+    """Return a list of the rows of a CSR array as lists."""
+    values = values.tolist()
+    bounds = row_offsets.tolist()
+    return [values[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+def load_graph_arrays(filename):
+    """
+    Return the Graph saved to an .npz file by save_graph_arrays.
+
+    The arrays are turned into nodes a node at a time; edges are never
+    visited one at a time in Python.
+    """
+    require_numpy()
+    # Nearly every object made here ends up in the graph.
+    with paused_collection(), numpy.load(filename) as arrays:
+        version = int(arrays["version"])
+        if version > ARRAYS_VERSION:
+            raise ValueError("Unsupported graph arrays version {}".format(version))
+        ids = arrays["ids"]
+        years = [None if year == NO_YEAR else year for year in arrays["years"].tolist()]
+        institutions = split_strings(
+            arrays["institutions"], arrays["institution_offsets"]
+        )
+        institutions.append(None)
+        institution_names = [
+            institutions[code] for code in arrays["institution_codes"].tolist()
+        ]
+        names = split_strings(arrays["names"], arrays["name_offsets"])
+        advisors = split_rows(ids[arrays["advisor_indexes"]], arrays["advisor_offsets"])
+        students = split_rows(ids[arrays["student_indexes"]], arrays["student_offsets"])
+
+        graph = Graph()
+        graph.update(
+            (
+                id,
+                Node.trusted(
+                    Record.trusted(name, institution, year, id),
+                    set(ancestors),
+                    set(descendants),
+                ),
+            )
+            for id, name, institution, year, ancestors, descendants in zip(
+                ids.tolist(), names, institution_names, years, advisors, students
+            )
+        )
+        graph.seeds = set(arrays["seeds"].tolist())
+        graph.supp_id = int(arrays["supp_id"])
+    return graph
@@ -8,6 +8,8 @@ class Node:
     Container class storing a node in the graph.
     """
 
+    __slots__ = ("record", "ancestors", "descendants")
+
     def __init__(self, record, ancestors, descendants):
         """
         Node class constructor.
@@ -41,6 +43,19 @@ for 'ancestors'"
 for 'descendants'"
             )
 
+    @classmethod
+    def trusted(cls, record, ancestors, descendants):
+        """
+        Return a new node without checking the types of the parameters,
+        for callers such as Graph.add_node that pass values of the right
+        types already.
+        """
+        node = cls.__new__(cls)
+        node.record = record
+        node.ancestors = ancestors
+        node.descendants = descendants
+        return node
+
     def __str__(self):
         return str(self.record)
 
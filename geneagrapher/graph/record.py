@@ -1,12 +1,18 @@
 import functools
+import sys
 
 
 @functools.total_ordering
 class Record:
     """
     Container class storing record of a mathematician in the graph.
+
+    Institution names are interned, so the many records sharing an
+    institution share one copy of its name.
     """
 
+    __slots__ = ("name", "institution", "year", "id")
+
     def __init__(self, name, institution=None, year=None, id=None):
         """
         Record class constructor.
@@ -47,6 +53,22 @@ value for 'year'"
                 "Unexpected parameter type: expected integer \
 value for 'id'"
             )
+        if self.institution is not None:
+            self.institution = sys.intern(str(self.institution))
+
+    @classmethod
+    def trusted(cls, name, institution=None, year=None, id=None):
+        """
+        Return a new record without checking the types of the
+        parameters, for callers such as Graph.add_node that pass values
+        of the right types already.
+        """
+        record = cls.__new__(cls)
+        record.name = name
+        record.institution = None if institution is None else sys.intern(institution)
+        record.year = year
+        record.id = id
+        return record
 
     def __eq__(self, r2):
         return self.id == r2.id
@@ -0,0 +1,172 @@
+from bs4.dammit import UnicodeDammit
+import lxml.etree
+import lxml.html
+
+
+class UnsupportedPageError(Exception):
+    """Raised when a page does not have the layout the lxml extractor
+    expects. Such pages are handed to the BeautifulSoup extractor."""
+
+
+# Precompiled XPath expressions locating the parts of a record page.
+find_first_p = lxml.etree.XPath("(//p)[1]")
+find_name = lxml.etree.XPath("(//h2)[1]")
+find_degree_span = lxml.etree.XPath(
+    '(//div[@style="line-height: 30px; text-align: center; margin-bottom: 1ex"])'
+    "[1]/descendant::span[1]"
+)
+find_first_span = lxml.etree.XPath("descendant::span[1]")
+find_advisor_text = lxml.etree.XPath('//text()[contains(., "Advisor")]')
+find_next_in_text = lxml.etree.XPath("(descendant::*|following::*)[1]")
+find_next_after = lxml.etree.XPath("following::*[1]")
+find_descendant_links = lxml.etree.XPath("(//table)[1]//a")
+
+# HTML parsers for the encodings given by HTTP headers, created as needed.
+parsers = {}
+
+
+def parse_html(page, encoding=None):
+    """Parse a page, given as bytes or text, into an lxml tree. When the
+    encoding of a page given as bytes is known, the parser uses it rather
+    than detecting one. Otherwise the encoding is detected the same way
+    BeautifulSoup detects it."""
+    if isinstance(page, str):
+        return lxml.html.document_fromstring(page)
+    if encoding is None:
+        dammit = UnicodeDammit(page, is_html=True)
+        if dammit.unicode_markup is None:
+            raise UnsupportedPageError("encoding of page not detected")
+        return lxml.html.document_fromstring(dammit.unicode_markup)
+    encoding = encoding.lower()
+    if encoding not in parsers:
+        parsers[encoding] = lxml.html.HTMLParser(encoding=encoding)
+    return lxml.html.document_fromstring(page, parser=parsers[encoding])
+
+
+def get_record_from_lxml_tree(tree, id):
+    """Extract and return the fields in the mathematician record using the
+    input lxml tree. The fields are the same as those extracted by
+    grabber.get_record_from_tree."""
+    if not has_record(tree):
+        # Then a bad record id was given. Raise an exception.
+        msg = "Invalid id {}".format(id)
+        raise ValueError(msg)
+
+    degree_span = first(find_degree_span(tree))
+    record = {}
+    record["name"] = get_name(tree)
+    record["institution"] = get_institution(degree_span)
+    record["year"] = get_year(degree_span)
+    record["advisors"] = get_advisors(tree)
+    record["descendants"] = get_descendants(tree)
+    return record
+
+
+def has_record(tree):
+    """Return True if the input tree contains a mathematician record and False
+    otherwise."""
+    p = first(find_first_p(tree))
+    if p is None:
+        raise UnsupportedPageError("page has no paragraph")
+    string = element_string(p)
+    return string not in (
+        "Non-numeric id supplied. Aborting.",
+        "You have specified an ID that does not exist in the database. Please "
+        "back up and try again.",
+    )
+
+
+def get_name(tree):
+    """Extract the name from the given tree."""
+    h2 = first(find_name(tree))
+    if h2 is None:
+        return ""
+    return "".join(text.strip() for text in h2.itertext())
+
+
+def get_institution(degree_span):
+    """Return institution name (or None, if there is no institution name),
+    given the span holding the degree information."""
+    if degree_span is None:
+        return None
+    span = first(find_first_span(degree_span))
+    if span is None:
+        return None
+    institution = "".join(span.itertext())
+    if institution == "":
+        return None
+    return institution
+
+
+def get_year(degree_span):
+    """Return graduation year (or None, if there is no graduation year),
+    given the span holding the degree information."""
+    if degree_span is None:
+        return None
+    # The year is the last text node of the span.
+    if len(degree_span) == 0:
+        inst_year = degree_span.text
+    else:
+        inst_year = degree_span[-1].tail
+    if inst_year is None:
+        raise UnsupportedPageError("degree information does not end in text")
+    inst_year = inst_year.strip()
+    if inst_year.isdigit():
+        return int(inst_year)
+    return None
+
+
+def get_advisors(tree):
+    """Return the set of advisors."""
+    advisors = set()
+    for text in find_advisor_text(tree):
+        if "Advisor: Unknown" in text:
+            continue
+        parent = text.getparent()
+        if text.is_tail:
+            link = first(find_next_after(parent))
+        else:
+            link = first(find_next_in_text(parent))
+        if link is None:
+            raise UnsupportedPageError("advisor text is not followed by a link")
+        advisors.add(extract_id(link))
+    return advisors
+
+
+def get_descendants(tree):
+    """Return the set of descendants."""
+    return set([extract_id(link) for link in find_descendant_links(tree)])
+
+
+def extract_id(element):
+    """Extract the ID from an element with form <a href="id.php?id=7401">."""
+    href = element.get("href")
+    if href is None:
+        raise UnsupportedPageError("link without an href")
+    return int(href.split("=")[-1])
+
+
+def element_string(element):
+    """Return the only string inside an element, following lone child
+    elements down the tree, or None if there is not exactly one. This
+    mirrors the string attribute of BeautifulSoup tags."""
+    while True:
+        nodes = [element.text] if element.text else []
+        for child in element:
+            nodes.append(child)
+            if child.tail:
+                nodes.append(child.tail)
+        if len(nodes) != 1:
+            return None
+        node = nodes[0]
+        if isinstance(node, str):
+            return node
+        if node.tag is lxml.etree.Comment:
+            return node.text
+        element = node
+
+
+def first(elements):
+    """Return the first of a list of XPath results, or None if it is
+    empty."""
+    return elements[0] if elements else None
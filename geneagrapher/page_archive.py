@@ -0,0 +1,85 @@
+import sqlite3
+import threading
+from time import time
+import zlib
+
+
+class PageArchive:
+    """
+    Class storing the raw pages that records were extracted from, so the
+    records can be extracted again without requesting the pages again.
+
+    Pages are compressed and kept in an SQLite database together with the
+    encoding they were served with and the time they were archived.
+    """
+
+    # Seconds to wait for other processes sharing the archive to finish
+    # writing before giving up.
+    busy_timeout = 60.0
+
+    def __init__(self, filename="geneacache.pages"):
+        self.filename = filename
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(
+            filename, timeout=self.busy_timeout, check_same_thread=False
+        )
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS pages (
+                id INTEGER PRIMARY KEY,
+                timestamp REAL NOT NULL,
+                encoding TEXT,
+                page BLOB NOT NULL
+            )""")
+        self.db.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def __contains__(self, id):
+        with self.lock:
+            row = self.db.execute(
+                "SELECT 1 FROM pages WHERE id = ?", (int(id),)
+            ).fetchone()
+        return row is not None
+
+    def close(self):
+        """Close the archive."""
+        self.db.close()
+
+    def get_page(self, id):
+        """Return a (page, encoding, timestamp) tuple for the archived page
+        with the given id, or None if the page is not archived."""
+        with self.lock:
+            row = self.db.execute(
+                "SELECT page, encoding, timestamp FROM pages WHERE id = ?",
+                (int(id),),
+            ).fetchone()
+        if row is None:
+            return None
+        return zlib.decompress(row[0]), row[1], row[2]
+
+    def store_page(self, id, page, encoding=None, timestamp=None):
+        """Archive a page, given as bytes, replacing any page archived under
+        the same id."""
+        if timestamp is None:
+            timestamp = time()
+        data = zlib.compress(page, 9)
+        with self.lock:
+            with self.db:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?)",
+                    (int(id), timestamp, encoding, data),
+                )
+
+    def ids(self):
+        """Return a list of the ids of the archived pages."""
+        with self.lock:
+            rows = self.db.execute("SELECT id FROM pages ORDER BY id").fetchall()
+        return [row[0] for row in rows]
@@ -0,0 +1,160 @@
+from collections import deque
+from datetime import datetime
+import gzip
+import http.client
+import io
+from itertools import groupby, islice
+import multiprocessing
+import os
+import re
+from .connection_pool import decode_body
+from .grabber import get_record_from_html
+
+# Matches the id in the URL of a record page.
+record_url_id = re.compile(r"[?&]id=(\d+)(?:&|$)")
+
+
+def directory_pages(path):
+    """Generate (id, page, encoding, timestamp) tuples for the files named
+    <id>.html in a directory, stamped with the time they were last
+    modified. Pages are given as file names, to be read by parse_page."""
+    with os.scandir(path) as entries:
+        for entry in entries:
+            name, ext = os.path.splitext(entry.name)
+            if ext == ".html" and name.isdigit() and entry.is_file():
+                yield int(name), entry.path, None, entry.stat().st_mtime
+
+
+def warc_pages(filename):
+    """Generate (id, page, encoding, timestamp) tuples for the record pages
+    held in the response and resource records of a WARC file, which may be
+    gzip-compressed. Pages are stamped with the time they were captured."""
+    opener = gzip.open if filename.endswith(".gz") else open
+    with opener(filename, "rb") as fin:
+        while True:
+            line = fin.readline()
+            if not line:
+                return
+            if not line.strip():
+                # Records are separated by blank lines.
+                continue
+            if not line.startswith(b"WARC/"):
+                raise ValueError("Invalid WARC record in {}".format(filename))
+            headers = read_headers(fin)
+            block = fin.read(int(headers.get("content-length", 0)))
+            kind = headers.get("warc-type")
+            match = record_url_id.search(headers.get("warc-target-uri", ""))
+            if kind not in ("response", "resource") or match is None:
+                continue
+            page, encoding = block, None
+            if kind == "response":
+                response = http.client.HTTPResponse(RecordedSocket(block))
+                response.begin()
+                if response.status != 200:
+                    continue
+                page = decode_body(response, response.read())
+                encoding = response.headers.get_content_charset()
+            timestamp = parse_warc_date(headers["warc-date"])
+            yield int(match.group(1)), page, encoding, timestamp
+
+
+def read_headers(fin):
+    """Read the header lines of a WARC record up to the blank line ending
+    them, and return them as a dict with lower-case names."""
+    headers = {}
+    for line in iter(fin.readline, b""):
+        line = line.decode("utf-8").strip()
+        if not line:
+            break
+        name, value = line.split(":", 1)
+        headers[name.strip().lower()] = value.strip()
+    return headers
+
+
+def parse_warc_date(value):
+    """Return the time given by a WARC-Date header, in seconds since the
+    epoch."""
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+class RecordedSocket:
+    """
+    Class letting http.client parse an HTTP response recorded in a WARC
+    file.
+    """
+
+    def __init__(self, data):
+        self.data = data
+
+    def makefile(self, mode):
+        return io.BytesIO(self.data)
+
+
+def parse_page(page):
+    """Return an (id, record, timestamp) tuple for a page given as an (id,
+    page, encoding, timestamp) tuple, with a record of None if the page
+    has no record. A page given as a string is the name of its file."""
+    id, page, encoding, timestamp = page
+    if isinstance(page, str):
+        with open(page, "rb") as fin:
+            page = fin.read()
+    try:
+        return id, get_record_from_html(page, id, encoding), timestamp
+    except (ValueError, AttributeError):
+        # Error pages, such as the one served for an id too long to be a
+        # number, have no record.
+        return id, None, timestamp
+
+
+def parse_batch(pages):
+    """Return the list of parse_page results for a batch of pages."""
+    return [parse_page(page) for page in pages]
+
+
+def parse_pages(pages, processes=None, batch_size=200):
+    """Generate the parse_page results for the given pages, parsed in
+    batches across processes. Only a few batches per process are read
+    ahead, so any number of pages can be parsed in bounded memory."""
+    pages = iter(pages)
+    batches = iter(lambda: list(islice(pages, batch_size)), [])
+    if processes == 1:
+        for batch in batches:
+            yield from parse_batch(batch)
+        return
+    processes = processes or os.cpu_count() or 1
+    with multiprocessing.Pool(processes) as pool:
+        window = 2 * processes
+        pending = deque()
+        for batch in batches:
+            pending.append(pool.apply_async(parse_batch, (batch,)))
+            if len(pending) >= window:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
+
+
+def import_pages(cache, pages, processes=None, batch_size=200):
+    """Parse the given pages and load their records into a cache grabber,
+    stamped with the time of their page. Records already cached from a
+    page at least as recent are kept. Returns an (imported, skipped) pair
+    counting the records loaded and the pages without a newer record."""
+    imported = skipped = 0
+    results = parse_pages(pages, processes, batch_size)
+    for batch in iter(lambda: list(islice(results, batch_size)), []):
+        records = [result for result in batch if result[1] is not None]
+        with cache.lock:
+            cached = cache.cache.get_many([str(id) for id, _, _ in records])
+        records = [
+            (id, record, timestamp)
+            for id, record, timestamp in records
+            if str(id) not in cached or cached[str(id)]["timestamp"] < timestamp
+        ]
+        records.sort(key=lambda result: result[2])
+        with cache.lock, cache.cache.batch():
+            for timestamp, group in groupby(records, lambda result: result[2]):
+                cache.load_many_into_cache(
+                    [(id, record) for id, record, _ in group], timestamp
+                )
+        imported += len(records)
+        skipped += len(batch) - len(records)
+    return imported, skipped
@@ -0,0 +1,136 @@
+import pickle
+import struct
+
+# Version of the compact encoding, stored as the first byte of each encoded
+# record. Pickled records start with the pickle protocol marker instead.
+CODEC_VERSION = 2
+PICKLE_MARKER = 0x80
+
+# The fixed part of an encoded record: the version, schema, institution,
+# year, length of the name and numbers of advisors and descendants.
+header = struct.Struct("<BBIHHHH")
+# Structs packing a number of ids, by number.
+id_structs = {}
+
+# Fields of the records the compact encoding can hold, besides the
+# timestamp, which the cache keeps outside the encoded data.
+FIELDS = frozenset(["name", "institution", "year", "advisors", "descendants", "schema"])
+# Records cached before the schema was recorded have no schema field, and
+# are encoded with schema 1.
+LEGACY_FIELDS = FIELDS - set(["schema"])
+
+
+def encode_record(record, intern):
+    """Encode a record, without its timestamp, as bytes.
+
+    The compact encoding is a fixed-size header holding the version byte,
+    the schema, the institution, the year, the length of the UTF-8 name and
+    the numbers of advisors and descendants, followed by the name and then
+    the sorted advisor and descendant ids as 32-bit integers, so that
+    decoding takes a few calls into struct whatever the size of the
+    record. The institution is stored as the number given for it by
+    intern, a function mapping institution names to positive integers.
+    Records the compact encoding cannot hold are pickled."""
+    if is_compact(record):
+        name = record["name"].encode("utf-8")
+        institution = record["institution"]
+        year = record["year"]
+        ids = sorted(record["advisors"]) + sorted(record["descendants"])
+        try:
+            return (
+                header.pack(
+                    CODEC_VERSION,
+                    record.get("schema", 1),
+                    0 if institution is None else intern(institution),
+                    0 if year is None else year + 1,
+                    len(name),
+                    len(record["advisors"]),
+                    len(record["descendants"]),
+                )
+                + name
+                + id_struct(len(ids)).pack(*ids)
+            )
+        except struct.error:
+            # A number is too large for its field.
+            pass
+    return pickle.dumps(record, pickle.HIGHEST_PROTOCOL)
+
+
+def decode_record(data, institutions):
+    """Decode a record encoded by encode_record, given a function mapping
+    the numbers given by intern back to institution names."""
+    if data[0] != CODEC_VERSION:
+        if data[0] == PICKLE_MARKER:
+            return pickle.loads(data)
+        raise ValueError("Unknown record encoding {}".format(data[0]))
+    try:
+        _, schema, institution, year, length, advisors, descendants = (
+            header.unpack_from(data)
+        )
+        pos = header.size + length
+        ids = id_struct(advisors + descendants).unpack_from(data, pos)
+    except struct.error:
+        raise ValueError("Corrupt record encoding")
+    if len(data) != pos + 4 * len(ids):
+        raise ValueError("Corrupt record encoding")
+    return {
+        "name": data[header.size : pos].decode("utf-8"),
+        "institution": institutions(institution) if institution else None,
+        "year": year - 1 if year else None,
+        "advisors": set(ids[:advisors]),
+        "descendants": set(ids[advisors:]),
+        "schema": schema,
+    }
+
+
+def is_compact(record):
+    """Return True if the compact encoding can hold the record."""
+    if record.keys() != FIELDS and record.keys() != LEGACY_FIELDS:
+        return False
+    year = record["year"]
+    schema = record.get("schema", 1)
+    return (
+        isinstance(record["name"], str)
+        and (record["institution"] is None or isinstance(record["institution"], str))
+        and (year is None or (isinstance(year, int) and year >= 0))
+        and isinstance(schema, int)
+        and schema >= 0
+        and is_id_set(record["advisors"])
+        and is_id_set(record["descendants"])
+    )
+
+
+def is_id_set(ids):
+    """Return True if ids is a set of non-negative ints."""
+    return isinstance(ids, set) and all(isinstance(id, int) and id >= 0 for id in ids)
+
+
+def id_struct(count):
+    """Return the Struct packing count ids."""
+    packer = id_structs.get(count)
+    if packer is None:
+        packer = id_structs[count] = struct.Struct("<{}I".format(count))
+    return packer
+
+
+def write_varint(out, value):
+    """Append a non-negative integer to a bytearray as a varint: seven bits
+    per byte, least significant first, with the high bit set on all but
+    the last byte."""
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, pos):
+    """Return the varint starting at pos in data and the position after
+    it."""
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
@@ -0,0 +1,97 @@
+import threading
+
+
+class Call:
+    """
+    Class holding the outcome of a call that other threads may be waiting
+    for.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def wait(self):
+        """Block until the call is finished and return its result, or raise
+        its exception. The result is None if the call was given up."""
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SingleFlight:
+    """
+    Class making sure at most one call per key is in flight. The first
+    caller for a key makes the call, and callers asking for the same key
+    while it is in flight wait for it and share its outcome. Callers that
+    did not have to make a call of their own are counted in saved.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.saved = 0
+
+    def do(self, key, function, *args):
+        """Return function(*args), or the result of the call for the key
+        already in flight. Callers sharing a call share its result object,
+        and its exception if it raised one."""
+        while True:
+            call, leader = self.begin(key)
+            if leader:
+                try:
+                    result = function(*args)
+                except BaseException as error:
+                    self.finish(key, error=error)
+                    raise
+                self.finish(key, result)
+                return result
+            result = self.wait(call)
+            if result is not None:
+                return result
+
+    def begin(self, key):
+        """Return a (call, leader) pair for the key. If leader is True, the
+        caller is to make the call and then pass its outcome to finish;
+        otherwise the call is already in flight and wait(call) returns its
+        result."""
+        with self.lock:
+            call = self.calls.get(key)
+            if call is not None:
+                return call, False
+            call = self.calls[key] = Call()
+            return call, True
+
+    def wait(self, call):
+        """Block until a call begun by another caller is finished and return
+        its result, or raise its exception. The result is None if the call
+        was given up."""
+        try:
+            result = call.wait()
+        except BaseException:
+            self.count_saved()
+            raise
+        if result is not None:
+            self.count_saved()
+        return result
+
+    def count_saved(self):
+        """Count a caller that shared the outcome of another's call."""
+        with self.lock:
+            self.saved += 1
+
+    def finish(self, key, result=None, error=None):
+        """Hand the outcome of the call for the key begun by the caller to
+        the callers waiting for it. Finishing without a result or an error
+        gives the call up, and the waiting callers make it themselves."""
+        with self.lock:
+            call = self.calls.pop(key)
+        call.result = result
+        call.error = error
+        call.done.set()
+
+    def summary(self):
+        """Return a one-line description of the calls saved."""
+        return "{} fetches saved by sharing in-flight requests".format(self.saved)
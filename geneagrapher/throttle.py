@@ -0,0 +1,243 @@
+import http.client
+import threading
+import time
+import urllib.error
+from .grabber import Grabber
+
+# Errors that may be caused by an overloaded server or network.
+congestion_errors = (
+    urllib.error.URLError,
+    http.client.HTTPException,
+    ConnectionError,
+    TimeoutError,
+)
+
+
+class RateLimiter:
+    """
+    Class spacing out requests so that no more than rate of them start per
+    second. The rate may be changed while the limiter is in use.
+    """
+
+    def __init__(self, rate):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.lock = threading.Lock()
+        self.next_time = time.monotonic()
+
+    def acquire(self):
+        """Block until the next request may start."""
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_time)
+            self.next_time = start + 1.0 / self.rate
+        if start > now:
+            time.sleep(start - now)
+
+
+class AIMDWindow:
+    """
+    Class bounding the number of requests in flight by a window that grows
+    additively while requests succeed and shrinks multiplicatively when
+    the server shows signs of congestion.
+    """
+
+    def __init__(self, max_size, min_size=1, decrease_factor=0.5):
+        if max_size < min_size:
+            raise ValueError("max_size must be at least min_size")
+        self.max_size = max_size
+        self.min_size = min_size
+        self.decrease_factor = decrease_factor
+        self.size = float(max_size)
+        self.in_flight = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        """Block until a request fits in the window."""
+        with self.condition:
+            while self.in_flight >= int(self.size):
+                self.condition.wait()
+            self.in_flight += 1
+
+    def release(self):
+        """Mark a request as finished."""
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def increase(self):
+        """Grow the window by one request per window's worth of
+        successes."""
+        with self.condition:
+            self.size = min(self.max_size, self.size + 1.0 / self.size)
+            self.condition.notify_all()
+
+    def decrease(self):
+        """Shrink the window multiplicatively."""
+        with self.condition:
+            self.size = max(self.min_size, self.size * self.decrease_factor)
+
+
+class Throttle:
+    """
+    Class keeping the requests of one or more ThrottledGrabbers within a
+    requests-per-second budget and, if adaptive, adjusting the number of
+    requests in flight and the request rate to the health of the server.
+
+    The throttle also counts the requests made, so the achieved throughput
+    can be reported.
+    """
+
+    def __init__(
+        self,
+        rate=None,
+        max_concurrency=1,
+        adaptive=False,
+        slow_response=5.0,
+        decrease_factor=0.5,
+    ):
+        """
+        Throttle class constructor.
+
+        Parameters:
+            rate: maximum number of requests per second (None for no limit)
+            max_concurrency: maximum number of requests in flight
+            adaptive: True to adjust concurrency and rate to the server
+            slow_response: response time, in seconds, regarded as a sign
+                of congestion
+            decrease_factor: factor applied to the concurrency and rate
+                when congestion is seen
+        """
+        self.max_rate = rate
+        self.limiter = RateLimiter(rate) if rate is not None else None
+        self.window = AIMDWindow(max_concurrency, decrease_factor=decrease_factor)
+        self.adaptive = adaptive
+        self.slow_response = slow_response
+        self.decrease_factor = decrease_factor
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.congestion_events = 0
+        self.start_time = None
+        self.end_time = None
+
+    def acquire(self):
+        """Block until a request may be made."""
+        self.window.acquire()
+        if self.limiter is not None:
+            self.limiter.acquire()
+        with self.lock:
+            if self.start_time is None:
+                self.start_time = time.monotonic()
+
+    def release(self, latency, congested=False):
+        """Finish a request that took latency seconds. Requests that failed
+        because of congestion are passed with congested set to True."""
+        self.window.release()
+        congested = congested or latency > self.slow_response
+        with self.lock:
+            self.requests += 1
+            self.end_time = time.monotonic()
+            if congested:
+                self.congestion_events += 1
+        if not self.adaptive:
+            return
+        if congested:
+            self.window.decrease()
+            if self.limiter is not None:
+                self.limiter.rate = max(
+                    self.max_rate / 100.0, self.limiter.rate * self.decrease_factor
+                )
+        else:
+            self.window.increase()
+            if self.limiter is not None:
+                self.limiter.rate = min(
+                    self.max_rate, self.limiter.rate + self.max_rate / 100.0
+                )
+
+    def throughput(self):
+        """Return the achieved number of requests per second."""
+        with self.lock:
+            if self.start_time is None or self.end_time == self.start_time:
+                return 0.0
+            return self.requests / (self.end_time - self.start_time)
+
+    def summary(self):
+        """Return a one-line description of the achieved throughput."""
+        return "{} requests at {:.2f} requests/s ({} congestion events)".format(
+            self.requests, self.throughput(), self.congestion_events
+        )
+
+
+class ThrottledGrabber:
+    """
+    Class wrapping a record grabber so that its get_record and get_page
+    calls are made within the limits of a Throttle. Requests answered with
+    429 or a 5xx status are retried with backoff.
+    """
+
+    # Response codes that signal an overloaded server.
+    retry_codes = (429, 500, 502, 503, 504)
+
+    def __init__(self, throttle=None, record_grabber=Grabber, max_retries=5, **kwargs):
+        self.throttle = throttle if throttle is not None else Throttle()
+        self.grabber = record_grabber(**kwargs)
+        self.max_retries = max_retries
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Close the wrapped grabber."""
+        if hasattr(self.grabber, "close"):
+            self.grabber.close()
+
+    def get_record(self, id):
+        """Return the record for the given id from the wrapped grabber."""
+        return self.call(self.grabber.get_record, id)
+
+    def get_page(self, id):
+        """Return the raw page for the given id from the wrapped grabber."""
+        return self.call(self.grabber.get_page, id)
+
+    def call(self, method, id):
+        """Call a method of the wrapped grabber for the given id within the
+        limits of the throttle, retrying on congestion."""
+        backoff = 1.0
+        for attempt in range(self.max_retries + 1):
+            self.throttle.acquire()
+            start = time.monotonic()
+            try:
+                result = method(id)
+            except congestion_errors as e:
+                # Timeouts, dropped connections and overload responses are
+                # signs of congestion and are retried. Other HTTP errors are
+                # not.
+                retry = not isinstance(e, urllib.error.HTTPError) or (
+                    e.code in self.retry_codes
+                )
+                self.throttle.release(time.monotonic() - start, congested=retry)
+                if not retry or attempt == self.max_retries:
+                    raise
+                time.sleep(retry_after(e, backoff))
+                backoff *= 2
+                continue
+            except BaseException:
+                self.throttle.release(time.monotonic() - start)
+                raise
+            self.throttle.release(time.monotonic() - start)
+            return result
+
+
+def retry_after(error, default):
+    """Return the number of seconds to wait before retrying, taken from the
+    Retry-After header of an HTTP error when it gives one."""
+    headers = getattr(error, "headers", None)
+    value = headers.get("Retry-After") if headers is not None else None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return default
@@ -22,6 +22,7 @@ setuptools.setup(
             ['ggrapher=geneagrapher.geneagrapher:ggrapher']
     },
     install_requires=['beautifulsoup4==4.6.3', 'lxml'],
+    extras_require={'numpy': ['numpy']},
     long_description=long_description,
     long_description_content_type="text/markdown",
     url="https://github.com/davidalber/geneagrapher",
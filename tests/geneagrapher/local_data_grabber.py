@@ -1,7 +1,6 @@
 import os
 import sys
-from bs4 import BeautifulSoup
-from geneagrapher.grabber import get_record_from_tree
+from geneagrapher.grabber import get_record_from_html
 
 
 class LocalDataGrabber:
@@ -24,9 +23,20 @@ class LocalDataGrabber:
     def get_record(self, id):
         """Load the local data for the given id and use Grabber's functionas
         to extract the record data."""
-        with open(self.data_file("{0}.html".format(id)), "r") as fin:
-            soup = BeautifulSoup(fin, "lxml")
-        return get_record_from_tree(soup, id)
+        page, encoding = self.get_page(id)
+        return get_record_from_html(page, id, encoding)
+
+    def get_page(self, id):
+        """Return the local data for the given id as a (page, encoding)
+        pair."""
+        with open(self.data_file("{0}.html".format(id)), "rb") as fin:
+            return fin.read(), None
+
+    def get_records(self, ids):
+        """Generate (id, record) pairs for the given ids from the local
+        data."""
+        for id in ids:
+            yield id, self.get_record(id)
 
 
 file_path = os.path.abspath(__file__)
@@ -0,0 +1,106 @@
+import gzip
+import http.server
+import os
+import threading
+import time
+from .local_data_grabber import LocalDataGrabber
+
+
+class LocalDataRequestHandler(http.server.BaseHTTPRequestHandler):
+    """A request handler serving the locally-cached test data the way the
+    Mathematics Genealogy Project serves record pages."""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        http.server.BaseHTTPRequestHandler.setup(self)
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        if server.connect_delay:
+            # Stand in for the cost of setting up a new (TLS) connection.
+            time.sleep(server.connect_delay)
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            status = server.statuses.pop(0) if server.statuses else 200
+        if status != 200:
+            self.send_response(status)
+            if status == 301:
+                self.send_header("Location", self.path.replace("/old/", "/"))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        id = self.path.split("=")[-1]
+        try:
+            with open(LocalDataGrabber.data_file("{}.html".format(id)), "rb") as fin:
+                body = fin.read()
+        except OSError:
+            self.send_error(404)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class LocalHTTPServer(http.server.ThreadingHTTPServer):
+    """A threaded HTTP server on a free local port, run in the background,
+    that serves the locally-cached test data.
+
+    Responses for the next requests may be overridden by appending status
+    codes to the statuses list."""
+
+    daemon_threads = True
+
+    def __init__(self, connect_delay=0.0):
+        http.server.ThreadingHTTPServer.__init__(
+            self, ("127.0.0.1", 0), LocalDataRequestHandler
+        )
+        self.connect_delay = connect_delay
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.statuses = []
+        self.thread = threading.Thread(
+            target=self.serve_forever, args=(0.05,), daemon=True
+        )
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+        self.server_close()
+
+    @property
+    def record_url(self):
+        """The record URL template for this server."""
+        return "http://127.0.0.1:{}/id.php?id={{}}".format(self.server_address[1])
+
+
+def data_ids():
+    """Return the ids of the locally-cached records that exist."""
+    ids = []
+    for filename in sorted(os.listdir(LocalDataGrabber.data_path)):
+        name, ext = os.path.splitext(filename)
+        if ext == ".html" and name.isdigit():
+            ids.append(int(name))
+    return [id for id in ids if id not in INVALID_IDS]
+
+
+# Ids of locally-cached pages that do not contain a record.
+INVALID_IDS = (999999999, 79568583832, 999999999999999999999)
@@ -0,0 +1,294 @@
+import io
+import os
+import random
+import sys
+import unittest
+from geneagrapher import analytics
+from geneagrapher.analytics import GenealogyArrays
+from geneagrapher.analytics_command import analytics_main
+from geneagrapher.cache_grabber import CacheGrabber
+from geneagrapher.graph import Graph, save_graph_arrays
+from .local_data_grabber import LocalDataGrabber
+from .local_http_server import data_ids
+
+numpy = analytics.numpy
+
+
+def reachable(graph, id, attribute):
+    """Return the set of the ids reachable from id through the ancestors or
+    descendants of the nodes of a Graph."""
+    seen = set()
+    stack = [id]
+    while stack:
+        for linked in getattr(graph[stack.pop()], attribute):
+            if linked in graph and linked not in seen:
+                seen.add(linked)
+                stack.append(linked)
+    return seen
+
+
+def random_graph(count, seed):
+    """Return a random Graph of count nodes in which each node is advised
+    by up to three nodes with smaller ids."""
+    rng = random.Random(seed)
+    advisors = dict(
+        (id, set(rng.sample(range(id), min(id, rng.randint(0, 3)))))
+        for id in range(count)
+    )
+    students = dict((id, set()) for id in range(count))
+    for id, linked in advisors.items():
+        for advisor in linked:
+            students[advisor].add(id)
+    graph = Graph()
+    graph.add_nodes(
+        ("Name {}".format(id), None, None, id, advisors[id], students[id])
+        for id in rng.sample(range(count), count)
+    )
+    return graph
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class TestAnalyticsMethods(unittest.TestCase):
+    """Unit tests for the geneagrapher.analytics module."""
+
+    def setUp(self):
+        grabber = LocalDataGrabber()
+        self.graph = Graph()
+        records = []
+        for id in data_ids():
+            record = grabber.get_record(id)
+            records.append(
+                (
+                    record["name"],
+                    record["institution"],
+                    record["year"],
+                    id,
+                    record["advisors"],
+                    record["descendants"],
+                )
+            )
+        self.graph.add_nodes(records[:2], True)
+        self.graph.add_nodes(records[2:])
+        self.arrays = GenealogyArrays.from_graph(self.graph)
+
+    def test_init(self):
+        """Test the arrays of a graph."""
+        self.assertEqual(len(self.arrays), len(self.graph))
+        self.assertEqual(self.arrays.ids.tolist(), list(self.graph))
+        self.assertEqual(
+            self.arrays.names, [node.record.name for node in self.graph.values()]
+        )
+        self.assertEqual(sorted(self.arrays.seeds.tolist()), sorted(self.graph.seeds))
+
+    def test_load(self):
+        """Test loading the arrays saved by save_graph_arrays."""
+        filename = "analytics-test.npz"
+        try:
+            save_graph_arrays(self.graph, filename)
+            arrays = GenealogyArrays.load(filename)
+        finally:
+            os.remove(filename)
+        self.assertEqual(arrays.ids.tolist(), self.arrays.ids.tolist())
+        self.assertEqual(arrays.names, self.arrays.names)
+        self.assertEqual(
+            arrays.descendant_counts().tolist(),
+            self.arrays.descendant_counts().tolist(),
+        )
+
+    def test_indexes(self):
+        """Test the node numbers of ids."""
+        ids = list(self.graph)
+        self.assertEqual(
+            self.arrays.indexes(ids[::-1]).tolist(), list(range(len(ids)))[::-1]
+        )
+        self.assertRaises(KeyError, self.arrays.indexes, [ids[0], 1])
+
+    def test_descendant_counts(self):
+        """Test descendant counts against a walk of the graph."""
+        for graph in [self.graph, random_graph(300, 1), random_graph(2500, 2)]:
+            arrays = GenealogyArrays.from_graph(graph)
+            self.assertEqual(
+                arrays.descendant_counts().tolist(),
+                [len(reachable(graph, id, "descendants")) for id in graph],
+            )
+
+    def test_generations(self):
+        """Test generation depths against breadth-first searches."""
+        graph = random_graph(500, 3)
+        arrays = GenealogyArrays.from_graph(graph)
+        for seeds, attribute, ancestors in [
+            ([0], "descendants", False),
+            ([0, 17, 40], "descendants", False),
+            ([499, 250], "ancestors", True),
+        ]:
+            expected = dict((id, -1) for id in graph)
+            frontier = set(seeds)
+            depth = 0
+            while frontier:
+                for id in frontier:
+                    expected[id] = depth
+                frontier = set(
+                    linked
+                    for id in frontier
+                    for linked in getattr(graph[id], attribute)
+                    if expected[linked] < 0
+                )
+                depth += 1
+            self.assertEqual(
+                arrays.generations(seeds, ancestors).tolist(),
+                [expected[id] for id in graph],
+            )
+
+    def test_generations_default_seeds(self):
+        """Test that generations are counted from the seeds of the graph."""
+        depths = self.arrays.generations()
+        for seed in self.graph.seeds:
+            self.assertEqual(depths[self.arrays.indexes([seed])[0]], 0)
+        self.assertRaises(KeyError, self.arrays.generations, [1])
+
+    def test_longest_chain(self):
+        """Test the longest advisor chain."""
+        graph = random_graph(1000, 4)
+        chain = GenealogyArrays.from_graph(graph).longest_chain()
+        for advisor, student in zip(chain, chain[1:]):
+            self.assertIn(advisor, graph[student].ancestors)
+        longest = {}
+        for id in sorted(graph):
+            longest[id] = 1 + max(
+                [longest[advisor] for advisor in graph[id].ancestors] or [0]
+            )
+        self.assertEqual(len(chain), max(longest.values()))
+        self.assertEqual(GenealogyArrays.from_graph(Graph()).longest_chain(), [])
+
+    def test_longest_chain_data(self):
+        """Test the longest advisor chain of the test data."""
+        chain = self.arrays.longest_chain()
+        self.assertGreater(len(chain), 1)
+        for advisor, student in zip(chain, chain[1:]):
+            self.assertIn(advisor, self.graph[student].ancestors)
+
+    def test_top_advisors(self):
+        """Test the mathematicians with the most students."""
+        students = sorted(
+            (-len(node.descendants & set(self.graph)), id)
+            for id, node in self.graph.items()
+        )
+        self.assertEqual(
+            self.arrays.top_advisors(5), [(id, -count) for count, id in students[:5]]
+        )
+        self.assertEqual(
+            len(self.arrays.top_advisors(len(self.graph) + 5)), len(self.graph)
+        )
+
+    def test_top_descendants(self):
+        """Test the mathematicians with the most descendants."""
+        counts = sorted(
+            (-len(reachable(self.graph, id, "descendants")), id) for id in self.graph
+        )
+        self.assertEqual(
+            self.arrays.top_descendants(5), [(id, -count) for count, id in counts[:5]]
+        )
+
+    def test_cycle(self):
+        """Test that advisor links forming a cycle raise ValueError."""
+        graph = Graph()
+        graph.add_nodes(
+            [
+                ("A", None, None, 1, set([3]), set([2])),
+                ("B", None, None, 2, set([1]), set([3])),
+                ("C", None, None, 3, set([2]), set([1, 4])),
+                ("D", None, None, 4, set([3]), set()),
+            ]
+        )
+        arrays = GenealogyArrays.from_graph(graph)
+        self.assertRaisesRegex(
+            ValueError,
+            "4 mathematicians are in or below cycles",
+            arrays.descendant_counts,
+        )
+
+    def test_require_numpy(self):
+        """Test that the arrays need numpy."""
+        graph_arrays = sys.modules["geneagrapher.graph.graph_arrays"]
+        graph_arrays.numpy = None
+        try:
+            self.assertRaises(ImportError, GenealogyArrays.from_graph, self.graph)
+        finally:
+            graph_arrays.numpy = numpy
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class TestAnalyticsCommandMethods(unittest.TestCase):
+    """Unit tests for the ggrapher analytics command."""
+
+    def setUp(self):
+        self.cache_file = "geneacache-analytics-test"
+        self.stdout = sys.stdout
+        sys.stdout = io.StringIO()
+        with CacheGrabber(self.cache_file, record_grabber=LocalDataGrabber) as cache:
+            list(cache.get_records([18231, 18230, 18603]))
+
+    def tearDown(self):
+        sys.stdout = self.stdout
+        for filename in os.listdir("."):
+            if filename.startswith(self.cache_file):
+                os.remove(filename)
+
+    def test_cache(self):
+        """Test the analytics of the cached records."""
+        analytics_main(["--cache-file", self.cache_file, "--seed", "18231"])
+        output = sys.stdout.getvalue()
+        self.assertIn("Mathematicians: 3\nAdvisor links: 2\n", output)
+        self.assertIn("Longest advisor chain: 3 mathematicians\n", output)
+        self.assertIn(
+            "Most students:\n"
+            "        id  students  descendants  name\n"
+            "     18230         1            2  Johann Friedrich Pfaff\n",
+            output,
+        )
+        self.assertIn("Generations from the seeds:\n    0  1\n    1  1\n", output)
+
+    def test_file(self):
+        """Test the analytics of a graph arrays file."""
+        filename = self.cache_file + ".npz"
+        graph = Graph()
+        graph.add_nodes(
+            [
+                ("A", None, None, 1, set(), set([2])),
+                ("B", None, None, 2, set([1]), set()),
+            ],
+            True,
+        )
+        save_graph_arrays(graph, filename)
+        analytics_main([filename, "--top", "1", "--ancestors"])
+        self.assertEqual(
+            sys.stdout.getvalue(),
+            """Mathematicians: 2
+Advisor links: 1
+Longest advisor chain: 2 mathematicians
+         1  A
+         2  B
+Most students:
+        id  students  descendants  name
+         1         1            1  A
+Most descendants:
+        id  students  descendants  name
+         1         1            1  A
+Generations from the seeds:
+    0  2
+""",
+        )
+
+    def test_missing_seed(self):
+        """Test that a seed that is not in the graph is an error."""
+        stderr = sys.stderr
+        sys.stderr = io.StringIO()
+        try:
+            self.assertRaises(
+                SystemExit,
+                analytics_main,
+                ["--cache-file", self.cache_file, "--seed", "1"],
+            )
+            self.assertIn("mathematician 1 is not in the graph", sys.stderr.getvalue())
+        finally:
+            sys.stderr = stderr
@@ -0,0 +1,431 @@
+import os
+import pickle
+import unittest
+from geneagrapher import cache_backends
+from geneagrapher.cache_backends import (
+    LRUBackend,
+    ShelveBackend,
+    SQLiteBackend,
+    migrate,
+    open_backend,
+    record_size,
+)
+from geneagrapher.record_codec import CODEC_VERSION
+
+
+class TestCacheBackendMethods(unittest.TestCase):
+    """Unit tests for the cache backends in geneagrapher.cache_backends."""
+
+    def setUp(self):
+        self.filename = "geneacache-backend-test"
+        self.record = {
+            "name": "Carl Friedrich Gau\xdf",
+            "institution": "Universit\xe4t Helmstedt",
+            "year": 1799,
+            "advisors": set([18230]),
+            "descendants": set([18603, 18233]),
+            "timestamp": 1000.0,
+            "schema": 1,
+        }
+
+    def tearDown(self):
+        for filename in os.listdir("."):
+            if filename.startswith(self.filename):
+                os.remove(filename)
+
+    def check_backend(self, backend):
+        """Check the mapping operations of a backend."""
+        self.assertEqual(len(backend), 0)
+        self.assertIsNone(backend.get("18231"))
+        self.assertRaises(KeyError, backend.__getitem__, "18231")
+        self.assertFalse("18231" in backend)
+
+        backend["18231"] = self.record
+        backend.put_many([("18230", dict(self.record, name="Johann Friedrich Pfaff"))])
+        self.assertEqual(len(backend), 2)
+        self.assertTrue("18231" in backend)
+        self.assertEqual(backend["18231"], self.record)
+        self.assertEqual(backend.get("18230")["name"], "Johann Friedrich Pfaff")
+        self.assertEqual(sorted(backend.keys()), ["18230", "18231"])
+        self.assertEqual(
+            backend.get_many(["18231", "1", "18230"]),
+            {"18231": self.record, "18230": backend["18230"]},
+        )
+        self.assertEqual(dict(backend.items())["18231"], self.record)
+
+        with backend.batch():
+            backend["18231"] = dict(self.record, year=1800)
+            backend["137717"] = self.record
+        self.assertEqual(backend["18231"]["year"], 1800)
+        self.assertEqual(len(backend), 3)
+
+        del backend["18230"]
+        self.assertEqual(len(backend), 2)
+        self.assertIsNone(backend.get("18230"))
+
+        backend.close()
+        self.assertRaisesRegex(ValueError, "invalid operation on closed", len, backend)
+
+    def test_sqlite(self):
+        """Test the SQLite backend."""
+        backend = SQLiteBackend(self.filename)
+        self.assertTrue(os.path.exists(self.filename + ".sqlite"))
+        self.check_backend(backend)
+
+    def test_shelve(self):
+        """Test the shelve backend."""
+        self.check_backend(ShelveBackend(self.filename))
+
+    def test_sqlite_persistence(self):
+        """Test that records written by the SQLite backend survive
+        reopening."""
+        with SQLiteBackend(self.filename) as backend:
+            backend["18231"] = self.record
+        with SQLiteBackend(self.filename) as backend:
+            self.assertEqual(backend["18231"], self.record)
+
+    def test_sqlite_encoding(self):
+        """Test that the SQLite backend stores records in the compact
+        encoding with interned institutions, and reads pickled rows."""
+        with SQLiteBackend(self.filename) as backend:
+            backend.put_many(
+                (str(id), dict(self.record, year=1799 + id)) for id in range(3)
+            )
+            data = self.rows(backend)[0][2]
+            self.assertEqual(data[0], CODEC_VERSION)
+            self.assertEqual(
+                backend.db.execute("SELECT name FROM institutions").fetchall(),
+                [("Universit\xe4t Helmstedt",)],
+            )
+
+            backend.db.execute(
+                "UPDATE records SET data = ? WHERE id = 1",
+                (pickle.dumps(dict(self.record, year=1800, timestamp=0.0)),),
+            )
+            self.assertEqual(backend["1"], dict(self.record, year=1800))
+
+            # Institutions interned by another connection are found.
+            with SQLiteBackend(self.filename) as other:
+                other["3"] = dict(self.record, institution="Universit\xe4t Leipzig")
+            self.assertEqual(backend["3"]["institution"], "Universit\xe4t Leipzig")
+
+    def test_sqlite_batch_rollback(self):
+        """Test that the writes of a failed batch are discarded."""
+        with SQLiteBackend(self.filename) as backend:
+            try:
+                with backend.batch():
+                    backend["18231"] = self.record
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            self.assertEqual(len(backend), 0)
+
+    def test_sqlite_get_many_chunks(self):
+        """Test looking up more ids than fit in one query."""
+        with SQLiteBackend(self.filename) as backend:
+            backend.query_size = 3
+            backend.put_many((str(id), dict(self.record, year=id)) for id in range(10))
+            records = backend.get_many([str(id) for id in range(0, 12, 2)])
+            self.assertEqual(sorted(records, key=int), ["0", "2", "4", "6", "8"])
+            self.assertEqual(records["6"]["year"], 6)
+            self.assertEqual(
+                [key for key, record in backend.items()], [str(id) for id in range(10)]
+            )
+
+    def test_lru(self):
+        """Test the memory tier."""
+        backend = LRUBackend(SQLiteBackend(self.filename))
+        self.check_backend(backend)
+
+    def test_lru_hits(self):
+        """Test that the memory tier answers repeated lookups and counts
+        them."""
+        with LRUBackend(SQLiteBackend(self.filename)) as backend:
+            backend["18231"] = self.record
+            self.assertEqual(backend.get("18231"), self.record)
+            self.assertEqual((backend.hits, backend.misses), (0, 1))
+
+            # Later lookups do not go to the wrapped backend.
+            backend.store.close()
+            record = backend["18231"]
+            self.assertEqual(record, self.record)
+            self.assertEqual((backend.hits, backend.misses), (1, 1))
+            self.assertEqual(backend.get_many(["18231"]), {"18231": self.record})
+            self.assertEqual((backend.hits, backend.misses), (2, 1))
+            self.assertEqual(
+                backend.summary(),
+                "2 memory cache hits, 1 misses (66.7% hit rate)",
+            )
+
+            # Changing a returned record does not change the remembered one.
+            record["name"] = "Rigged for test"
+            record["advisors"].add(999)
+            self.assertEqual(backend["18231"], self.record)
+            backend.get_many(["18231"])["18231"]["descendants"].add(999)
+            self.assertEqual(backend["18231"], self.record)
+
+    def test_lru_remember_copy(self):
+        """Test that changing a record read from the wrapped backend does
+        not change the copy remembered in memory."""
+        with LRUBackend(SQLiteBackend(self.filename)) as backend:
+            backend["18231"] = self.record
+            backend["18230"] = self.record
+            backend.get("18231")["advisors"].add(999)
+            backend.get_many(["18230"])["18230"]["descendants"].add(999)
+            backend.store.close()
+            self.assertEqual(backend["18231"], self.record)
+            self.assertEqual(backend["18230"], self.record)
+
+    def test_lru_invalidate(self):
+        """Test that writes invalidate the records held in memory."""
+        with LRUBackend(SQLiteBackend(self.filename)) as backend:
+            backend["18231"] = self.record
+            backend.get("18231")
+            self.assertTrue("18231" in backend.entries)
+            backend["18231"] = dict(self.record, year=1800)
+            self.assertFalse("18231" in backend.entries)
+            self.assertEqual(backend["18231"]["year"], 1800)
+            del backend["18231"]
+            self.assertIsNone(backend.get("18231"))
+            self.assertEqual(backend.size, 0)
+
+    def test_lru_evict_entries(self):
+        """Test that the least recently used records are evicted when there
+        are too many."""
+        with LRUBackend(SQLiteBackend(self.filename), max_entries=2) as backend:
+            backend.put_many((str(id), self.record) for id in range(3))
+            backend.get("0")
+            backend.get("1")
+            backend.get("0")
+            backend.get("2")
+            self.assertEqual(list(backend.entries), ["0", "2"])
+
+    def test_lru_evict_bytes(self):
+        """Test that records are evicted when they take too much memory."""
+        with LRUBackend(SQLiteBackend(self.filename)) as backend:
+            backend.put_many((str(id), self.record) for id in range(3))
+            size = record_size(backend.store.get("0"))
+            backend.max_bytes = 2 * size + 1
+            backend.get_many(["0", "1", "2"])
+            self.assertEqual(list(backend.entries), ["1", "2"])
+            self.assertEqual(backend.size, 2 * size)
+
+            backend.max_bytes = size - 1
+            backend.get("0")
+            self.assertFalse("0" in backend.entries)
+
+    def test_sqlite_evict(self):
+        """Test that the SQLite backend evicts expired records first, then
+        the least recently used ones."""
+        with SQLiteBackend(self.filename) as backend:
+            backend.put_many(
+                (str(id), dict(self.record, timestamp=1000.0 + id)) for id in range(5)
+            )
+            size = backend.data_size()
+            self.assertEqual(size, sum(len(row[2]) for row in self.rows(backend)))
+            self.assertEqual(backend.evict(size), 0)
+            self.assertEqual(len(backend), 5)
+
+            # Record 0 is expired. Of the others, 3 and then 1 were used
+            # least recently.
+            backend.accessed = {1: 2.0, 2: 4.0, 3: 1.0, 4: 3.0}
+            self.assertEqual(backend.evict(size * 2 // 5, 1001.0), 3)
+            self.assertEqual(backend.keys(), ["2", "4"])
+
+    def test_sqlite_touch(self):
+        """Test that uses of records are written with the next
+        transaction."""
+        with SQLiteBackend(self.filename) as backend:
+            backend["18231"] = self.record
+            accessed = self.rows(backend)[0][3]
+            backend.get("18231")
+            self.assertEqual(self.rows(backend)[0][3], accessed)
+            self.assertEqual(list(backend.accessed), [18231])
+            with backend.batch():
+                pass
+            self.assertGreaterEqual(self.rows(backend)[0][3], accessed)
+            self.assertEqual(backend.accessed, {})
+
+    def test_shelve_evict(self):
+        """Test that the shelve backend evicts expired records first, then
+        the oldest ones."""
+        with ShelveBackend(self.filename) as backend:
+            for id in [3, 1, 0, 4, 2]:
+                backend[str(id)] = dict(self.record, timestamp=1000.0 + id)
+            size = backend.data_size()
+            self.assertEqual(backend.evict(size), 0)
+            self.assertEqual(backend.evict(size * 2 // 5, 1001.0), 3)
+            self.assertEqual(sorted(backend.keys()), ["3", "4"])
+
+    def test_lru_evict(self):
+        """Test that evicting through the memory tier drops the records held
+        in memory."""
+        with LRUBackend(SQLiteBackend(self.filename)) as backend:
+            backend.put_many((str(id), self.record) for id in range(3))
+            backend.get_many(["0", "1", "2"])
+            self.assertEqual(backend.evict(0), 3)
+            self.assertEqual(len(backend.entries), 0)
+            self.assertIsNone(backend.get("0"))
+
+    def check_compact(self, backend):
+        """Check that compacting a backend reclaims the space of removed
+        records and keeps the others."""
+        with backend.batch():
+            for id in range(500):
+                backend[str(id)] = dict(self.record, name="x" * 1000)
+        with backend.batch():
+            for id in range(1, 500):
+                del backend[str(id)]
+        before = backend.file_size()
+        reclaimed = backend.compact()
+        self.assertGreater(reclaimed, 0)
+        self.assertEqual(backend.file_size(), before - reclaimed)
+        self.assertEqual(backend.keys(), ["0"])
+        self.assertEqual(backend["0"]["name"], "x" * 1000)
+        backend["1"] = self.record
+        self.assertEqual(len(backend), 2)
+
+    def test_sqlite_compact(self):
+        """Test compacting the SQLite backend."""
+        with SQLiteBackend(self.filename) as backend:
+            self.check_compact(backend)
+
+    def test_shelve_compact(self):
+        """Test compacting the shelve backend."""
+        with ShelveBackend(self.filename) as backend:
+            self.check_compact(backend)
+        self.assertFalse([name for name in os.listdir(".") if ".compact" in name])
+
+    @unittest.skipIf(cache_backends.fcntl is None, "flock is not available")
+    def test_shelve_compact_locked(self):
+        """Test that the shelve backend holds its exclusive lock through
+        every step of compacting, as seen from another descriptor."""
+        fcntl = cache_backends.fcntl
+        with ShelveBackend(self.filename) as backend:
+            backend["0"] = self.record
+            probes = []
+            suffixes = backend.suffixes
+
+            def probe(filename=None):
+                # Called by compact before removing and replacing files.
+                with open(self.filename + ".lock", "ab") as other:
+                    try:
+                        fcntl.flock(other, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        probes.append(True)
+                    else:
+                        fcntl.flock(other, fcntl.LOCK_UN)
+                        probes.append(False)
+                return suffixes(filename)
+
+            backend.suffixes = probe
+            backend.compact()
+            self.assertGreaterEqual(len(probes), 3)
+            self.assertTrue(all(probes))
+
+            # The lock is released afterwards.
+            with open(self.filename + ".lock", "ab") as other:
+                fcntl.flock(other, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                fcntl.flock(other, fcntl.LOCK_UN)
+            self.assertEqual(backend["0"]["name"], self.record["name"])
+
+    def test_shelve_kept_open(self):
+        """Test that the shelve backend keeps its shelf open between reads,
+        and opens it again once another backend has written to it."""
+        pfaff = dict(self.record, name="Johann Friedrich Pfaff")
+        with ShelveBackend(self.filename) as backend, ShelveBackend(
+            self.filename
+        ) as other:
+            backend["18231"] = self.record
+            self.assertEqual(other["18231"], self.record)
+            shelf = other.shelf
+            self.assertIsNotNone(shelf)
+            self.assertIsNone(other.get("18230"))
+            self.assertIs(other.shelf, shelf)
+
+            backend["18230"] = pfaff
+            self.assertEqual(other["18230"], pfaff)
+            self.assertIsNot(other.shelf, shelf)
+            other["18231"] = pfaff
+            self.assertEqual(backend["18231"], pfaff)
+            self.assertEqual(len(backend), 2)
+
+    @unittest.skipIf(cache_backends.fcntl is None, "flock is not available")
+    def test_shelve_lock_upgrade(self):
+        """Test that an exclusive lock taken inside a shared one is given
+        back as a shared lock."""
+        fcntl = cache_backends.fcntl
+        with ShelveBackend(self.filename) as backend:
+            with open(self.filename + ".lock", "ab") as other:
+                with backend.locked():
+                    with backend.locked(write=True):
+                        self.assertRaises(
+                            BlockingIOError,
+                            fcntl.flock,
+                            other,
+                            fcntl.LOCK_SH | fcntl.LOCK_NB,
+                        )
+                    fcntl.flock(other, fcntl.LOCK_SH | fcntl.LOCK_NB)
+                    fcntl.flock(other, fcntl.LOCK_UN)
+                    self.assertRaises(
+                        BlockingIOError,
+                        fcntl.flock,
+                        other,
+                        fcntl.LOCK_EX | fcntl.LOCK_NB,
+                    )
+                fcntl.flock(other, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def rows(self, backend):
+        """Return the rows of an SQLite backend's records table."""
+        return backend.db.execute("SELECT * FROM records ORDER BY id").fetchall()
+
+    def test_open_backend(self):
+        """Test opening backends by name."""
+        with open_backend("sqlite", self.filename) as backend:
+            self.assertIsInstance(backend, SQLiteBackend)
+        with open_backend("shelve", self.filename) as backend:
+            self.assertIsInstance(backend, ShelveBackend)
+        self.assertRaisesRegex(
+            ValueError,
+            "Unknown cache backend nosuchbackend",
+            open_backend,
+            "nosuchbackend",
+            self.filename,
+        )
+
+    def test_open_default_backend(self):
+        """Test that a cache that only exists as a shelve is opened with the
+        shelve backend by default, and any other cache with SQLite."""
+        with open_backend(None, self.filename) as backend:
+            self.assertIsInstance(backend, SQLiteBackend)
+        self.tearDown()
+        with open_backend("shelve", self.filename) as backend:
+            backend["18231"] = self.record
+        with open_backend(None, self.filename) as backend:
+            self.assertIsInstance(backend, ShelveBackend)
+            self.assertEqual(backend["18231"], self.record)
+        migrate(self.filename)
+        with open_backend(None, self.filename) as backend:
+            self.assertIsInstance(backend, SQLiteBackend)
+
+    def test_migrate(self):
+        """Test migrating a shelve cache to SQLite. Records cached before
+        the schema was recorded are stored in the compact encoding too."""
+        legacy = dict(self.record, name="Johann Friedrich Pfaff")
+        del legacy["schema"]
+        with ShelveBackend(self.filename) as backend:
+            backend["18231"] = self.record
+            backend["18230"] = legacy
+        self.assertEqual(migrate(self.filename), 2)
+        with SQLiteBackend(self.filename) as backend:
+            self.assertEqual(len(backend), 2)
+            self.assertEqual(backend["18231"], self.record)
+            self.assertEqual(backend["18230"], dict(legacy, schema=1))
+            self.assertEqual(
+                [data[0] for id, timestamp, data, used in self.rows(backend)],
+                [CODEC_VERSION, CODEC_VERSION],
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
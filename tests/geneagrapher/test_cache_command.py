@@ -0,0 +1,218 @@
+from argparse import ArgumentTypeError
+from datetime import datetime
+import io
+import os
+import sys
+import unittest
+from geneagrapher.cache_command import cache_main, parse_size, parse_time
+from geneagrapher.cache_grabber import CacheGrabber
+from geneagrapher.grabber import SCHEMA_VERSION
+from geneagrapher.graph import CSRGraph
+from .local_data_grabber import LocalDataGrabber
+from .local_http_server import data_ids
+
+
+class TestCacheCommandMethods(unittest.TestCase):
+    """Unit tests for the ggrapher cache commands."""
+
+    def setUp(self):
+        self.cache_file = "geneacache-command-test"
+        self.stdout = sys.stdout
+        sys.stdout = io.StringIO()
+
+    def tearDown(self):
+        sys.stdout = self.stdout
+        for filename in os.listdir("."):
+            if filename.startswith(self.cache_file):
+                os.remove(filename)
+
+    def test_reparse(self):
+        """Test the reparse command."""
+        with CacheGrabber(
+            self.cache_file, record_grabber=LocalDataGrabber, archive=True
+        ) as cache:
+            list(cache.get_records([18231, 137717]))
+            d = cache.cache["137717"]
+            d["institution"] = "Rigged for test"
+            d["schema"] = SCHEMA_VERSION - 1
+            cache.cache["137717"] = d
+
+        cache_main(["reparse", "--cache-file", self.cache_file])
+        self.assertEqual(sys.stdout.getvalue(), "Reparsed 1 records\n")
+        cache_main(["reparse", "--cache-file", self.cache_file, "--force"])
+        self.assertEqual(
+            sys.stdout.getvalue(), "Reparsed 1 records\nReparsed 2 records\n"
+        )
+
+        with CacheGrabber(self.cache_file) as cache:
+            d = cache.cache["137717"]
+            self.assertEqual(d["institution"], "Universit\xe4t Leipzig")
+            self.assertEqual(d["schema"], SCHEMA_VERSION)
+
+    def test_compact(self):
+        """Test the compact command."""
+        with CacheGrabber(self.cache_file) as cache:
+            cache.load_many_into_cache(
+                (id, {"name": "x" * 1000, "advisors": set()}) for id in range(200)
+            )
+            cache.cache.evict(0)
+
+        cache_main(["compact", "--cache-file", self.cache_file])
+        output = sys.stdout.getvalue()
+        self.assertRegex(
+            output, r"^Reclaimed [1-9]\d* bytes; the cache now takes \d+ bytes\n$"
+        )
+
+    def test_compact_max_size(self):
+        """Test the compact command evicting records."""
+        with CacheGrabber(self.cache_file, record_grabber=LocalDataGrabber) as cache:
+            list(cache.get_records([18231, 137717, 137705, 18230]))
+
+        cache_main(["compact", "--cache-file", self.cache_file, "--max-size", "0"])
+        self.assertTrue(sys.stdout.getvalue().startswith("Evicted 4 records\n"))
+        with CacheGrabber(self.cache_file) as cache:
+            self.assertEqual(len(cache.cache), 0)
+
+    def test_parse_size(self):
+        """Test the parse_size function."""
+        self.assertEqual(parse_size("500000"), 500000)
+        self.assertEqual(parse_size("64K"), 64 * 2**10)
+        self.assertEqual(parse_size("32m"), 32 * 2**20)
+        self.assertEqual(parse_size("1.5GB"), 3 * 2**29)
+        self.assertRaises(ArgumentTypeError, parse_size, "lots")
+        self.assertRaises(ArgumentTypeError, parse_size, "-1M")
+
+    def test_migrate(self):
+        """Test the migrate command."""
+        with CacheGrabber(
+            self.cache_file, record_grabber=LocalDataGrabber, backend="shelve"
+        ) as cache:
+            list(cache.get_records([18231, 137717]))
+
+        cache_main(["migrate", "--cache-file", self.cache_file])
+        self.assertEqual(sys.stdout.getvalue(), "Migrated 2 records\n")
+
+        with CacheGrabber(self.cache_file, record_grabber=LocalDataGrabber) as cache:
+            self.assertEqual(len(cache.cache), 2)
+            record = cache.get_record(137717)
+            self.assertEqual(record["institution"], "Universit\xe4t Leipzig")
+            self.assertEqual(record["message"], "cache hit")
+
+    def test_import(self):
+        """Test the import command."""
+        cache_main(
+            [
+                "import",
+                LocalDataGrabber.data_path,
+                "--cache-file",
+                self.cache_file,
+                "--processes",
+                "2",
+            ]
+        )
+        self.assertEqual(
+            sys.stdout.getvalue(),
+            "Imported {} records; skipped 3 pages\n".format(len(data_ids())),
+        )
+        with CacheGrabber(self.cache_file, record_grabber=LocalDataGrabber) as cache:
+            self.assertEqual(len(cache.cache), len(data_ids()))
+            self.assertEqual(
+                cache.cache["18231"]["timestamp"],
+                os.path.getmtime(LocalDataGrabber.data_file("18231.html")),
+            )
+
+    def test_export_import(self):
+        """Test the export command and importing its snapshot."""
+        snapshot = self.cache_file + ".snapshot"
+        with CacheGrabber(self.cache_file, record_grabber=LocalDataGrabber) as cache:
+            list(cache.get_records([18231, 137717]))
+            records = dict(cache.cache.items())
+
+        cache_main(["export", snapshot, "--cache-file", self.cache_file])
+        self.assertEqual(sys.stdout.getvalue(), "Exported 2 records\n")
+        cache_main(
+            [
+                "import",
+                snapshot,
+                "--cache-file",
+                self.cache_file + "-worker",
+                "--cache-backend",
+                "shelve",
+            ]
+        )
+        self.assertEqual(
+            sys.stdout.getvalue(),
+            "Exported 2 records\n"
+            "Imported 2 records; kept 0 more recent cached records\n",
+        )
+        with CacheGrabber(self.cache_file + "-worker", backend="shelve") as cache:
+            self.assertEqual(dict(cache.cache.items()), records)
+
+    def test_export_since(self):
+        """Test exporting a delta of the records grabbed since a time."""
+        snapshot = self.cache_file + ".snapshot"
+        with CacheGrabber(self.cache_file, record_grabber=LocalDataGrabber) as cache:
+            cache.load_into_cache(18231, cache.grabber.get_record(18231), 1000.0)
+            cache.load_into_cache(137717, cache.grabber.get_record(137717), 3000.0)
+
+        cache_main(
+            ["export", snapshot, "--cache-file", self.cache_file, "--since", "2000"]
+        )
+        self.assertEqual(sys.stdout.getvalue(), "Exported 1 records\n")
+        cache_main(
+            [
+                "export",
+                snapshot,
+                "--cache-file",
+                self.cache_file,
+                "--since",
+                "1970-01-01T00:00:00+00:00",
+            ]
+        )
+        self.assertEqual(
+            sys.stdout.getvalue(), "Exported 1 records\nExported 2 records\n"
+        )
+
+    def test_parse_time(self):
+        """Test the parse_time function."""
+        self.assertEqual(parse_time("1600000000"), 1600000000.0)
+        self.assertEqual(parse_time("1600000000.5"), 1600000000.5)
+        self.assertEqual(parse_time("2020-09-13T12:26:40Z"), 1600000000.0)
+        self.assertEqual(parse_time("2020-09-13T14:26:40+02:00"), 1600000000.0)
+        self.assertEqual(parse_time("2020-09-13"), datetime(2020, 9, 13).timestamp())
+        self.assertRaises(ArgumentTypeError, parse_time, "yesterday")
+
+    def test_graph(self):
+        """Test the graph command."""
+        graph_file = self.cache_file + ".csr"
+        with CacheGrabber(self.cache_file, record_grabber=LocalDataGrabber) as cache:
+            list(cache.get_records([18231, 18230, 18603]))
+
+        cache_main(["graph", graph_file, "--cache-file", self.cache_file])
+        self.assertEqual(
+            sys.stdout.getvalue(), "Wrote 3 mathematicians and 2 advisor links\n"
+        )
+        with CSRGraph(graph_file) as graph:
+            self.assertEqual(graph.ancestors(18603), set([18231, 18230]))
+            self.assertEqual(graph.students(18230), [18231])
+
+    def test_migrate_same_backend(self):
+        """Test the migrate command refuses to copy a cache onto itself."""
+        stderr = sys.stderr
+        sys.stderr = io.StringIO()
+        try:
+            self.assertRaises(
+                SystemExit,
+                cache_main,
+                ["migrate", "--cache-file", self.cache_file, "--from", "sqlite"],
+            )
+            self.assertIn(
+                "cannot migrate a cache into the backend it is in",
+                sys.stderr.getvalue(),
+            )
+        finally:
+            sys.stderr = stderr
+
+
+if __name__ == "__main__":
+    unittest.main()
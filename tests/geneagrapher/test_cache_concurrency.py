@@ -0,0 +1,100 @@
+import multiprocessing
+import os
+import random
+import unittest
+from geneagrapher.cache_grabber import CacheGrabber
+from .local_data_grabber import LocalDataGrabber
+from .local_http_server import data_ids
+
+# Fields of the records compared between processes, leaving out the ones
+# that depend on when and how a record was grabbed.
+FIELDS = ["name", "institution", "year", "advisors", "descendants"]
+
+
+def strip(record):
+    """Return the fields of a record that do not depend on when it was
+    grabbed."""
+    return {field: record[field] for field in FIELDS}
+
+
+def expected_records():
+    """Return the records of the test data by id."""
+    grabber = LocalDataGrabber()
+    return {id: strip(grabber.get_record(id)) for id in data_ids()}
+
+
+def worker(args):
+    """Read and write the shared cache as a ggrapher process would, and
+    return the number of records read that did not match the test data
+    and the ids of the records used."""
+    filename, backend, seed, writer = args
+    rand = random.Random(seed)
+    expected = expected_records()
+    # Each process uses part of the records, so the cache only ends up
+    # holding all the records used if no process loses the writes of
+    # another.
+    ids = rand.sample(sorted(expected), len(expected) * 2 // 3)
+    mismatches = 0
+    # Writers see every record as expired, so they grab and write each
+    # record they read.
+    with CacheGrabber(
+        filename,
+        record_grabber=LocalDataGrabber,
+        expiration_interval=0.0 if writer else 604800.0,
+        backend=backend,
+        memory_entries=0,
+    ) as cache:
+        for _ in range(5):
+            rand.shuffle(ids)
+            for start in range(0, len(ids), 7):
+                for id, record in cache.get_records(ids[start : start + 7]):
+                    mismatches += strip(record) != expected[id]
+            id = rand.choice(ids)
+            cache.load_into_cache(id, LocalDataGrabber().get_record(id))
+            mismatches += strip(cache.get_record(id)) != expected[id]
+    return mismatches, ids
+
+
+class TestCacheConcurrency(unittest.TestCase):
+    """Stress tests for several processes sharing one cache file."""
+
+    processes = 6
+
+    def setUp(self):
+        self.filename = "geneacache-concurrency-test"
+
+    def tearDown(self):
+        for filename in os.listdir("."):
+            if filename.startswith(self.filename):
+                os.remove(filename)
+
+    def check_backend(self, backend):
+        """Run processes reading and writing one cache at once, and check
+        that none of them failed or read a wrong record, and that the cache
+        holds every record used afterwards."""
+        jobs = [
+            (self.filename, backend, seed, seed % 2 == 0)
+            for seed in range(self.processes)
+        ]
+        with multiprocessing.Pool(self.processes) as pool:
+            results = pool.map(worker, jobs)
+        self.assertEqual([mismatches for mismatches, ids in results], [0] * len(jobs))
+
+        expected = expected_records()
+        used = set(id for mismatches, ids in results for id in ids)
+        with CacheGrabber(self.filename, backend=backend) as cache:
+            self.assertEqual(sorted(map(int, cache.cache.keys())), sorted(used))
+            for id in used:
+                self.assertEqual(strip(cache.cache[str(id)]), expected[id])
+
+    def test_sqlite(self):
+        """Test several processes sharing an SQLite cache."""
+        self.check_backend("sqlite")
+
+    def test_shelve(self):
+        """Test several processes sharing a shelve cache."""
+        self.check_backend("shelve")
+
+
+if __name__ == "__main__":
+    unittest.main()
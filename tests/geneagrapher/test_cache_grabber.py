@@ -1,15 +1,33 @@
 import os
-from time import time
+import threading
+from time import sleep, time
 import unittest
 from .local_data_grabber import LocalDataGrabber
+from geneagrapher.cache_backends import ShelveBackend
 from geneagrapher.cache_grabber import CacheGrabber
-from geneagrapher.grabber import Grabber
+from geneagrapher.grabber import SCHEMA_VERSION, Grabber
+
+
+class CountingDataGrabber(LocalDataGrabber):
+    """A local data grabber recording the ids it grabbed, taking delay
+    seconds for each."""
+
+    delay = 0
+
+    def __init__(self):
+        self.grabbed = []
+
+    def get_record(self, id):
+        self.grabbed.append(id)
+        sleep(self.delay)
+        return LocalDataGrabber.get_record(self, id)
 
 
 class TestCacheGrabberMethods(unittest.TestCase):
     """Unit tests for the geneagrapher.CacheGrabber class."""
 
     def setUp(self):
+        self.record_id = 18231
         self.name = "Carl Friedrich Gau\xdf"
         self.institution = "Universit\xe4t Helmstedt"
         self.year = 1799
@@ -19,10 +37,23 @@ class TestCacheGrabberMethods(unittest.TestCase):
         )
 
     def tearDown(self):
-        try:
-            os.remove("geneacache.db")
-        except OSError:
-            pass
+        # The files backing the cache depend on the backend and, for shelves,
+        # on the dbm flavour in use.
+        for suffix in [
+            ".db",
+            ".dat",
+            ".dir",
+            ".bak",
+            ".lock",
+            ".pages",
+            ".sqlite",
+            ".sqlite-wal",
+            ".sqlite-shm",
+        ]:
+            try:
+                os.remove("geneacache" + suffix)
+            except OSError:
+                pass
 
     def test_init1(self):
         """Test constructor."""
@@ -39,7 +70,8 @@ class TestCacheGrabberMethods(unittest.TestCase):
         self.assertEqual(len(cache.cache), 0)
         self.assertIsInstance(cache.grabber, Grabber)
         self.assertEqual(cache.expiration_interval, 604800.)
-        os.remove("mycachename.db")
+        cache.close()
+        os.remove("mycachename.sqlite")
 
     def test_init3(self):
         """Test constructor with non-default record grabber."""
@@ -57,13 +89,33 @@ class TestCacheGrabberMethods(unittest.TestCase):
         self.assertIsInstance(cache.grabber, Grabber)
         self.assertEqual(cache.expiration_interval, 1209600.)
 
+    def test_init5(self):
+        """Test constructor with the legacy shelve backend."""
+        with CacheGrabber(record_grabber=LocalDataGrabber, backend="shelve") as cache:
+            self.assertIsInstance(cache.cache.store, ShelveBackend)
+            record = cache.get_record(18231)
+            self.assertEqual(record["message"], "cache miss")
+            record = cache.get_record(18231)
+            self.assertEqual(record["message"], "cache hit")
+            self.assertEqual(len(cache.cache), 1)
+        self.assertFalse(os.path.exists("geneacache.sqlite"))
+
+    def test_init_bad_backend(self):
+        """Test constructor with an unknown backend."""
+        self.assertRaisesRegex(
+            ValueError,
+            "Unknown cache backend nosuchbackend",
+            CacheGrabber,
+            backend="nosuchbackend",
+        )
+
     def test_close(self):
         """Test the close method."""
         cache = CacheGrabber(record_grabber=LocalDataGrabber)
         self.assertEqual(len(cache.cache), 0)
         cache.close()
         self.assertRaisesRegex(
-            ValueError, "invalid operation on closed shelf", len, cache.cache
+            ValueError, "invalid operation on closed", len, cache.cache
         )
 
     def test_is_expired_false(self):
@@ -101,7 +153,7 @@ class TestCacheGrabberMethods(unittest.TestCase):
         with CacheGrabber(record_grabber=LocalDataGrabber) as cache:
             self.assertEqual(len(cache.cache), 0)
         self.assertRaisesRegex(
-            ValueError, "invalid operation on closed shelf", len, cache.cache
+            ValueError, "invalid operation on closed", len, cache.cache
         )
 
     def test_get_record_bad(self):
@@ -255,6 +307,266 @@ class TestCacheGrabberMethods(unittest.TestCase):
             self.assertEqual(record["message"], "cache miss")
             self.assertEqual(len(cache.cache), 1)
 
+    def test_get_records(self):
+        """Test the get_records method for a mix of cached and uncached
+        ids."""
+        with CacheGrabber(record_grabber=LocalDataGrabber) as cache:
+            cache.get_record(18231)
+            records = list(cache.get_records([137717, 18231, 137705]))
+            self.assertEqual(
+                [id for id, record in records], [18231, 137717, 137705]
+            )
+            self.assertEqual(
+                [record["message"] for id, record in records],
+                ["cache hit", "cache miss", "cache miss"],
+            )
+            self.assertEqual(records[0][1]["name"], "Carl Friedrich Gau\xdf")
+            self.assertEqual(records[1][1]["name"], "Valentin  Alberti")
+            for id, record in records:
+                self.assertEqual(len(record), 6)
+            self.assertEqual(len(cache.cache), 3)
+
+    def test_get_records_write_batches(self):
+        """Test the get_records method writes grabbed records to the cache in
+        batches."""
+        with CacheGrabber(record_grabber=LocalDataGrabber) as cache:
+            cache.write_batch_size = 2
+            records = cache.get_records([18231, 137717, 137705])
+            next(records)
+            self.assertEqual(len(cache.cache), 0)
+            next(records)
+            self.assertEqual(len(cache.cache), 2)
+            next(records)
+            self.assertEqual(len(cache.cache), 2)
+            self.assertRaises(StopIteration, next, records)
+            self.assertEqual(len(cache.cache), 3)
+            for id in [18231, 137717, 137705]:
+                self.assertEqual(cache.get_record(id)["message"], "cache hit")
+
+    def test_get_record_single_flight(self):
+        """Test that the get_record method waits for a record that is
+        already being grabbed instead of grabbing it again."""
+        with CacheGrabber(record_grabber=CountingDataGrabber) as cache:
+            record = LocalDataGrabber().get_record(18231)
+            call, leader = cache.single_flight.begin(18231)
+            threading.Timer(
+                0.05, cache.single_flight.finish, (18231, dict(record, timestamp=0))
+            ).start()
+            self.assertEqual(
+                cache.get_record(18231), dict(record, message="cache miss")
+            )
+            self.assertEqual(cache.grabber.grabbed, [])
+            self.assertEqual(cache.single_flight.saved, 1)
+
+            # A grab that is given up is made by the waiting thread.
+            cache.single_flight.begin(137717)
+            threading.Timer(0.05, cache.single_flight.finish, (137717,)).start()
+            self.assertEqual(cache.get_record(137717)["message"], "cache miss")
+            self.assertEqual(cache.grabber.grabbed, [137717])
+            self.assertEqual(cache.get_record(137717)["message"], "cache hit")
+            self.assertEqual(cache.single_flight.saved, 1)
+
+    def test_get_records_single_flight(self):
+        """Test that the get_records method grabs the records that are not
+        already being grabbed and then waits for the others."""
+        with CacheGrabber(record_grabber=CountingDataGrabber) as cache:
+            record = LocalDataGrabber().get_record(137717)
+            cache.single_flight.begin(137717)
+            records = cache.get_records([18231, 137717, 137705])
+            self.assertEqual(next(records)[0], 18231)
+            self.assertEqual(next(records)[0], 137705)
+            threading.Timer(
+                0.05, cache.single_flight.finish, (137717, dict(record, timestamp=0))
+            ).start()
+            self.assertEqual(
+                next(records), (137717, dict(record, message="cache miss"))
+            )
+            self.assertRaises(StopIteration, next, records)
+            self.assertEqual(cache.grabber.grabbed, [18231, 137705])
+            self.assertEqual(cache.single_flight.saved, 1)
+            self.assertEqual(cache.single_flight.calls, {})
+
+    def test_get_records_threads(self):
+        """Test that threads sharing a cache grabber grab each record once."""
+        ids = [18231, 137717, 137705, 18230, 18603]
+        with CacheGrabber(record_grabber=CountingDataGrabber) as cache:
+            cache.grabber.delay = 0.02
+            start = threading.Barrier(4)
+            results = []
+
+            def run():
+                start.wait()
+                results.append(dict(cache.get_records(ids)))
+
+            threads = [threading.Thread(target=run) for i in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(len(results), 4)
+            for records in results:
+                self.assertEqual(sorted(records), sorted(ids))
+            self.assertEqual(
+                len(cache.grabber.grabbed), len(set(cache.grabber.grabbed))
+            )
+            self.assertGreater(cache.single_flight.saved, 0)
+            self.assertEqual(len(cache.cache), len(ids))
+
+    def test_get_record_memory(self):
+        """Test that repeated lookups are answered from memory and that
+        loading a record into the cache replaces the copy in memory."""
+        with CacheGrabber(record_grabber=LocalDataGrabber) as cache:
+            cache.get_record(18231)
+            self.assertEqual((cache.cache.hits, cache.cache.misses), (0, 1))
+            for i in range(3):
+                record = cache.get_record(18231)
+                self.assertEqual(record["message"], "cache hit")
+            self.assertEqual((cache.cache.hits, cache.cache.misses), (2, 2))
+
+            record["institution"] = "Rigged for test"
+            del record["message"]
+            cache.load_into_cache(18231, record)
+            record = cache.get_record(18231)
+            self.assertEqual(record["institution"], "Rigged for test")
+            self.assertEqual((cache.cache.hits, cache.cache.misses), (2, 3))
+
+    def test_get_record_no_memory(self):
+        """Test the get_record method with the memory tier disabled."""
+        with CacheGrabber(record_grabber=LocalDataGrabber, memory_entries=0) as cache:
+            cache.get_record(18231)
+            record = cache.get_record(18231)
+            self.assertEqual(record["message"], "cache hit")
+            self.assertEqual(len(cache.cache.entries), 0)
+            self.assertEqual(cache.cache.hits, 0)
+
+    def test_evict(self):
+        """Test that the cache is kept within its maximum size."""
+        ids = [18231, 137717, 137705, 18230]
+        with CacheGrabber(record_grabber=LocalDataGrabber) as cache:
+            list(cache.get_records(ids))
+            self.assertEqual(cache.evict(), 0)
+            size = cache.cache.data_size()
+
+        with CacheGrabber(record_grabber=LocalDataGrabber, max_size=size) as cache:
+            cache.evict_interval = 2
+            d = cache.cache["137717"]
+            d["timestamp"] = time() - cache.expiration_interval - 1
+            cache.cache["137717"] = d
+            cache.get_record(18231)
+            self.assertEqual(cache.evict(), 0)
+
+            # Loading a new record makes the cache too big. The expired
+            # record goes first.
+            list(cache.get_records([127946, 79568]))
+            self.assertNotIn("137717", cache.cache)
+            self.assertLessEqual(cache.cache.data_size(), size)
+            self.assertEqual(len(cache.cache), 4)
+
+            cache.max_size = 0
+        # The size is checked again when the cache is closed.
+        with CacheGrabber(record_grabber=LocalDataGrabber) as cache:
+            self.assertEqual(len(cache.cache), 0)
+
+    def test_get_records_bad(self):
+        """Test the get_records method for a bad id."""
+        with CacheGrabber(record_grabber=LocalDataGrabber) as cache:
+            records = cache.get_records([18231, 999999999])
+            self.assertRaisesRegex(
+                ValueError, "Invalid id 999999999", list, records
+            )
+            self.assertEqual(len(cache.cache), 1)
+
+    def test_get_record_archive(self):
+        """Test the get_record method archives the pages it grabs."""
+        with CacheGrabber(record_grabber=LocalDataGrabber, archive=True) as cache:
+            record = cache.get_record(18231)
+            self.assertEqual(len(record), 6)
+            self.assertEqual(record["name"], "Carl Friedrich Gau\xdf")
+            self.assertEqual(record["message"], "cache miss")
+            self.assertEqual(cache.cache["18231"]["schema"], SCHEMA_VERSION)
+            self.assertEqual(cache.archive.ids(), [18231])
+            page, encoding, timestamp = cache.archive.get_page(18231)
+            self.assertEqual(page, LocalDataGrabber().get_page(18231)[0])
+            self.assertEqual(timestamp, cache.cache["18231"]["timestamp"])
+
+            record = cache.get_record(18231)
+            self.assertEqual(record["message"], "cache hit")
+
+    def test_get_record_stale(self):
+        """Test the get_record method rebuilds stale records from the page
+        archive."""
+        with CacheGrabber(record_grabber=LocalDataGrabber, archive=True) as cache:
+            cache.get_record(18231)
+            d = cache.cache["18231"]
+            timestamp = d["timestamp"]
+            d["institution"] = "Rigged for test"
+            d["schema"] = SCHEMA_VERSION - 1
+            cache.cache["18231"] = d
+
+            # The archived page must be used, not the grabber.
+            cache.grabber = None
+            record = cache.get_record(18231)
+            self.assertEqual(len(record), 6)
+            self.assertEqual(record["institution"], "Universit\xe4t Helmstedt")
+            self.assertEqual(record["message"], "cache reparse")
+            d = cache.cache["18231"]
+            self.assertEqual(d["schema"], SCHEMA_VERSION)
+            self.assertEqual(d["timestamp"], timestamp)
+
+    def test_get_record_stale_not_archived(self):
+        """Test the get_record method grabs stale records that are not
+        archived."""
+        with CacheGrabber(record_grabber=LocalDataGrabber) as cache:
+            cache.get_record(18231)
+            d = cache.cache["18231"]
+            d["institution"] = "Rigged for test"
+            d["schema"] = SCHEMA_VERSION - 1
+            cache.cache["18231"] = d
+            record = cache.get_record(18231)
+            self.assertEqual(record["institution"], "Universit\xe4t Helmstedt")
+            self.assertEqual(record["message"], "cache miss")
+
+    def test_reparse(self):
+        """Test the reparse method."""
+        with CacheGrabber(record_grabber=LocalDataGrabber, archive=True) as cache:
+            records = dict(cache.get_records([18231, 137717, 137705]))
+            self.assertEqual(len(cache.archive), 3)
+            d = cache.cache["137717"]
+            d["institution"] = "Rigged for test"
+            d["schema"] = SCHEMA_VERSION - 1
+            cache.cache["137717"] = d
+            del cache.cache["137705"]
+
+            cache.grabber = None
+            self.assertEqual(cache.reparse(), 2)
+            self.assertEqual(cache.cache["137717"]["institution"], "Universit\xe4t Leipzig")
+            for id in [18231, 137717, 137705]:
+                record = cache.get_record(id)
+                self.assertEqual(record, dict(records[id], message="cache hit"))
+            self.assertEqual(cache.reparse(), 0)
+            self.assertEqual(cache.reparse(force=True), 3)
+
+    def test_reparse_lock_order(self):
+        """Test that the reparse method takes the grabber lock before the
+        lock of the backend's batch, as the other methods do."""
+        with CacheGrabber(record_grabber=LocalDataGrabber, archive=True) as cache:
+            list(cache.get_records([18231, 137717]))
+            batch = cache.cache.batch
+            held = []
+
+            def checked_batch():
+                held.append(cache.lock.locked())
+                return batch()
+
+            cache.cache.batch = checked_batch
+            self.assertEqual(cache.reparse(force=True), 2)
+            self.assertEqual(held, [True])
+
+    def test_reparse_no_archive(self):
+        """Test the reparse method for a cache without a page archive."""
+        with CacheGrabber(record_grabber=LocalDataGrabber) as cache:
+            self.assertRaises(ValueError, cache.reparse)
+
     def test_is_in_cache(self):
         """Test the is_in_cache method."""
         d = {
@@ -266,13 +578,13 @@ class TestCacheGrabberMethods(unittest.TestCase):
             "timestamp": time(),
         }
         with CacheGrabber(record_grabber=LocalDataGrabber) as cache:
-            self.assertFalse(cache.is_cached(self.id))
-            cache.cache[str(self.id)] = d
-            self.assertTrue(cache.is_cached(self.id))
+            self.assertFalse(cache.is_cached(self.record_id))
+            cache.cache[str(self.record_id)] = d
+            self.assertTrue(cache.is_cached(self.record_id))
             new_timestamp = time() - cache.expiration_interval - 1
             d["timestamp"] = new_timestamp
-            cache.cache[str(self.id)] = d
-            self.assertFalse(cache.is_cached(self.id))
+            cache.cache[str(self.record_id)] = d
+            self.assertFalse(cache.is_cached(self.record_id))
 
     def test_load_into_cache(self):
         """Test the load_into_cache method."""
@@ -285,9 +597,9 @@ class TestCacheGrabberMethods(unittest.TestCase):
                 "advisors": self.advisors,
                 "descendants": self.descendants,
             }
-            cache.load_into_cache(self.id, new_record)
+            cache.load_into_cache(self.record_id, new_record)
             self.assertEqual(len(cache.cache), 1)
-            record = cache.cache[str(self.id)]
+            record = cache.cache[str(self.record_id)]
             self.assertEqual(record["name"], self.name)
             self.assertEqual(record["institution"], self.institution)
             self.assertEqual(record["year"], self.year)
@@ -298,7 +610,7 @@ class TestCacheGrabberMethods(unittest.TestCase):
             # Insert the same record a second time to verify replacement
             # behavior.
             self.assertEqual(len(cache.cache), 1)
-            record = cache.cache[str(self.id)]
+            record = cache.cache[str(self.record_id)]
             self.assertEqual(record["name"], self.name)
             self.assertEqual(record["institution"], self.institution)
             self.assertEqual(record["year"], self.year)
@@ -0,0 +1,138 @@
+import os
+import unittest
+from geneagrapher.cache_backends import ShelveBackend, SQLiteBackend
+from geneagrapher.cache_snapshot import (
+    MAGIC,
+    SNAPSHOT_VERSION,
+    export_snapshot,
+    header_size,
+    import_snapshot,
+    is_snapshot,
+    read_header,
+    snapshot_records,
+)
+from geneagrapher.grabber import SCHEMA_VERSION
+from .local_data_grabber import LocalDataGrabber
+from .local_http_server import data_ids
+
+
+class TestCacheSnapshotMethods(unittest.TestCase):
+    """Unit tests for the geneagrapher.cache_snapshot module."""
+
+    def setUp(self):
+        self.filename = "geneacache-snapshot-test"
+        self.snapshot = self.filename + ".snapshot"
+        grabber = LocalDataGrabber()
+        self.records = {}
+        for id in data_ids():
+            record = grabber.get_record(id)
+            record["timestamp"] = 1000.0 + id % 7
+            record["schema"] = SCHEMA_VERSION
+            self.records[str(id)] = record
+        # Records the compact encoding cannot hold are kept as well.
+        self.records["1"] = dict(self.records["18231"], message="extra field")
+
+    def tearDown(self):
+        for filename in os.listdir("."):
+            if filename.startswith(self.filename):
+                os.remove(filename)
+
+    def write_snapshot(self):
+        """Write the test records to a snapshot from an SQLite cache."""
+        with SQLiteBackend(self.filename) as backend:
+            backend.put_many(self.records.items())
+            self.assertEqual(export_snapshot(backend, self.snapshot), len(self.records))
+
+    def test_round_trip(self):
+        """Test that a snapshot of one backend loads into another."""
+        self.write_snapshot()
+        self.assertTrue(is_snapshot(self.snapshot))
+        self.assertEqual(dict(snapshot_records(self.snapshot)), self.records)
+        with ShelveBackend(self.filename) as backend:
+            self.assertEqual(
+                import_snapshot(backend, self.snapshot), (len(self.records), 0)
+            )
+            self.assertEqual(dict(backend.items()), self.records)
+
+    def test_header(self):
+        """Test the header describing a snapshot."""
+        self.write_snapshot()
+        header = read_header(self.snapshot)
+        self.assertEqual(header["format"], "geneagrapher-cache-snapshot")
+        self.assertEqual(header["version"], SNAPSHOT_VERSION)
+        self.assertEqual(header["records"], len(self.records))
+        self.assertEqual(header["compression"], "gzip")
+        self.assertIsNone(header["since"])
+        self.assertEqual(len(header["sha256"]), 64)
+
+    def test_since(self):
+        """Test writing only the records stamped after a time."""
+        with SQLiteBackend(self.filename) as backend:
+            backend.put_many(self.records.items())
+            count = export_snapshot(backend, self.snapshot, since=1004.0)
+        records = dict(snapshot_records(self.snapshot))
+        self.assertEqual(len(records), count)
+        self.assertEqual(
+            sorted(records),
+            sorted(
+                key
+                for key, record in self.records.items()
+                if record["timestamp"] > 1004.0
+            ),
+        )
+        self.assertEqual(read_header(self.snapshot)["since"], 1004.0)
+
+    def test_merge(self):
+        """Test that importing a snapshot keeps the cached records that are
+        at least as recent, so a delta can be merged into a cache."""
+        with SQLiteBackend(self.filename) as backend:
+            backend.put_many(self.records.items())
+            export_snapshot(backend, self.snapshot)
+            backend["18231"] = dict(self.records["18231"], year=1, timestamp=2000.0)
+            backend["1"] = dict(self.records["1"], year=1, timestamp=0.0)
+            delta = self.filename + ".delta"
+            self.assertEqual(export_snapshot(backend, delta, since=1500.0), 1)
+
+        with ShelveBackend(self.filename) as backend:
+            backend["137717"] = dict(self.records["137717"], year=1)
+            backend["18230"] = dict(self.records["18230"], year=1, timestamp=0.0)
+            self.assertEqual(
+                import_snapshot(backend, self.snapshot), (len(self.records) - 1, 1)
+            )
+            self.assertEqual(import_snapshot(backend, delta), (1, 0))
+            self.assertEqual(
+                import_snapshot(backend, self.snapshot), (0, len(self.records))
+            )
+            self.assertEqual(backend["18231"]["year"], 1)
+            self.assertEqual(backend["137717"]["year"], 1)
+            self.assertEqual(backend["18230"], self.records["18230"])
+            self.assertEqual(backend["1"], self.records["1"])
+
+    def test_corrupt(self):
+        """Test that damaged snapshots are refused before anything is
+        loaded."""
+        self.write_snapshot()
+        with open(self.snapshot, "r+b") as fout:
+            fout.seek(len(MAGIC) + header_size + 100)
+            byte = fout.read(1)
+            fout.seek(-1, os.SEEK_CUR)
+            fout.write(bytes([byte[0] ^ 0xFF]))
+        with ShelveBackend(self.filename) as backend:
+            self.assertRaisesRegex(
+                ValueError, "is corrupt", import_snapshot, backend, self.snapshot
+            )
+            self.assertEqual(len(backend), 0)
+
+    def test_not_snapshot(self):
+        """Test reading files that are not snapshots."""
+        with open(self.snapshot, "wb") as fout:
+            fout.write(b"WARC/1.0\r\n")
+        self.assertFalse(is_snapshot(self.snapshot))
+        self.assertFalse(is_snapshot(self.filename + ".missing"))
+        self.assertRaisesRegex(
+            ValueError, "is not a cache snapshot", read_header, self.snapshot
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+from collections import deque
+import os
+import unittest
+from geneagrapher.checkpoint import LEVEL, PORTION_END, CrawlCheckpoint
+
+
+class TestCrawlCheckpointMethods(unittest.TestCase):
+    """Unit tests for the CrawlCheckpoint class."""
+
+    def setUp(self):
+        self.filename = "geneagrapher-test.checkpoint"
+        self.crawl = {"seeds": [18231], "ancestors": True, "max_nodes": None}
+        self.queues = {"seeds": deque(), "ancestors": deque([(18231, 18230)])}
+
+    def tearDown(self):
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+
+    def write_checkpoint(self):
+        with CrawlCheckpoint(self.filename, self.crawl, self.queues) as checkpoint:
+            checkpoint.write_level(
+                "seeds",
+                1,
+                [("Carl Friedrich Gau\xdf", None, 1799, 18231, set([18230]), set())],
+            )
+            checkpoint.write_portion_end("seeds")
+            self.queues["ancestors"].clear()
+            checkpoint.write_level(
+                "ancestors",
+                1,
+                [("Johann Friedrich Pfaff", None, None, 18230, [], [18231])],
+            )
+            checkpoint.write_portion_end("ancestors", {18230: set([66476])})
+
+    def test_resume(self):
+        """Test reading the entries written to a checkpoint."""
+        self.write_checkpoint()
+        with CrawlCheckpoint(
+            self.filename, self.crawl, self.queues, True
+        ) as checkpoint:
+            self.assertEqual(
+                checkpoint.entries,
+                [
+                    {
+                        "kind": LEVEL,
+                        "portion": "seeds",
+                        "generation": 1,
+                        "records": [
+                            ["Carl Friedrich Gau\xdf", None, 1799, 18231, [18230], []]
+                        ],
+                        "queues": {"seeds": [], "ancestors": [[18231, 18230]]},
+                    },
+                    {"kind": PORTION_END, "portion": "seeds", "truncated": []},
+                    {
+                        "kind": LEVEL,
+                        "portion": "ancestors",
+                        "generation": 1,
+                        "records": [
+                            ["Johann Friedrich Pfaff", None, None, 18230, [], [18231]]
+                        ],
+                        "queues": {"seeds": [], "ancestors": []},
+                    },
+                    {
+                        "kind": PORTION_END,
+                        "portion": "ancestors",
+                        "truncated": [[18230, [66476]]],
+                    },
+                ],
+            )
+
+    def test_resume_cut_short(self):
+        """Test that a last line cut short is dropped from the file."""
+        self.write_checkpoint()
+        size = os.path.getsize(self.filename)
+        with open(self.filename, "a") as fout:
+            fout.write('{"kind":"level","portion":"ance')
+        with CrawlCheckpoint(
+            self.filename, self.crawl, self.queues, True
+        ) as checkpoint:
+            self.assertEqual(len(checkpoint.entries), 4)
+            self.assertEqual(os.path.getsize(self.filename), size)
+            checkpoint.write_portion_end("descendants")
+        with CrawlCheckpoint(
+            self.filename, self.crawl, self.queues, True
+        ) as checkpoint:
+            self.assertEqual(len(checkpoint.entries), 5)
+
+    def test_start(self):
+        """Test that a checkpoint is started anew unless resumed."""
+        self.write_checkpoint()
+        with CrawlCheckpoint(self.filename, self.crawl, self.queues) as checkpoint:
+            self.assertEqual(checkpoint.entries, [])
+        with CrawlCheckpoint(
+            self.filename, self.crawl, self.queues, True
+        ) as checkpoint:
+            self.assertEqual(checkpoint.entries, [])
+
+    def test_different_crawl(self):
+        """Test that the checkpoint of another crawl is not resumed."""
+        self.write_checkpoint()
+        self.crawl["seeds"] = [18230]
+        self.assertRaisesRegex(
+            ValueError,
+            "is the checkpoint of a different crawl",
+            CrawlCheckpoint,
+            self.filename,
+            self.crawl,
+            self.queues,
+            True,
+        )
+
+    def test_not_checkpoint(self):
+        """Test that a file that is not a checkpoint is not resumed."""
+        with open(self.filename, "w") as fout:
+            fout.write("digraph genealogy {\n")
+        self.assertRaisesRegex(
+            ValueError,
+            "is not a crawl checkpoint",
+            CrawlCheckpoint,
+            self.filename,
+            self.crawl,
+            self.queues,
+            True,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
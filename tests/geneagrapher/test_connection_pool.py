@@ -0,0 +1,119 @@
+import http.client
+import threading
+import unittest
+import urllib.error
+from geneagrapher.connection_pool import ConnectionPool
+from geneagrapher.grabber import Grabber
+from .local_data_grabber import LocalDataGrabber
+from .local_http_server import LocalHTTPServer
+
+
+class DisconnectedConnection:
+    """A connection whose requests fail as if the server had closed it."""
+
+    def __init__(self):
+        self.closed = False
+
+    def request(self, method, path, headers):
+        raise http.client.RemoteDisconnected("Remote end closed connection")
+
+    def close(self):
+        self.closed = True
+
+
+class TestConnectionPoolMethods(unittest.TestCase):
+    """Unit tests for the geneagrapher.connection_pool.ConnectionPool
+    class."""
+
+    def setUp(self):
+        self.server = LocalHTTPServer().__enter__()
+        self.url = self.server.record_url
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+
+    def test_get(self):
+        """Test the get method decompresses the page and reports its
+        encoding."""
+        with open(LocalDataGrabber.data_file("18231.html"), "rb") as fin:
+            expected = fin.read()
+        with ConnectionPool() as pool:
+            data, encoding = pool.get(self.url.format(18231))
+        self.assertEqual(data, expected)
+        self.assertEqual(encoding, "utf-8")
+
+    def test_keep_alive(self):
+        """Test that consecutive requests reuse one connection."""
+        with ConnectionPool() as pool:
+            for id in [18231, 18230, 137717]:
+                pool.get(self.url.format(id))
+            self.assertEqual(pool.connections_opened, 1)
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(self.server.requests, 3)
+
+    def test_redirect(self):
+        """Test that redirects are followed."""
+        self.server.statuses.append(301)
+        with ConnectionPool() as pool:
+            data, encoding = pool.get(
+                self.url.replace("/id.php", "/old/id.php").format(18231)
+            )
+        self.assertIn(b"Carl Friedrich", data)
+        self.assertEqual(self.server.requests, 2)
+
+    def test_http_error(self):
+        """Test that error responses raise HTTPError."""
+        self.server.statuses.append(503)
+        with ConnectionPool() as pool:
+            with self.assertRaises(urllib.error.HTTPError) as cm:
+                pool.get(self.url.format(18231))
+            self.assertEqual(cm.exception.code, 503)
+            # The connection is still usable after an error response.
+            pool.get(self.url.format(18231))
+            self.assertEqual(pool.connections_opened, 1)
+
+    def test_threads(self):
+        """Test sharing a pool between threads."""
+        results = {}
+        with ConnectionPool() as pool:
+
+            def grab(id):
+                for _ in range(5):
+                    results[id] = pool.get(self.url.format(id))[0]
+
+            threads = [
+                threading.Thread(target=grab, args=(id,))
+                for id in [18231, 18230, 137717, 127946]
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertLessEqual(pool.connections_opened, 4)
+        self.assertEqual(len(results), 4)
+        self.assertEqual(self.server.requests, 20)
+
+    def test_retry_closed(self):
+        """Test that when the retry of a request on a reused connection
+        fails too, both connections are closed."""
+        connections = [DisconnectedConnection(), DisconnectedConnection()]
+        with ConnectionPool() as pool:
+            pool.acquire = lambda key, fresh=False: (connections[fresh], not fresh)
+            self.assertRaises(
+                http.client.RemoteDisconnected, pool.get, self.url.format(18231)
+            )
+        self.assertEqual([conn.closed for conn in connections], [True, True])
+
+    def test_grabber(self):
+        """Test grabbing a record through the pool of a Grabber."""
+        with Grabber(record_url=self.url) as grabber:
+            record = grabber.get_record(137717)
+            self.assertRaisesRegex(
+                ValueError, "Invalid id 999999999", grabber.get_record, 999999999
+            )
+        self.assertEqual(record, LocalDataGrabber().get_record(137717))
+        self.assertEqual(self.server.connections, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import threading
+import time
+import unittest
+from geneagrapher.crawler import Crawler
+from .local_data_grabber import LocalDataGrabber
+
+
+class CountingGrabber(LocalDataGrabber):
+    """A local data grabber that tracks how many get_record calls are in
+    flight at once."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def get_record(self, id):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(0.01)
+            return LocalDataGrabber.get_record(self, id)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+class TestCrawlerMethods(unittest.TestCase):
+    """Unit tests for the geneagrapher.crawler.Crawler class."""
+
+    def setUp(self):
+        self.ids = [18231, 18230, 127946, 79568, 79562, 99457, 137717, 137705]
+
+    def test_init(self):
+        """Test constructor."""
+        grabber = LocalDataGrabber()
+        crawler = Crawler(grabber)
+        self.assertIs(crawler.grabber, grabber)
+        self.assertEqual(crawler.concurrency, 1)
+
+    def test_init_bad_concurrency(self):
+        """Test constructor with a concurrency less than 1."""
+        self.assertRaises(ValueError, Crawler, LocalDataGrabber(), 0)
+
+    def test_fetch_order(self):
+        """Test that fetch returns records in the order of the input ids."""
+        grabber = LocalDataGrabber()
+        with Crawler(grabber, 4) as crawler:
+            records = crawler.fetch(self.ids)
+        self.assertEqual([id for id, record in records], self.ids)
+        for id, record in records:
+            self.assertEqual(record, grabber.get_record(id))
+
+    def test_get_records(self):
+        """Test that get_records generates every record once."""
+        grabber = LocalDataGrabber()
+        with Crawler(grabber, 4) as crawler:
+            records = list(crawler.get_records(self.ids))
+        self.assertEqual(sorted(id for id, record in records), sorted(self.ids))
+        for id, record in records:
+            self.assertEqual(record, grabber.get_record(id))
+
+    def test_get_records_single_id_grabber(self):
+        """Test get_records for a grabber without a get_records method."""
+
+        class SingleIdGrabber:
+            def get_record(self, id):
+                return LocalDataGrabber().get_record(id)
+
+        with Crawler(SingleIdGrabber(), 4) as crawler:
+            records = dict(crawler.get_records(self.ids))
+        self.assertEqual(set(records), set(self.ids))
+
+    def test_fetch_concurrency_bound(self):
+        """Test that no more than concurrency records are fetched at once."""
+        grabber = CountingGrabber()
+        with Crawler(grabber, 3) as crawler:
+            crawler.fetch(self.ids)
+        self.assertGreater(grabber.max_in_flight, 1)
+        self.assertLessEqual(grabber.max_in_flight, 3)
+
+    def test_fetch_bad_id(self):
+        """Test that a grabber error is propagated by fetch."""
+        with Crawler(LocalDataGrabber(), 4) as crawler:
+            self.assertRaisesRegex(
+                ValueError, "Invalid id 999999999", crawler.fetch, [18231, 999999999]
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import os
+import unittest
+from geneagrapher.graph import CSRGraph, write_csr_graph
+from geneagrapher.graph.csr_graph import MAGIC
+from .local_data_grabber import LocalDataGrabber
+from .local_http_server import data_ids
+
+
+class TestCSRGraphMethods(unittest.TestCase):
+    """Unit tests for the geneagrapher.graph.csr_graph module."""
+
+    def setUp(self):
+        self.filename = "geneacache-test.csr"
+        grabber = LocalDataGrabber()
+        self.records = dict((id, grabber.get_record(id)) for id in data_ids())
+        self.records[1] = {
+            "name": "",
+            "institution": None,
+            "year": None,
+            "advisors": set([18231, 999]),
+            "descendants": set(),
+        }
+        write_csr_graph(
+            ((str(id), record) for id, record in self.records.items()), self.filename
+        )
+        self.graph = CSRGraph(self.filename)
+
+    def tearDown(self):
+        self.graph.close()
+        os.remove(self.filename)
+
+    def reachable(self, id, field):
+        """Return the ids reachable from an id through a field of the
+        records, among the ids of the records."""
+        seen = set()
+        queue = [id]
+        while queue:
+            for linked in self.records[queue.pop()][field]:
+                if linked in self.records and linked not in seen:
+                    seen.add(linked)
+                    queue.append(linked)
+        seen.discard(id)
+        return seen
+
+    def test_write(self):
+        """Test the counts returned when writing a graph."""
+        links = sum(
+            len([a for a in record["advisors"] if a in self.records])
+            for record in self.records.values()
+        )
+        self.assertEqual(
+            write_csr_graph(
+                ((str(id), record) for id, record in self.records.items()),
+                self.filename,
+            ),
+            (len(self.records), links),
+        )
+
+    def test_records(self):
+        """Test looking up the fields of records."""
+        self.assertEqual(len(self.graph), len(self.records))
+        self.assertEqual(list(self.graph.ids), sorted(self.records))
+        for id, record in self.records.items():
+            self.assertTrue(id in self.graph)
+            self.assertEqual(self.graph.name(id), record["name"])
+            self.assertEqual(self.graph.institution(id), record["institution"])
+            self.assertEqual(self.graph.year(id), record["year"])
+            self.assertEqual(
+                self.graph.advisors(id),
+                sorted(a for a in record["advisors"] if a in self.records),
+            )
+            self.assertEqual(
+                self.graph.students(id),
+                sorted(s for s in record["descendants"] if s in self.records),
+            )
+        self.assertEqual(self.graph.name(18231), "Carl Friedrich Gau\xdf")
+        self.assertEqual(self.graph.advisors(1), [18231])
+
+    def test_missing(self):
+        """Test looking up ids that are not in the graph."""
+        self.assertFalse(999 in self.graph)
+        self.assertFalse(2**40 in self.graph)
+        self.assertRaises(KeyError, self.graph.name, 999)
+        self.assertRaises(KeyError, self.graph.ancestors, 0)
+
+    def test_ancestors_descendants(self):
+        """Test the ancestor and descendant queries."""
+        for id in self.records:
+            self.assertEqual(self.graph.ancestors(id), self.reachable(id, "advisors"))
+            self.assertEqual(
+                self.graph.descendants(id), self.reachable(id, "descendants")
+            )
+        self.assertEqual(self.graph.ancestors(1), set([18231, 18230]))
+
+    def test_bad_file(self):
+        """Test opening files that are not CSR graphs."""
+        with open(self.filename, "r+b") as fout:
+            fout.write(b"GGCACHE\n")
+        self.assertRaisesRegex(
+            ValueError, "is not a CSR graph", CSRGraph, self.filename
+        )
+
+        with open(self.filename, "r+b") as fout:
+            fout.write(MAGIC)
+            fout.seek(12)
+            fout.write(b"\1\2\3\4")
+        self.assertRaisesRegex(
+            ValueError, "another byte order", CSRGraph, self.filename
+        )
+
+    def test_empty(self):
+        """Test a graph without records."""
+        self.graph.close()
+        write_csr_graph([], self.filename)
+        self.graph = CSRGraph(self.filename)
+        self.assertEqual(len(self.graph), 0)
+        self.assertFalse(18231 in self.graph)
+
+
+if __name__ == "__main__":
+    unittest.main()
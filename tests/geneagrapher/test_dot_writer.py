@@ -0,0 +1,91 @@
+import io
+import unittest
+from geneagrapher.graph import DotFileWriter, Graph
+
+
+class TestDotFileWriterMethods(unittest.TestCase):
+    """Unit tests for the DotFileWriter class."""
+
+    def setUp(self):
+        self.graph = Graph()
+        self.outfile = io.StringIO()
+        self.writer = DotFileWriter(self.graph, self.outfile)
+
+    def test_write_nodes(self):
+        """Test writing nodes as they are added, with each edge written once
+        both of its ends are."""
+        self.graph.add_node(
+            "Carl Friedrich Gau\xdf",
+            "Universit\xe4t Helmstedt",
+            1799,
+            18231,
+            set([18230]),
+            set([18603]),
+        )
+        self.writer.write_nodes([18231])
+        self.graph.add_nodes(
+            [
+                (
+                    "Johann Friedrich Pfaff",
+                    "Georg-August-Universit\xe4t Goettingen",
+                    1786,
+                    18230,
+                    set(),
+                    set([18231]),
+                ),
+                (
+                    "Friedrich Wilhelm Bessel",
+                    None,
+                    None,
+                    18603,
+                    set([18231, 18230]),
+                    set(),
+                ),
+            ]
+        )
+        self.writer.write_nodes([18230, 18603])
+        self.writer.close()
+
+        expected = """digraph genealogy {
+    graph [charset="utf-8"];
+    node [shape=plaintext];
+    edge [style=bold];
+
+    18231 [label="Carl Friedrich Gau\xdf \\nUniversit\xe4t Helmstedt (1799)"];
+    18230 [label="Johann Friedrich Pfaff \\nGeorg-August-Universit\xe4t \
+Goettingen (1786)"];
+    18230 -> 18231;
+    18603 [label="Friedrich Wilhelm Bessel"];
+    18230 -> 18603;
+    18231 -> 18603;
+}
+"""
+        self.assertEqual(self.outfile.getvalue(), expected)
+
+    def test_close_truncated(self):
+        """Test that the links left out of the graph are marked when the
+        dot file is finished."""
+        self.graph.add_node("Carl Friedrich Gau\xdf", None, None, 18231, [], [])
+        self.writer.write_nodes([18231])
+        self.graph.truncated_ancestors[18231] = set([18230])
+        self.graph.truncated_descendants[1] = set([2])
+        self.writer.close()
+        self.assertTrue(
+            self.outfile.getvalue().endswith(
+                """    18231 [label="Carl Friedrich Gau\xdf"];
+    "18231-advisors" [label="1 more advisor"];
+    "18231-advisors" -> 18231 [style=dashed];
+}
+"""
+            )
+        )
+
+    def test_close_empty(self):
+        """Test that nothing is written for a graph without nodes."""
+        self.writer.write_nodes([])
+        self.writer.close()
+        self.assertEqual(self.outfile.getvalue(), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,7 +4,8 @@ import unittest
 import io
 from geneagrapher import geneagrapher
 from geneagrapher.cache_grabber import CacheGrabber
-from geneagrapher.graph import Graph
+from geneagrapher.graph import DotFileWriter, Graph
+from geneagrapher.graph.graph import dot_file_header
 from .local_data_grabber import LocalDataGrabber
 
 
@@ -14,16 +15,37 @@ class TestGeneagrapherMethods(unittest.TestCase):
     def setUp(self):
         self.ggrapher = geneagrapher.Geneagrapher()
 
+    def tearDown(self):
+        # Opening the shelve cache fixtures adds a lock file and, where the
+        # dbm flavour in use cannot read them, the files of a new shelf.
+        for name in ["end-to-end-30484", "geneagrapher_verbose_cache_grabber_test"]:
+            for suffix in [".dat", ".dir", ".bak", ".lock"]:
+                try:
+                    os.remove(LocalDataGrabber.data_file(name) + suffix)
+                except OSError:
+                    pass
+
     def test_init(self):
         """Test constructor."""
         self.assertEqual(isinstance(self.ggrapher.graph, Graph), True)
         self.assertEqual(self.ggrapher.seed_ids, [])
         self.assertEqual(self.ggrapher.get_ancestors, False)
         self.assertEqual(self.ggrapher.get_descendants, False)
+        self.assertEqual(self.ggrapher.max_generations, None)
+        self.assertEqual(self.ggrapher.max_nodes, None)
+        self.assertEqual(self.ggrapher.checkpoint_file, None)
+        self.assertEqual(self.ggrapher.resume, False)
         self.assertEqual(self.ggrapher.verbose, False)
         self.assertEqual(self.ggrapher.write_filename, None)
+        self.assertEqual(self.ggrapher.stream, False)
         self.assertEqual(self.ggrapher.use_cache, True)
         self.assertEqual(self.ggrapher.cache_file, "geneacache")
+        self.assertEqual(self.ggrapher.cache_backend, None)
+        self.assertEqual(self.ggrapher.cache_max_size, None)
+        self.assertEqual(self.ggrapher.archive_pages, False)
+        self.assertEqual(self.ggrapher.concurrency, 1)
+        self.assertEqual(self.ggrapher.rate_limit, None)
+        self.assertEqual(self.ggrapher.adaptive, False)
 
     def test_parse_empty(self):
         """Test parse_input() with no arguments."""
@@ -34,9 +56,13 @@ class TestGeneagrapherMethods(unittest.TestCase):
         stderr_intercept = io.StringIO()
         sys.stderr = stderr_intercept
 
-        expected = """usage: geneagrapher [-h] [--version] [-f FILE] [-a] \
-[-d] [--disable-cache]
-                    [--cache-file FILE] [-v]
+        expected = """usage: geneagrapher [-h] [--version] [-f FILE] [--stream] \
+[-a] [-d]
+                    [--max-generations N] [--max-nodes N] [--checkpoint FILE]
+                    [--resume] [--disable-cache] [--cache-file FILE]
+                    [--cache-backend BACKEND] [--cache-max-size SIZE]
+                    [--archive-pages] [-c N] [--rate-limit RPS] [--adaptive]
+                    [-v]
                     ID [ID ...]
 geneagrapher: error: the following arguments are required: ID
 """
@@ -56,10 +82,21 @@ geneagrapher: error: the following arguments are required: ID
         self.ggrapher.parse_input()
         self.assertEqual(self.ggrapher.get_ancestors, False)
         self.assertEqual(self.ggrapher.get_descendants, False)
+        self.assertEqual(self.ggrapher.max_generations, None)
+        self.assertEqual(self.ggrapher.max_nodes, None)
+        self.assertEqual(self.ggrapher.checkpoint_file, None)
+        self.assertEqual(self.ggrapher.resume, False)
         self.assertEqual(self.ggrapher.verbose, False)
         self.assertEqual(self.ggrapher.write_filename, None)
+        self.assertEqual(self.ggrapher.stream, False)
         self.assertEqual(self.ggrapher.use_cache, True)
         self.assertEqual(self.ggrapher.cache_file, "geneacache")
+        self.assertEqual(self.ggrapher.cache_backend, None)
+        self.assertEqual(self.ggrapher.cache_max_size, None)
+        self.assertEqual(self.ggrapher.archive_pages, False)
+        self.assertEqual(self.ggrapher.concurrency, 1)
+        self.assertEqual(self.ggrapher.rate_limit, None)
+        self.assertEqual(self.ggrapher.adaptive, False)
         self.assertEqual(self.ggrapher.seed_ids, [3])
 
     def test_parse_options(self):
@@ -68,23 +105,63 @@ geneagrapher: error: the following arguments are required: ID
             "geneagrapher",
             "--with-ancestors",
             "--with-descendants",
+            "--max-generations",
+            "2",
+            "--max-nodes",
+            "100",
+            "--checkpoint",
+            "crawl.checkpoint",
+            "--resume",
             "--file=filler",
+            "--stream",
             "--verbose",
             "--disable-cache",
             "--cache-file",
             "foo",
+            "--cache-backend",
+            "shelve",
+            "--cache-max-size",
+            "64M",
+            "--archive-pages",
+            "--concurrency",
+            "16",
+            "--rate-limit",
+            "2.5",
+            "--adaptive",
             "3",
             "43",
         ]
         self.ggrapher.parse_input()
         self.assertEqual(self.ggrapher.get_ancestors, True)
         self.assertEqual(self.ggrapher.get_descendants, True)
+        self.assertEqual(self.ggrapher.max_generations, 2)
+        self.assertEqual(self.ggrapher.max_nodes, 100)
+        self.assertEqual(self.ggrapher.checkpoint_file, "crawl.checkpoint")
+        self.assertEqual(self.ggrapher.resume, True)
         self.assertEqual(self.ggrapher.verbose, True)
         self.assertEqual(self.ggrapher.write_filename, "filler")
+        self.assertEqual(self.ggrapher.stream, True)
         self.assertEqual(self.ggrapher.use_cache, False)
         self.assertEqual(self.ggrapher.cache_file, "foo")
+        self.assertEqual(self.ggrapher.cache_backend, "shelve")
+        self.assertEqual(self.ggrapher.cache_max_size, 64 * 2**20)
+        self.assertEqual(self.ggrapher.archive_pages, True)
+        self.assertEqual(self.ggrapher.concurrency, 16)
+        self.assertEqual(self.ggrapher.rate_limit, 2.5)
+        self.assertEqual(self.ggrapher.adaptive, True)
         self.assertEqual(self.ggrapher.seed_ids, [3, 43])
 
+    def test_parse_resume_without_checkpoint(self):
+        """Test that --resume is refused without a checkpoint file."""
+        sys.argv = ["geneagrapher", "--resume", "3"]
+        stderr = sys.stderr
+        sys.stderr = io.StringIO()
+        try:
+            self.assertRaises(SystemExit, self.ggrapher.parse_input)
+            self.assertIn("--resume needs a --checkpoint FILE", sys.stderr.getvalue())
+        finally:
+            sys.stderr = stderr
+
     def test_parse_short_options(self):
         """Test parse_input() with short versions of the options."""
         sys.argv = ["geneagrapher", "-a", "-d", "-f", "filler", "-v", "3", "43"]
@@ -130,7 +207,10 @@ geneagrapher: error: the following arguments are required: ID
         )
         expiration = 1e15
         self.ggrapher.build_graph_complete(
-            CacheGrabber, filename=cache_fname, expiration_interval=expiration
+            CacheGrabber,
+            filename=cache_fname,
+            expiration_interval=expiration,
+            backend="shelve",
         )
         sys.stdout = stdout
 
@@ -280,6 +360,226 @@ geneagrapher: error: the following arguments are required: ID
         self.assertEqual(record.year, 2003)
         self.assertEqual(record.id, 99457)
 
+    def assert_concurrent_matches_serial(self, seed_ids, ancestors, descendants):
+        """Build the graph for the given seeds serially and with several
+        records in flight and verify the two graphs are the same."""
+        graphs = []
+        for concurrency in [1, 4]:
+            ggrapher = geneagrapher.Geneagrapher()
+            ggrapher.seed_ids.extend(seed_ids)
+            ggrapher.get_ancestors = ancestors
+            ggrapher.get_descendants = descendants
+            ggrapher.concurrency = concurrency
+            ggrapher.build_graph_complete(LocalDataGrabber)
+            graphs.append(ggrapher.graph)
+        serial, graph = graphs
+
+        self.assertEqual(set(graph), set(serial))
+        self.assertEqual(graph.seeds, serial.seeds)
+        for id in serial:
+            self.assertEqual(graph[id].ancestors, serial[id].ancestors)
+            self.assertEqual(graph[id].descendants, serial[id].descendants)
+        self.assertEqual(
+            graph.generate_dot_file(ancestors, descendants),
+            serial.generate_dot_file(ancestors, descendants),
+        )
+
+    def test_build_graph_complete_stream(self):
+        """Graph building writing the dot file as the nodes are added."""
+        for ancestors, descendants, seed_ids in [
+            (True, False, [127946, 52996, 53658, 137705]),
+            (False, True, [79568, 52965]),
+        ]:
+            ggrapher = geneagrapher.Geneagrapher()
+            ggrapher.seed_ids.extend(seed_ids)
+            ggrapher.get_ancestors = ancestors
+            ggrapher.get_descendants = descendants
+            outfile = io.StringIO()
+            ggrapher.dot_writer = DotFileWriter(ggrapher.graph, outfile)
+            ggrapher.build_graph_complete(LocalDataGrabber)
+            ggrapher.dot_writer.close()
+
+            streamed = outfile.getvalue()
+            generated = ggrapher.graph.generate_dot_file(ancestors, descendants)
+            self.assertTrue(streamed.startswith(dot_file_header))
+            self.assertEqual(
+                sorted(line for line in streamed.splitlines() if line),
+                sorted(line for line in generated.splitlines() if line),
+            )
+            # The seeds come first, as they are grabbed first.
+            labels = [line for line in streamed.splitlines() if "label" in line]
+            self.assertEqual(
+                [int(line.split()[0]) for line in labels[: len(seed_ids)]], seed_ids
+            )
+
+    def test_build_graph_complete_max_generations(self):
+        """Graph building with a limit on the generations grabbed."""
+        self.ggrapher.seed_ids.append(127946)
+        self.ggrapher.get_ancestors = True
+        self.ggrapher.max_generations = 1
+        self.ggrapher.build_graph_complete(LocalDataGrabber)
+        graph = self.ggrapher.graph
+        self.assertEqual(set(graph), set([127946, 137717, 137705]))
+        self.assertEqual(graph.truncated_ancestors, {137705: set([143630])})
+        self.assertEqual(graph.truncated_descendants, {})
+
+        self.ggrapher = geneagrapher.Geneagrapher()
+        self.ggrapher.seed_ids.append(79568)
+        self.ggrapher.get_descendants = True
+        self.ggrapher.max_generations = 0
+        self.ggrapher.build_graph_complete(LocalDataGrabber)
+        graph = self.ggrapher.graph
+        self.assertEqual(list(graph), [79568])
+        self.assertEqual(graph.truncated_descendants, {79568: set([79562, 99457])})
+        self.assertIn(
+            '    "79568-students" [label="2 more students"];\n',
+            graph.generate_dot_file(False, True),
+        )
+
+    def test_build_graph_complete_max_nodes(self):
+        """Graph building with a limit on the nodes in the graph."""
+        self.ggrapher.seed_ids.append(127946)
+        self.ggrapher.get_ancestors = True
+        self.ggrapher.get_descendants = True
+        self.ggrapher.max_nodes = 2
+        self.ggrapher.build_graph_complete(LocalDataGrabber)
+        graph = self.ggrapher.graph
+        self.assertEqual(list(graph), [127946, 137705])
+        self.assertEqual(
+            graph.truncated_ancestors,
+            {127946: set([137717]), 137705: set([143630])},
+        )
+        self.assertEqual(graph.truncated_descendants, {127946: set([144155, 127803])})
+
+    def test_build_graph_complete_within_limits(self):
+        """Test that nothing is marked truncated when the crawl ends within
+        its limits."""
+        self.ggrapher.seed_ids.append(127946)
+        self.ggrapher.get_ancestors = True
+        self.ggrapher.max_generations = 2
+        self.ggrapher.max_nodes = 4
+        self.ggrapher.build_graph_complete(LocalDataGrabber)
+        graph = self.ggrapher.graph
+        self.assertEqual(len(graph), 4)
+        self.assertEqual(graph.truncated_ancestors, {})
+
+    def build_checkpointed(self, crawl, grabber, resume):
+        """Build the graph of a crawl, given as (seed ids, ancestors,
+        descendants, max generations, max nodes), with a checkpoint file,
+        and return it."""
+        seed_ids, ancestors, descendants, max_generations, max_nodes = crawl
+        ggrapher = geneagrapher.Geneagrapher()
+        ggrapher.seed_ids.extend(seed_ids)
+        ggrapher.get_ancestors = ancestors
+        ggrapher.get_descendants = descendants
+        ggrapher.max_generations = max_generations
+        ggrapher.max_nodes = max_nodes
+        ggrapher.checkpoint_file = self.checkpoint_file
+        ggrapher.resume = resume
+        ggrapher.build_graph_complete(grabber)
+        return ggrapher.graph
+
+    def test_build_graph_complete_resume(self):
+        """Test that a crawl resumed after being interrupted at any record
+        builds the graph of an uninterrupted crawl, grabbing only the
+        records of the levels it had not finished."""
+
+        class Interrupted(Exception):
+            pass
+
+        class CountingGrabber(LocalDataGrabber):
+            grabbed = 0
+            limit = None
+
+            def get_record(self, id):
+                if CountingGrabber.grabbed == CountingGrabber.limit:
+                    raise Interrupted()
+                CountingGrabber.grabbed += 1
+                return LocalDataGrabber.get_record(self, id)
+
+        self.checkpoint_file = "geneagrapher-test.checkpoint"
+        try:
+            for crawl in [
+                ([127946, 52996, 53658, 137705], True, False, None, None),
+                ([79568, 52965], False, True, None, None),
+                ([127946], True, False, 1, None),
+                ([127946, 52996], True, False, None, 3),
+            ]:
+                expected = self.build_checkpointed(crawl, LocalDataGrabber, False)
+                for limit in range(len(expected) + 1):
+                    CountingGrabber.grabbed = 0
+                    CountingGrabber.limit = limit
+                    try:
+                        self.build_checkpointed(crawl, CountingGrabber, False)
+                    except Interrupted:
+                        pass
+                    CountingGrabber.grabbed = 0
+                    CountingGrabber.limit = None
+                    graph = self.build_checkpointed(crawl, CountingGrabber, True)
+                    if limit >= len(crawl[0]):
+                        # The seeds were recorded, so are not grabbed again.
+                        self.assertLessEqual(
+                            CountingGrabber.grabbed, len(expected) - len(crawl[0])
+                        )
+
+                    self.assertEqual(list(graph), list(expected))
+                    self.assertEqual(graph.seeds, expected.seeds)
+                    for id, node in expected.items():
+                        self.assertEqual(
+                            list(graph[id].ancestors), list(node.ancestors)
+                        )
+                        self.assertEqual(
+                            list(graph[id].descendants), list(node.descendants)
+                        )
+                    self.assertEqual(
+                        graph.truncated_ancestors, expected.truncated_ancestors
+                    )
+                    self.assertEqual(
+                        graph.truncated_descendants, expected.truncated_descendants
+                    )
+                    self.assertEqual(
+                        graph.generate_dot_file(True, True),
+                        expected.generate_dot_file(True, True),
+                    )
+
+                # Resuming a finished crawl grabs nothing.
+                CountingGrabber.grabbed = 0
+                graph = self.build_checkpointed(crawl, CountingGrabber, True)
+                self.assertEqual(CountingGrabber.grabbed, 0)
+                self.assertEqual(list(graph), list(expected))
+        finally:
+            os.remove(self.checkpoint_file)
+
+    def test_build_graph_complete_resume_new(self):
+        """Test that resuming without a checkpoint file starts the crawl."""
+        self.checkpoint_file = "geneagrapher-test.checkpoint"
+        try:
+            graph = self.build_checkpointed(
+                ([127946], True, False, None, None), LocalDataGrabber, True
+            )
+            self.assertEqual(len(graph), 4)
+            self.assertTrue(os.path.exists(self.checkpoint_file))
+        finally:
+            os.remove(self.checkpoint_file)
+
+    def test_build_graph_complete_concurrent_ancestors(self):
+        """Graph building with ancestors and several records in flight."""
+        self.assert_concurrent_matches_serial(
+            [127946, 52996, 53658, 137705], True, False
+        )
+
+    def test_build_graph_complete_concurrent_descendants(self):
+        """Graph building with descendants and several records in flight."""
+        self.assert_concurrent_matches_serial([79568, 52965], False, True)
+
+    def test_build_graph_complete_concurrent_bad_id(self):
+        """Graph building with several records in flight given a bad ID."""
+        self.ggrapher.seed_ids.extend([127946, 79568583832])
+        self.ggrapher.concurrency = 4
+        self.assertRaises(
+            ValueError, self.ggrapher.build_graph_complete, LocalDataGrabber
+        )
+
     def test_build_graph_complete_bad_id(self):
         """Graph building with a bad ID."""
         self.ggrapher.seed_ids.append(79568583832)
@@ -294,6 +594,60 @@ geneagrapher: error: the following arguments are required: ID
         else:
             self.fail()
 
+    def test_build_graph_cached_rate_limit(self):
+        """Test graph building through the cache with a rate limit."""
+        cache_fname = "geneacache-rate-limit-test"
+        with CacheGrabber(cache_fname, record_grabber=LocalDataGrabber) as cache:
+            list(cache.get_records([127946, 137717, 137705, 143630]))
+        self.ggrapher.seed_ids.append(127946)
+        self.ggrapher.get_ancestors = True
+        self.ggrapher.cache_file = cache_fname
+        self.ggrapher.rate_limit = 100.0
+
+        stderr = sys.stderr
+        sys.stderr = io.StringIO()
+        try:
+            self.ggrapher.build_graph()
+            self.assertTrue(sys.stderr.getvalue().startswith("Grabbed 0 requests"))
+        finally:
+            sys.stderr = stderr
+            for filename in os.listdir("."):
+                if filename.startswith(cache_fname):
+                    os.remove(filename)
+        self.assertEqual(
+            sorted(self.ggrapher.graph), [127946, 137705, 137717, 143630]
+        )
+
+    def test_build_graph_memory_cache_summary(self):
+        """Test that graph building reports the memory cache hits of the
+        cache grabber when verbose."""
+        cache_fname = "geneacache-summary-test"
+        with CacheGrabber(cache_fname, record_grabber=LocalDataGrabber) as cache:
+            list(cache.get_records([127946, 137717, 137705, 143630]))
+
+        stdout = sys.stdout
+        stderr = sys.stderr
+        sys.stdout = io.StringIO()
+        try:
+            for verbose, expected in [
+                (False, ""),
+                (True, "0 memory cache hits, 4 misses (0.0% hit rate)\n"),
+            ]:
+                sys.stderr = io.StringIO()
+                ggrapher = geneagrapher.Geneagrapher()
+                ggrapher.seed_ids.append(127946)
+                ggrapher.get_ancestors = True
+                ggrapher.cache_file = cache_fname
+                ggrapher.verbose = verbose
+                ggrapher.build_graph()
+                self.assertEqual(sys.stderr.getvalue(), expected)
+        finally:
+            sys.stdout = stdout
+            sys.stderr = stderr
+            for filename in os.listdir("."):
+                if filename.startswith(cache_fname):
+                    os.remove(filename)
+
     def test_end_to_end_self_stdout(self):
         """Complete test getting no ancestors or descendants and writing the
         result to stdout."""
@@ -330,7 +684,14 @@ geneagrapher: error: the following arguments are required: ID
         """Complete test using cache getting no ancestors or descendants and
         writing the result to stdout."""
         cache_fname = LocalDataGrabber.data_file("end-to-end-30484")
-        sys.argv = ["geneagrapher", "--cache-file", cache_fname, "30484"]
+        sys.argv = [
+            "geneagrapher",
+            "--cache-file",
+            cache_fname,
+            "--cache-backend",
+            "shelve",
+            "30484",
+        ]
         self.ggrapher.parse_input()
         self.assertEqual(self.ggrapher.get_ancestors, False)
         self.assertEqual(self.ggrapher.get_descendants, False)
@@ -339,7 +700,9 @@ geneagrapher: error: the following arguments are required: ID
         self.assertEqual(self.ggrapher.seed_ids, [30484])
 
         self.ggrapher.build_graph_complete(
-            CacheGrabber, filename=self.ggrapher.cache_file
+            CacheGrabber,
+            filename=self.ggrapher.cache_file,
+            backend=self.ggrapher.cache_backend,
         )
 
         # Redirect stdout to capture output.
@@ -468,7 +831,14 @@ geneagrapher: error: the following arguments are required: ID
         """Complete test calling ggrapher getting no ancestors or descendants
         and writing the result to stdout."""
         cache_fname = LocalDataGrabber.data_file("end-to-end-30484")
-        sys.argv = ["geneagrapher", "--cache-file", cache_fname, "30484"]
+        sys.argv = [
+            "geneagrapher",
+            "--cache-file",
+            cache_fname,
+            "--cache-backend",
+            "shelve",
+            "30484",
+        ]
 
         # Redirect stdout to capture output.
         stdout = sys.stdout
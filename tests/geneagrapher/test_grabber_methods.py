@@ -3,7 +3,13 @@ import sys
 from bs4 import BeautifulSoup
 import unittest
 from geneagrapher.grabber import *
+from geneagrapher.lxml_extractor import (
+    UnsupportedPageError,
+    get_record_from_lxml_tree,
+    parse_html,
+)
 from .local_data_grabber import LocalDataGrabber
+from .local_http_server import INVALID_IDS, data_ids
 
 
 class TestGrabberMethods(unittest.TestCase):
@@ -60,6 +66,26 @@ class TestGrabberMethods(unittest.TestCase):
             ),
         )
 
+    def test_grab_records_single_id_grabber(self):
+        """Test the grab_records() adapter for a grabber with only a
+        get_record() method."""
+
+        class SingleIdGrabber:
+            def get_record(self, id):
+                return LocalDataGrabber().get_record(id)
+
+        records = list(grab_records(SingleIdGrabber(), [18231, 137717]))
+        self.assertEqual([id for id, record in records], [18231, 137717])
+        self.assertEqual(records[0][1]["name"], "Carl Friedrich Gau\xdf")
+        self.assertEqual(records[1][1]["name"], "Valentin  Alberti")
+
+    def test_grab_records_batch_grabber(self):
+        """Test the grab_records() adapter for a grabber with a get_records()
+        method."""
+        grabber = LocalDataGrabber()
+        records = list(grab_records(grabber, [18231, 137717]))
+        self.assertEqual(records, list(grabber.get_records([18231, 137717])))
+
     def test_get_record_from_tree_bad(self):
         """Verify exception thrown from get_record_from_tree() method for bad
         id."""
@@ -139,6 +165,50 @@ class TestGrabberMethods(unittest.TestCase):
             ),
         )
 
+    def test_get_record_from_html_matches_tree(self):
+        """Test that the lxml extractor used by get_record_from_html() and
+        the BeautifulSoup extractor give identical records for every page of
+        test data."""
+        for id in data_ids():
+            with open(self.data_file("{}.html".format(id)), "rb") as fin:
+                page = fin.read()
+            expected = get_record_from_tree(BeautifulSoup(page, "lxml"), id)
+            tree = parse_html(page, "utf-8")
+            self.assertEqual(get_record_from_lxml_tree(tree, id), expected)
+            self.assertEqual(get_record_from_html(page, id, "utf-8"), expected)
+            self.assertEqual(get_record_from_html(page, id), expected)
+            self.assertEqual(get_record_from_html(page.decode("utf-8"), id), expected)
+
+    def test_get_record_from_html_bad(self):
+        """Verify exception thrown from get_record_from_html() for pages
+        without a record."""
+        for id in INVALID_IDS:
+            with open(self.data_file("{}.html".format(id)), "rb") as fin:
+                page = fin.read()
+            try:
+                get_record_from_tree(BeautifulSoup(page, "lxml"), id)
+            except Exception as e:
+                expected = e
+            with self.assertRaises(type(expected)) as cm:
+                get_record_from_html(page, id)
+            self.assertEqual(str(cm.exception), str(expected))
+
+    def test_get_record_from_html_fallback(self):
+        """Test that pages the lxml extractor does not support are handed to
+        BeautifulSoup."""
+        page = (
+            b'<html><body><p>Record</p><h2>A  Name</h2><div style="line-height: '
+            b'30px; text-align: center; margin-bottom: 1ex"><span>Ph.D. '
+            b"<span>Somewhere</span><!-- no year --></span></div></body></html>"
+        )
+        tree = parse_html(page, "utf-8")
+        self.assertRaises(UnsupportedPageError, get_record_from_lxml_tree, tree, 1)
+        record = get_record_from_html(page, 1)
+        self.assertEqual(record, get_record_from_tree(BeautifulSoup(page, "lxml"), 1))
+        self.assertEqual(record["name"], "A  Name")
+        self.assertEqual(record["institution"], "Somewhere")
+        self.assertIsNone(record["year"])
+
     def test_has_record_true(self):
         """Test the has_record() method with a tree containing a
         mathematician record."""
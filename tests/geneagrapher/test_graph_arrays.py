@@ -0,0 +1,100 @@
+import os
+import unittest
+from geneagrapher.graph import Graph, Node, Record, graph_arrays
+from geneagrapher.graph import load_graph_arrays, save_graph_arrays
+from .local_data_grabber import LocalDataGrabber
+from .local_http_server import data_ids
+
+numpy = graph_arrays.numpy
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class TestGraphArraysMethods(unittest.TestCase):
+    """Unit tests for the geneagrapher.graph.graph_arrays module."""
+
+    def setUp(self):
+        self.filename = "geneagraph-test.npz"
+        grabber = LocalDataGrabber()
+        self.graph = Graph()
+        records = []
+        for id in data_ids():
+            record = grabber.get_record(id)
+            records.append(
+                (
+                    record["name"],
+                    record["institution"],
+                    record["year"],
+                    id,
+                    record["advisors"],
+                    record["descendants"],
+                )
+            )
+        self.graph.add_nodes(records[:5], True)
+        self.graph.add_nodes(records[5:])
+        self.graph.add_node_object(Node(Record("Anonymous"), set(), set()))
+
+    def tearDown(self):
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+
+    def test_round_trip(self):
+        """Test that a loaded graph is the graph saved."""
+        for compress in [False, True]:
+            save_graph_arrays(self.graph, self.filename, compress)
+            graph = load_graph_arrays(self.filename)
+            self.assertEqual(list(graph), list(self.graph))
+            self.assertEqual(graph.seeds, self.graph.seeds)
+            self.assertEqual(graph.supp_id, self.graph.supp_id)
+            for id, node in self.graph.items():
+                loaded = graph[id]
+                self.assertEqual(loaded.record.name, node.record.name)
+                self.assertEqual(loaded.record.institution, node.record.institution)
+                self.assertEqual(loaded.record.year, node.record.year)
+                self.assertEqual(loaded.record.id, id)
+                self.assertEqual(loaded.ancestors, node.ancestors)
+                self.assertEqual(loaded.descendants, node.descendants)
+            self.assertEqual(
+                graph.generate_dot_file(True, True),
+                self.graph.generate_dot_file(True, True),
+            )
+
+    def test_arrays(self):
+        """Test the columnar layout of the saved arrays."""
+        save_graph_arrays(self.graph, self.filename)
+        with numpy.load(self.filename) as arrays:
+            ids = arrays["ids"].tolist()
+            self.assertEqual(ids, list(self.graph))
+            self.assertEqual(arrays["years"][ids.index(18231)], 1799)
+            self.assertEqual(arrays["years"][-1], graph_arrays.NO_YEAR)
+            self.assertEqual(
+                arrays["institution_codes"][-1], graph_arrays.NO_INSTITUTION
+            )
+            offsets = arrays["advisor_offsets"]
+            indexes = arrays["advisor_indexes"]
+            for i, id in enumerate(ids):
+                advisors = indexes[offsets[i] : offsets[i + 1]]
+                self.assertEqual(
+                    set(arrays["ids"][advisors].tolist()), self.graph[id].ancestors
+                )
+            self.assertEqual(
+                offsets[-1], sum(len(n.ancestors) for n in self.graph.values())
+            )
+
+    def test_without_numpy(self):
+        """Test the error given when numpy is not installed."""
+        graph_arrays.numpy = None
+        try:
+            self.assertRaisesRegex(
+                ImportError,
+                "numpy is needed",
+                save_graph_arrays,
+                self.graph,
+                self.filename,
+            )
+            self.assertRaises(ImportError, load_graph_arrays, self.filename)
+        finally:
+            graph_arrays.numpy = numpy
+
+
+if __name__ == "__main__":
+    unittest.main()
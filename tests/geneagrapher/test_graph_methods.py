@@ -1,5 +1,9 @@
+import io
+import random
 import unittest
 from geneagrapher.graph import DuplicateNodeError, Graph, Node, Record
+from .local_data_grabber import LocalDataGrabber
+from .local_http_server import data_ids
 
 
 class TestGraphMethods(unittest.TestCase):
@@ -16,6 +20,8 @@ class TestGraphMethods(unittest.TestCase):
         """Test the constructor with an empty seeds set."""
         graph = Graph()
         self.assertEqual(graph.seeds, set())
+        self.assertEqual(graph.truncated_ancestors, {})
+        self.assertEqual(graph.truncated_descendants, {})
 
     def test_init(self):
         """Test the constructor."""
@@ -89,6 +95,21 @@ class TestGraphMethods(unittest.TestCase):
         )
         self.assertEqual(graph.seeds, set([38586]))
 
+    def test_add_node_interned_institution(self):
+        """Test that nodes added to the graph share institution names."""
+        self.graph1.add_node(
+            "Wilhelm Weber",
+            "".join(["Universit\xe4t ", "Helmstedt"]),
+            1826,
+            20345,
+            set(),
+            set(),
+        )
+        self.assertIs(
+            self.graph1[20345].record.institution,
+            self.graph1[18231].record.institution,
+        )
+
     def test_add_node_already_present(self):
         """Test for expected exception when adding a duplicate node."""
         self.graph1.add_node(
@@ -114,6 +135,66 @@ class TestGraphMethods(unittest.TestCase):
         else:
             self.fail()
 
+    def add_nodes_records(self):
+        """Return add_node argument tuples for the records of the test
+        data."""
+        grabber = LocalDataGrabber()
+        records = []
+        for id in data_ids():
+            record = grabber.get_record(id)
+            records.append(
+                (
+                    record["name"],
+                    record["institution"],
+                    record["year"],
+                    id,
+                    list(record["advisors"]),
+                    list(record["descendants"]),
+                )
+            )
+        return records
+
+    def assertSameGraph(self, graph1, graph2):
+        """Check that two graphs hold the same nodes, seeds and edges, with
+        the edge sets in the same iteration order."""
+        self.assertEqual(list(graph1), list(graph2))
+        self.assertEqual(graph1.seeds, graph2.seeds)
+        for id, node in graph1.items():
+            self.assertEqual(str(node), str(graph2[id]))
+            self.assertEqual(list(node.ancestors), list(graph2[id].ancestors))
+            self.assertEqual(list(node.descendants), list(graph2[id].descendants))
+        self.assertEqual(
+            graph1.generate_dot_file(True, True), graph2.generate_dot_file(True, True)
+        )
+
+    def test_add_nodes(self):
+        """Test that the add_nodes() method builds the same graph as adding
+        the nodes one at a time."""
+        records = self.add_nodes_records()
+        rand = random.Random(0)
+        for trial in range(20):
+            rand.shuffle(records)
+            split = rand.randrange(len(records))
+            graph1 = Graph()
+            graph2 = Graph()
+            for record in records[:split]:
+                graph1.add_node(*record)
+                graph2.add_node(*record)
+            for record in records[split:]:
+                graph1.add_node(*record, is_seed=trial % 2 == 0)
+            graph2.add_nodes(iter(records[split:]), trial % 2 == 0)
+            self.assertSameGraph(graph1, graph2)
+
+    def test_add_nodes_duplicate(self):
+        """Test that add_nodes() adds nothing when an id is duplicated."""
+        records = self.add_nodes_records()
+        self.assertRaises(
+            DuplicateNodeError, self.graph1.add_nodes, records + records[:1]
+        )
+        self.assertEqual(list(self.graph1), [18231])
+        self.assertRaises(DuplicateNodeError, self.graph1.add_nodes, records)
+        self.assertEqual(list(self.graph1), [18231])
+
     def test_add_node_object(self):
         """Test the add_node_object() method."""
         record = Record("Leonhard Euler", "Universitaet Basel", 1726, 38586)
@@ -210,6 +291,100 @@ Halle-Wittenberg (1713)"];
         dotfile = graph.generate_dot_file(True, False)
         self.assertEqual(dotfile, dotfileexpt)
 
+    def test_generate_dot_file_truncated(self):
+        """Test that the generate_dot_file() method marks the advisors and
+        students left out of the graph."""
+        self.graph1.truncated_ancestors[18231] = set([18230])
+        self.graph1.truncated_descendants[18231] = set([18603, 18233])
+        dotfileexpt = """digraph genealogy {
+    graph [charset="utf-8"];
+    node [shape=plaintext];
+    edge [style=bold];
+
+    18231 [label="Carl Friedrich Gau\xdf \\nUniversit\xe4t Helmstedt (1799)"];
+    "18231-advisors" [label="1 more advisor"];
+    "18231-students" [label="2 more students"];
+
+    "18231-advisors" -> 18231 [style=dashed];
+    18231 -> "18231-students" [style=dashed];
+}
+"""
+        self.assertEqual(self.graph1.generate_dot_file(True, True), dotfileexpt)
+
+        # Only the links of the directions included are marked.
+        dotfile = self.graph1.generate_dot_file(True, False)
+        self.assertIn('"18231-advisors"', dotfile)
+        self.assertNotIn('"18231-students"', dotfile)
+
+    def test_write_dot_file(self):
+        """Test that the write_dot_file() method writes what
+        generate_dot_file() returns."""
+        graph = Graph()
+        graph.add_nodes(self.add_nodes_records())
+        for ancestors, descendants in [(True, False), (False, True), (True, True)]:
+            outfile = io.StringIO()
+            graph.write_dot_file(outfile, ancestors, descendants)
+            self.assertEqual(
+                outfile.getvalue(), graph.generate_dot_file(ancestors, descendants)
+            )
+
+        outfile = io.StringIO()
+        Graph().write_dot_file(outfile, True, True)
+        self.assertEqual(outfile.getvalue(), "")
+
+    def test_dot_file_lines(self):
+        """Test that the dot_file_lines() method generates the dot file a
+        node at a time."""
+        lines = list(self.graph1.dot_file_lines(True, False))
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(
+            lines[1],
+            '    18231 [label="Carl Friedrich Gau\xdf \\nUniversit\xe4t Helmstedt \
+(1799)"];\n',
+        )
+        self.assertEqual(list(Graph().dot_file_lines(True, True)), [])
+
+    def test_dot_file_surname_order(self):
+        """Test that neighbours sharing surnames are printed in the order
+        given by sorting them by the last words of their names."""
+        rand = random.Random(0)
+        surnames = ["Gauss", "Euler", "Bernoulli", "Weber", "Klein"]
+        graph = Graph()
+        for id in range(1, 301):
+            graph.add_node(
+                "Johann {} {}".format(id, rand.choice(surnames)),
+                None,
+                None,
+                id,
+                set(rand.sample(range(1, 301), 3)),
+                set(rand.sample(range(1, 301), 4)),
+            )
+
+        def surname(id):
+            return graph[id].record.name.split()[-1]
+
+        # Walk the graph as the dot file is printed, sorting neighbours by
+        # surname.
+        queue = sorted(graph.seeds)
+        order = []
+        while queue:
+            id = queue.pop(0)
+            if id not in order:
+                order.append(id)
+                queue += sorted(graph[id].ancestors, key=surname)
+                queue += sorted(graph[id].descendants, key=surname)
+        edges = [
+            "    {} -> {};".format(advisor, id)
+            for id in order
+            for advisor in sorted(graph[id].ancestors, key=surname)
+        ]
+
+        dotfile = graph.generate_dot_file(True, True).splitlines()
+        self.assertEqual(
+            [int(line.split()[0]) for line in dotfile if "label" in line], order
+        )
+        self.assertEqual([line for line in dotfile if "->" in line], edges)
+
     def test_incremental_ancestor_descendant_check(self):
         """Test the contents of the ancestors and descendants members of a
         graph's nodes as they are added."""
@@ -108,6 +108,14 @@ class TestNodeMethods(unittest.TestCase):
         node.set_id(15)
         self.assertEqual(node.get_id(), 15)
 
+    def test_trusted(self):
+        """Test the trusted constructor."""
+        node = Node.trusted(self.record, set([18230]), set())
+        self.assertEqual(node.record, self.record)
+        self.assertEqual(node.ancestors, set([18230]))
+        self.assertEqual(node.descendants, set())
+        self.assertRaises(AttributeError, setattr, node, "degree", "PhD")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,54 @@
+import os
+import unittest
+from geneagrapher.page_archive import PageArchive
+
+
+class TestPageArchiveMethods(unittest.TestCase):
+    """Unit tests for the geneagrapher.page_archive.PageArchive class."""
+
+    def setUp(self):
+        self.filename = "geneacache-test.pages"
+        self.page = "<html><body><h2>Carl Friedrich Gau\xdf</h2></body></html>".encode(
+            "utf-8"
+        )
+
+    def tearDown(self):
+        try:
+            os.remove(self.filename)
+        except OSError:
+            pass
+
+    def test_store_page(self):
+        """Test storing and retrieving a page."""
+        with PageArchive(self.filename) as archive:
+            self.assertEqual(len(archive), 0)
+            self.assertIsNone(archive.get_page(18231))
+            archive.store_page(18231, self.page, "utf-8", 1000.0)
+            self.assertEqual(len(archive), 1)
+            self.assertTrue(18231 in archive)
+            self.assertFalse(18230 in archive)
+            self.assertEqual(archive.get_page(18231), (self.page, "utf-8", 1000.0))
+
+    def test_store_page_replace(self):
+        """Test that storing a page again replaces the archived page."""
+        with PageArchive(self.filename) as archive:
+            archive.store_page(18231, b"old", None, 1000.0)
+            archive.store_page(18231, self.page)
+            page, encoding, timestamp = archive.get_page(18231)
+            self.assertEqual(page, self.page)
+            self.assertIsNone(encoding)
+            self.assertGreater(timestamp, 1000.0)
+            self.assertEqual(len(archive), 1)
+
+    def test_persistence(self):
+        """Test that pages are kept when the archive is reopened."""
+        with PageArchive(self.filename) as archive:
+            archive.store_page(18231, self.page, "utf-8")
+            archive.store_page(18230, self.page, "utf-8")
+        with PageArchive(self.filename) as archive:
+            self.assertEqual(archive.ids(), [18230, 18231])
+            self.assertEqual(archive.get_page(18230)[0], self.page)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+import gzip
+import os
+import unittest
+from geneagrapher.cache_grabber import CacheGrabber
+from geneagrapher.page_import import (
+    directory_pages,
+    import_pages,
+    parse_pages,
+    parse_warc_date,
+    warc_pages,
+)
+from .local_data_grabber import LocalDataGrabber
+from .local_http_server import INVALID_IDS, data_ids
+
+
+class TestPageImportMethods(unittest.TestCase):
+    """Unit tests for the geneagrapher.page_import module."""
+
+    def setUp(self):
+        self.cache_file = "geneacache-import-test"
+        self.warc_file = "geneacache-import-test.warc.gz"
+        self.grabber = LocalDataGrabber()
+
+    def tearDown(self):
+        for filename in os.listdir("."):
+            if filename.startswith(self.cache_file):
+                os.remove(filename)
+
+    def page(self, id):
+        """Return the test data page for an id."""
+        return self.grabber.get_page(id)[0]
+
+    def warc_record(self, kind, id, block, date="2020-02-01T12:00:00Z"):
+        """Return a WARC record for the record page of an id."""
+        headers = [
+            b"WARC/1.0",
+            b"WARC-Type: " + kind.encode("ascii"),
+            b"WARC-Target-URI: https://www.mathgenealogy.org/id.php?id=%d" % id,
+            b"WARC-Date: " + date.encode("ascii"),
+            b"Content-Length: %d" % len(block),
+        ]
+        return b"\r\n".join(headers) + b"\r\n\r\n" + block + b"\r\n\r\n"
+
+    def write_warc(self):
+        """Write a WARC file holding pages in each of the supported forms,
+        along with records to be skipped."""
+        page = self.page(137717)
+        chunked = gzip.compress(self.page(137705))
+        chunked = b"%x\r\n%s\r\n0\r\n\r\n" % (len(chunked), chunked)
+        records = [
+            b"WARC/1.0\r\nWARC-Type: warcinfo\r\nContent-Length: 4\r\n\r\ninfo\r\n\r\n",
+            self.warc_record(
+                "response",
+                18231,
+                b"HTTP/1.1 200 OK\r\nContent-Type: text/html; charset=utf-8\r\n"
+                b"Content-Length: %d\r\n\r\n%s"
+                % (len(self.page(18231)), self.page(18231)),
+            ),
+            self.warc_record("resource", 137717, page, "2021-03-04T05:06:07Z"),
+            self.warc_record(
+                "response",
+                137705,
+                b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n"
+                b"Content-Encoding: gzip\r\n\r\n" + chunked,
+            ),
+            self.warc_record(
+                "response",
+                18230,
+                b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n",
+            ),
+            self.warc_record(
+                "request", 18230, b"GET /id.php?id=18230 HTTP/1.1\r\n\r\n"
+            ),
+        ]
+        with gzip.open(self.warc_file, "wb") as fout:
+            for record in records:
+                fout.write(record)
+
+    def test_directory_pages(self):
+        """Test listing the pages of a directory."""
+        pages = sorted(directory_pages(LocalDataGrabber.data_path))
+        self.assertEqual(
+            [page[0] for page in pages], sorted(data_ids() + list(INVALID_IDS))
+        )
+        id, filename, encoding, timestamp = pages[0]
+        self.assertEqual(filename, LocalDataGrabber.data_file("{}.html".format(id)))
+        self.assertIsNone(encoding)
+        self.assertEqual(timestamp, os.path.getmtime(filename))
+
+    def test_warc_pages(self):
+        """Test reading the pages of a WARC file."""
+        self.write_warc()
+        pages = list(warc_pages(self.warc_file))
+        self.assertEqual([page[0] for page in pages], [18231, 137717, 137705])
+        self.assertEqual(pages[0][1:3], (self.page(18231), "utf-8"))
+        self.assertEqual(
+            pages[1][1:],
+            (self.page(137717), None, parse_warc_date("2021-03-04T05:06:07Z")),
+        )
+        self.assertEqual(pages[2][1], self.page(137705))
+        self.assertEqual(parse_warc_date("1970-01-02T00:00:00Z"), 86400.0)
+
+    def test_parse_pages(self):
+        """Test extracting the records of pages in one and in several
+        processes."""
+        pages = list(directory_pages(LocalDataGrabber.data_path))
+        expected = sorted(
+            (id, self.grabber.get_record(id) if id not in INVALID_IDS else None)
+            for id, _, _, _ in pages
+        )
+        for processes in [1, 2]:
+            results = parse_pages(pages, processes, batch_size=5)
+            self.assertEqual(
+                sorted((id, record) for id, record, _ in results), expected
+            )
+
+    def test_import_pages(self):
+        """Test loading the records of pages into a cache, keeping cached
+        records from more recent pages."""
+        self.write_warc()
+        with CacheGrabber(self.cache_file, record_grabber=LocalDataGrabber) as cache:
+            cache.load_into_cache(137717, dict(self.grabber.get_record(137717), year=1))
+            self.assertEqual(
+                import_pages(cache, warc_pages(self.warc_file), processes=1), (2, 1)
+            )
+            self.assertEqual(len(cache.cache), 3)
+            record = cache.cache["18231"]
+            self.assertEqual(
+                record["timestamp"], parse_warc_date("2020-02-01T12:00:00Z")
+            )
+            self.assertEqual(cache.cache["137717"]["year"], 1)
+            self.assertEqual(
+                cache.cache["137705"]["name"], self.grabber.get_record(137705)["name"]
+            )
+
+            # Pages more recent than the cached records replace them.
+            pages = directory_pages(LocalDataGrabber.data_path)
+            self.assertEqual(
+                import_pages(cache, pages, processes=2, batch_size=5),
+                (len(data_ids()) - 1, len(INVALID_IDS) + 1),
+            )
+            self.assertEqual(len(cache.cache), len(data_ids()))
+            self.assertEqual(
+                cache.cache["18231"]["timestamp"],
+                os.path.getmtime(LocalDataGrabber.data_file("18231.html")),
+            )
+            self.assertEqual(cache.cache["137717"]["year"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
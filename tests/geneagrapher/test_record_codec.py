@@ -0,0 +1,136 @@
+import pickle
+import unittest
+from geneagrapher.record_codec import (
+    CODEC_VERSION,
+    decode_record,
+    encode_record,
+    read_varint,
+    write_varint,
+)
+from .local_data_grabber import LocalDataGrabber
+from .local_http_server import data_ids
+
+
+class TestRecordCodecMethods(unittest.TestCase):
+    """Unit tests for the geneagrapher.record_codec module."""
+
+    def setUp(self):
+        self.record = {
+            "name": "Carl Friedrich Gau\xdf",
+            "institution": "Universit\xe4t Helmstedt",
+            "year": 1799,
+            "advisors": set([18230]),
+            "descendants": set([18603, 18233, 62547, 29642, 55175, 166471]),
+            "schema": 1,
+        }
+        self.institutions = {}
+
+    def intern(self, name):
+        return self.institutions.setdefault(name, len(self.institutions) + 1)
+
+    def institution_name(self, id):
+        for name, number in self.institutions.items():
+            if number == id:
+                return name
+        raise KeyError(id)
+
+    def round_trip(self, record):
+        return decode_record(encode_record(record, self.intern), self.institution_name)
+
+    def test_varint(self):
+        """Test writing and reading varints."""
+        for value in [0, 1, 127, 128, 300, 16383, 16384, 2**35 + 7]:
+            out = bytearray(b"x")
+            write_varint(out, value)
+            self.assertEqual(read_varint(out, 1), (value, len(out)))
+        out = bytearray()
+        write_varint(out, 300)
+        self.assertEqual(out, b"\xac\x02")
+
+    def test_round_trip(self):
+        """Test that records survive encoding and decoding."""
+        data = encode_record(self.record, self.intern)
+        self.assertEqual(data[0], CODEC_VERSION)
+        self.assertEqual(self.institutions, {"Universit\xe4t Helmstedt": 1})
+        self.assertEqual(decode_record(data, self.institution_name), self.record)
+        self.assertLess(len(data), len(pickle.dumps(self.record)) // 2)
+
+    def test_round_trip_empty(self):
+        """Test records with missing fields."""
+        record = {
+            "name": "",
+            "institution": None,
+            "year": None,
+            "advisors": set(),
+            "descendants": set(),
+            "schema": 0,
+        }
+        self.assertEqual(self.round_trip(record), record)
+        record["year"] = 0
+        self.assertEqual(self.round_trip(record), record)
+        self.assertEqual(self.institutions, {})
+
+    def test_legacy_record(self):
+        """Test that records with no schema are encoded compactly, with
+        schema 1."""
+        record = dict(self.record)
+        del record["schema"]
+        data = encode_record(record, self.intern)
+        self.assertEqual(data[0], CODEC_VERSION)
+        self.assertEqual(
+            decode_record(data, self.institution_name), dict(record, schema=1)
+        )
+
+    def test_round_trip_data(self):
+        """Test that the records of the test data survive encoding and
+        decoding."""
+        grabber = LocalDataGrabber()
+        for id in data_ids():
+            record = grabber.get_record(id)
+            record["schema"] = 1
+            self.assertEqual(self.round_trip(record), record)
+
+    def test_interned_institutions(self):
+        """Test that institutions are interned once."""
+        for year in range(3):
+            self.round_trip(dict(self.record, year=year))
+        self.round_trip(dict(self.record, institution="Universit\xe4t Leipzig"))
+        self.assertEqual(len(self.institutions), 2)
+
+    def test_pickle_fallback(self):
+        """Test that records the compact encoding cannot hold are pickled."""
+        for record in [
+            dict(self.record, message="cache hit"),
+            dict(self.record, year="1799"),
+            dict(self.record, advisors=[18230]),
+            dict(self.record, descendants=set([-1])),
+            dict(self.record, year=2**16),
+            dict(self.record, descendants=set([2**32])),
+            {"name": self.record["name"]},
+        ]:
+            data = encode_record(record, self.intern)
+            self.assertEqual(data, pickle.dumps(record, pickle.HIGHEST_PROTOCOL))
+            self.assertEqual(decode_record(data, self.institution_name), record)
+
+    def test_decode_bad(self):
+        """Test decoding data that is not an encoded record."""
+        data = encode_record(self.record, self.intern)
+        self.assertRaisesRegex(
+            ValueError,
+            "Unknown record encoding 99",
+            decode_record,
+            b"\x63" + data[1:],
+            self.institution_name,
+        )
+        for bad in [data[:-1], data + b"\x01", data[:5]]:
+            self.assertRaisesRegex(
+                ValueError,
+                "Corrupt record encoding",
+                decode_record,
+                bad,
+                self.institution_name,
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
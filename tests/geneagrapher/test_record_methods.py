@@ -48,6 +48,27 @@ class TestRecordMethods(unittest.TestCase):
             "18231",
         )
 
+    def test_trusted(self):
+        """Test the trusted constructor."""
+        record = Record.trusted("Carl Friedrich Gauss", None, None, 18231)
+        self.assertEqual(record.name, "Carl Friedrich Gauss")
+        self.assertIsNone(record.institution)
+        self.assertIsNone(record.year)
+        self.assertEqual(record.id, 18231)
+        self.assertEqual(record, self.record)
+
+    def test_interned_institution(self):
+        """Test that records share the names of their institutions."""
+        name = "".join(["Universit\xe4t ", "Helmstedt"])
+        self.assertIs(Record("Gauss", name).institution, self.record.institution)
+        self.assertIs(
+            Record.trusted("Gauss", name).institution, self.record.institution
+        )
+
+    def test_slots(self):
+        """Test that records only take the attributes of a record."""
+        self.assertRaises(AttributeError, setattr, self.record, "degree", "PhD")
+
     def test_equal(self):
         """Verify two 'equal' records are compared correctly."""
         record1 = Record("Carl Friedrich Gauss", "Universitaet Helmstedt", 1799, 18231)
@@ -0,0 +1,100 @@
+import threading
+import unittest
+from geneagrapher.single_flight import SingleFlight
+
+
+class TestSingleFlightMethods(unittest.TestCase):
+    """Unit tests for the geneagrapher.single_flight.SingleFlight class."""
+
+    def setUp(self):
+        self.single_flight = SingleFlight()
+        self.calls = 0
+        self.release = threading.Event()
+
+    def slow_call(self, value):
+        """Count the call and return value once the test releases it."""
+        self.calls += 1
+        self.release.wait()
+        return value
+
+    def run_threads(self, count, function):
+        """Call function from count threads at once and return the results
+        or exceptions. The slow call is released once every thread has
+        asked for its key."""
+        results = [None] * count
+        begun = threading.Semaphore(0)
+        begin = self.single_flight.begin
+
+        def counting_begin(key):
+            try:
+                return begin(key)
+            finally:
+                begun.release()
+
+        self.single_flight.begin = counting_begin
+
+        def run(index):
+            try:
+                results[index] = function()
+            except Exception as error:
+                results[index] = error
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            begun.acquire()
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        self.single_flight.begin = begin
+        return results
+
+    def test_do(self):
+        """Test that concurrent calls for a key share one call."""
+        record = {"name": "Carl Friedrich Gau\xdf"}
+        results = self.run_threads(
+            5, lambda: self.single_flight.do(18231, self.slow_call, record)
+        )
+        self.assertEqual(self.calls, 1)
+        self.assertTrue(all(result is record for result in results))
+        self.assertEqual(self.single_flight.saved, 4)
+        self.assertEqual(
+            self.single_flight.summary(),
+            "4 fetches saved by sharing in-flight requests",
+        )
+        self.assertEqual(self.single_flight.calls, {})
+
+        # Calls made after the shared one finished are made again.
+        self.single_flight.do(18231, self.slow_call, record)
+        self.assertEqual(self.calls, 2)
+
+    def test_do_error(self):
+        """Test that the callers sharing a call share its exception."""
+
+        def fail():
+            self.calls += 1
+            self.release.wait()
+            raise ValueError("Invalid id 18231")
+
+        results = self.run_threads(3, lambda: self.single_flight.do(18231, fail))
+        self.assertEqual(self.calls, 1)
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        self.assertEqual(self.single_flight.calls, {})
+
+    def test_give_up(self):
+        """Test that callers waiting for a call that is given up make the
+        call themselves."""
+        call, leader = self.single_flight.begin(18231)
+        self.assertTrue(leader)
+        self.assertEqual(self.single_flight.begin(18231), (call, False))
+        self.single_flight.finish(18231)
+        self.assertIsNone(self.single_flight.wait(call))
+        self.assertEqual(self.single_flight.saved, 0)
+        self.release.set()
+        self.assertEqual(self.single_flight.do(18231, self.slow_call, 1), 1)
+        self.assertEqual(self.calls, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import time
+import unittest
+import urllib.error
+from geneagrapher.throttle import AIMDWindow, RateLimiter, Throttle, ThrottledGrabber
+from .local_data_grabber import LocalDataGrabber
+
+
+class FlakyGrabber(LocalDataGrabber):
+    """A local data grabber whose first requests fail with the given HTTP
+    status codes."""
+
+    statuses = []
+
+    def __init__(self):
+        self.statuses = list(FlakyGrabber.statuses)
+        self.calls = 0
+
+    def get_record(self, id):
+        self.calls += 1
+        if self.statuses:
+            status = self.statuses.pop(0)
+            raise urllib.error.HTTPError(
+                "http://example.com", status, "error", {"Retry-After": "0"}, None
+            )
+        return LocalDataGrabber.get_record(self, id)
+
+
+class TestThrottleMethods(unittest.TestCase):
+    """Unit tests for the geneagrapher.throttle module."""
+
+    def tearDown(self):
+        FlakyGrabber.statuses = []
+
+    def test_rate_limiter(self):
+        """Test that the rate limiter spaces out requests."""
+        limiter = RateLimiter(100)
+        start = time.monotonic()
+        for _ in range(11):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+    def test_rate_limiter_bad_rate(self):
+        """Test the rate limiter constructor with a non-positive rate."""
+        self.assertRaises(ValueError, RateLimiter, 0)
+
+    def test_aimd_window(self):
+        """Test the additive increase and multiplicative decrease of the
+        window."""
+        window = AIMDWindow(8)
+        self.assertEqual(window.size, 8)
+        window.decrease()
+        self.assertEqual(window.size, 4)
+        window.increase()
+        self.assertEqual(window.size, 4.25)
+        for _ in range(3):
+            window.increase()
+        self.assertLess(window.size, 5)
+        for _ in range(10):
+            window.decrease()
+        self.assertEqual(window.size, 1)
+        for _ in range(1000):
+            window.increase()
+        self.assertEqual(window.size, 8)
+
+    def test_throttle_not_adaptive(self):
+        """Test that a non-adaptive throttle keeps its limits."""
+        throttle = Throttle(rate=50, max_concurrency=4)
+        throttle.acquire()
+        throttle.release(0.01, congested=True)
+        self.assertEqual(throttle.window.size, 4)
+        self.assertEqual(throttle.limiter.rate, 50)
+        self.assertEqual(throttle.requests, 1)
+        self.assertEqual(throttle.congestion_events, 1)
+
+    def test_throttle_adaptive(self):
+        """Test that an adaptive throttle backs off on congestion and slow
+        responses and recovers afterwards."""
+        throttle = Throttle(
+            rate=50, max_concurrency=4, adaptive=True, slow_response=1.0
+        )
+        throttle.acquire()
+        throttle.release(0.01, congested=True)
+        self.assertEqual(throttle.window.size, 2)
+        self.assertEqual(throttle.limiter.rate, 25)
+        throttle.acquire()
+        throttle.release(2.0)
+        self.assertEqual(throttle.window.size, 1)
+        self.assertEqual(throttle.limiter.rate, 12.5)
+        throttle.acquire()
+        throttle.release(0.01)
+        self.assertEqual(throttle.window.size, 2)
+        self.assertEqual(throttle.limiter.rate, 13)
+        self.assertEqual(throttle.congestion_events, 2)
+
+    def test_throttled_grabber_retry(self):
+        """Test that overload responses are retried."""
+        FlakyGrabber.statuses = [429, 503]
+        throttle = Throttle(max_concurrency=4, adaptive=True)
+        with ThrottledGrabber(throttle, FlakyGrabber) as grabber:
+            record = grabber.get_record(137717)
+            self.assertEqual(grabber.grabber.calls, 3)
+        self.assertEqual(record["name"], "Valentin  Alberti")
+        self.assertEqual(throttle.requests, 3)
+        self.assertEqual(throttle.congestion_events, 2)
+        self.assertLess(throttle.window.size, 4)
+        self.assertEqual(throttle.window.in_flight, 0)
+
+    def test_throttled_grabber_no_retry(self):
+        """Test that other HTTP errors are not retried."""
+        FlakyGrabber.statuses = [404]
+        with ThrottledGrabber(record_grabber=FlakyGrabber) as grabber:
+            self.assertRaises(urllib.error.HTTPError, grabber.get_record, 137717)
+            self.assertEqual(grabber.grabber.calls, 1)
+
+    def test_throttled_grabber_retries_exhausted(self):
+        """Test that the error is raised once the retries are used up."""
+        FlakyGrabber.statuses = [500, 500, 500]
+        with ThrottledGrabber(record_grabber=FlakyGrabber, max_retries=2) as grabber:
+            self.assertRaises(urllib.error.HTTPError, grabber.get_record, 137717)
+            self.assertEqual(grabber.grabber.calls, 3)
+
+    def test_throttled_grabber_bad_id(self):
+        """Test that record errors are passed through."""
+        with ThrottledGrabber(record_grabber=LocalDataGrabber) as grabber:
+            self.assertRaisesRegex(
+                ValueError, "Invalid id 999999999", grabber.get_record, 999999999
+            )
+        self.assertEqual(grabber.throttle.requests, 1)
+        self.assertEqual(grabber.throttle.congestion_events, 0)
+
+    def test_summary(self):
+        """Test the throughput report."""
+        throttle = Throttle()
+        with ThrottledGrabber(throttle, LocalDataGrabber) as grabber:
+            for id in [18231, 18230, 137717]:
+                grabber.get_record(id)
+        self.assertEqual(throttle.requests, 3)
+        self.assertGreater(throttle.throughput(), 0)
+        self.assertRegex(
+            throttle.summary(),
+            r"3 requests at [0-9.]+ requests/s \(0 congestion events\)",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()